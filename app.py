@@ -1,7 +1,15 @@
 # app.py
 import os
+from collections import Counter
 from flask import Flask, render_template, redirect, url_for, flash, request
-from extensions import db
+from extensions import (
+    db,
+    INTERVALO_MANTENIMIENTO,
+    PRAGMAS_SQLITE,
+    configurar_sqlite,
+    get_mantenimiento,
+    pragmas_actuales
+)
 from flask_wtf import FlaskForm
 from wtforms import (
     StringField,
@@ -20,10 +28,24 @@ from flask_login import (
     current_user,
     UserMixin
 )
-from decorators import requiere_roles
-from datetime import datetime
+from decorators import requiere_roles, presupuesto_consultas
+from datetime import datetime, timedelta
 from flask_migrate import Migrate
-from models import Usuario, Estado, Producto, Auditoria, Movimiento, Notificacion, RoleEnum
+from models import Usuario, Estado, Producto, Auditoria, Movimiento, Notificacion, RoleEnum, Categoria
+from pagination import Pagina, codificar_cursor, decodificar_cursor, obtener_limite, paginar
+from archivo_auditoria import catalogo as catalogo_auditoria
+from estado_registry import registro_estados
+from usuario_registry import registro_usuarios
+import auditoria
+import busqueda
+import lectura
+from autocompletado import codigos_producto, nombres_usuario
+import counters
+import hashing
+import rfid_historial
+import rollups
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, raiseload
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import openpyxl
@@ -46,9 +68,68 @@ if not os.path.exists(instance_dir):
     os.makedirs(instance_dir)
 
 app.config['SECRET_KEY'] = 'tu_clave_secreta'  # Replace with a secure key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'instance', 'usuarios.db')
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'instance', 'usuarios.db')
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = True
-
+app.config['EXPORT_DIR'] = os.path.join(instance_dir, 'exports')
+app.config['EXPORT_JOB_WORKERS'] = int(os.environ.get('EXPORT_JOB_WORKERS', 2))
+app.config['PDF_RENDER_PROCESSES'] = int(os.environ.get('PDF_RENDER_PROCESSES', 1))
+# Comma-separated tokens accepted from RFID readers on /api/rfid/escaneos.
+app.config['RFID_LECTOR_TOKENS'] = {
+    token.strip() for token in os.environ.get('RFID_LECTOR_TOKENS', '').split(',') if token.strip()
+}
+# Repeated reads of a tag by the same reader within this window are not stored (0 disables it).
+app.config['RFID_VENTANA_REBOTE_SEGUNDOS'] = float(os.environ.get('RFID_VENTANA_REBOTE_SEGUNDOS', 5))
+app.config['RFID_REBOTE_CAPACIDAD'] = int(os.environ.get('RFID_REBOTE_CAPACIDAD', 100000))
+# Raw scans older than this are purged by `python rfid_historial.py` once compacted.
+app.config['RFID_RETENCION_DIAS'] = int(os.environ.get('RFID_RETENCION_DIAS', 30))
+# Read files and reconciliation reports of handheld inventory sweeps.
+app.config['BARRIDOS_DIR'] = os.path.join(instance_dir, 'barridos')
+# pbkdf2 cost of new password hashes; older hashes are upgraded on the next successful login.
+app.config['PASSWORD_HASH_ITERACIONES'] = int(os.environ.get('PASSWORD_HASH_ITERACIONES', 600000))
+# Hashes computed at once per worker, and how many more may wait for a slot (see `hashing.py`).
+app.config['PASSWORD_HASH_TRABAJADORES'] = int(os.environ.get('PASSWORD_HASH_TRABAJADORES', 4))
+app.config['PASSWORD_HASH_COLA'] = int(os.environ.get('PASSWORD_HASH_COLA', 64))
+# Seconds a login waits for a hash slot before the request is refused.
+app.config['PASSWORD_HASH_ESPERA'] = float(os.environ.get('PASSWORD_HASH_ESPERA', 10))
+app.config['IMPORT_DIR'] = os.path.join(instance_dir, 'importaciones')
+# Processes hashing passwords during a bulk user import (see `importacion.py`).
+app.config['USUARIOS_IMPORTACION_PROCESOS'] = int(os.environ.get('USUARIOS_IMPORTACION_PROCESOS', os.cpu_count() or 1))
+# pbkdf2 cost for imported passwords (default PASSWORD_HASH_ITERACIONES); a lower
+# cost speeds up large imports and is raised by rehash-on-login on first use.
+app.config['USUARIOS_IMPORTACION_ITERACIONES'] = int(os.environ.get('USUARIOS_IMPORTACION_ITERACIONES', 0)) or None
+# Audit events are written by a background thread after the request commits;
+# set AUDITORIA_ASINCRONA=0 to write them in the request transaction instead.
+app.config['AUDITORIA_ASINCRONA'] = os.environ.get('AUDITORIA_ASINCRONA', '1') != '0'
+# Events waiting for the writer before requests write their own (see `auditoria.py`).
+app.config['AUDITORIA_COLA_MAXIMA'] = int(os.environ.get('AUDITORIA_COLA_MAXIMA', 10000))
+app.config['AUDITORIA_LOTE'] = int(os.environ.get('AUDITORIA_LOTE', 500))
+# Seconds the writer waits to fill a batch before writing what it has.
+app.config['AUDITORIA_INTERVALO'] = float(os.environ.get('AUDITORIA_INTERVALO', 0.5))
+# Audit rows older than this many days are moved to compressed monthly segments
+# by `python archivo_auditoria.py`; the audit view still searches them.
+app.config['AUDITORIA_RETENCION_DIAS'] = int(os.environ.get('AUDITORIA_RETENCION_DIAS', 365))
+app.config['AUDITORIA_ARCHIVO_DIR'] = os.path.join(instance_dir, 'auditoria_archivo')
+# Pragmas applied to every SQLite connection (see `extensions.py`). Each can be
+# overridden with SQLITE_<NAME>, e.g. SQLITE_SYNCHRONOUS=FULL; an empty value
+# leaves SQLite's default.
+app.config['SQLITE_PRAGMAS'] = {
+    nombre: os.environ.get('SQLITE_' + nombre.upper(), valor) for nombre, valor in PRAGMAS_SQLITE.items()
+}
+# Seconds between `PRAGMA optimize` and WAL checkpoint runs in each worker (0 disables them).
+app.config['SQLITE_MANTENIMIENTO_SEGUNDOS'] = int(
+    os.environ.get('SQLITE_MANTENIMIENTO_SEGUNDOS', INTERVALO_MANTENIMIENTO)
+)
+# Report and list views marked with `lectura.solo_lectura` read through a separate
+# read-only engine and pool; LECTURA_SEPARADA=0 keeps them on the write engine.
+app.config['LECTURA_SEPARADA'] = os.environ.get('LECTURA_SEPARADA', '1') != '0'
+# Read engine URI (default: the main SQLite file opened with mode=ro), and how many
+# seconds it may lag behind the main database, e.g. a replica's refresh interval.
+app.config['SQLALCHEMY_LECTURA_URI'] = os.environ.get('DATABASE_LECTURA_URL')
+app.config['LECTURA_RETRASO_SEGUNDOS'] = float(os.environ.get('LECTURA_RETRASO_SEGUNDOS', 0))
+
+configurar_sqlite(app.config['SQLITE_PRAGMAS'])
 db.init_app(app)
 migrate = Migrate(app, db)
 login_manager = LoginManager(app)
@@ -67,6 +148,11 @@ def favicon():
     """Handle favicon requests to prevent 404 errors"""
     return '', 204
 
+@app.before_request
+def iniciar_mantenimiento_sqlite():
+    """Start this worker's SQLite maintenance thread on its first request."""
+    get_mantenimiento()
+
 @app.errorhandler(404)
 def pagina_no_encontrada(e):
     """Handle 404 Not Found errors by rendering custom template"""
@@ -79,8 +165,16 @@ def error_servidor(e):
 
 @login_manager.user_loader
 def load_user(user_id):
-    """Load user by ID for Flask-Login authentication"""
-    return Usuario.query.get(int(user_id))
+    """
+    Load the user's cached principal by ID for Flask-Login authentication.
+
+    Returns a read-only `usuario_registry.Principal` (id, nombre_usuario, rol,
+    activo) rather than the Usuario row; deactivated users are logged out.
+    """
+    principal = registro_usuarios.obtener(int(user_id))
+    if principal is None or not principal.activo:
+        return None
+    return principal
 
 
 
@@ -95,23 +189,25 @@ def load_user(user_id):
     
     Methods:
         __init__(self, *args, **kwargs):
-            Initializes the form and populates the `estado_nuevo` choices with all available states.
+            Initializes the form and populates the `estado_nuevo` choices from the worker's
+            Estado registry (see `estado_registry.py`), sorted by `orden`.
             Raises a `ValueError` if there are no states available in the system.
     """
 class CambiarEstadoForm(FlaskForm):
     estado_nuevo = SelectField(
         'Nuevo Estado',
         choices=[],  # Will be filled dynamically
+        coerce=int,
         validators=[DataRequired()]
     )
     submit = SubmitField('Cambiar Estado')
 
     def __init__(self, *args, **kwargs):
         super(CambiarEstadoForm, self).__init__(*args, **kwargs)
-        estados = Estado.query.all()
-        if not estados:
+        opciones = registro_estados.opciones()
+        if not opciones:
             raise ValueError("No hay estados disponibles en el sistema")
-        self.estado_nuevo.choices = [(estado.id, estado.nombre) for estado in estados]
+        self.estado_nuevo.choices = opciones
 
 from flask import redirect, url_for, flash
 from flask_login import current_user
@@ -139,7 +235,7 @@ from extensions import db
     
         Methods:
             __init__(self, *args, **kwargs):
-                Initializes the form and populates the `estado_id` choices with all available states.
+                Initializes the form and populates the `estado_id` choices from the Estado registry.
                 Raises a `ValueError` if there are no states available in the system.
         """
 class ProductoForm(FlaskForm):
@@ -151,24 +247,183 @@ class ProductoForm(FlaskForm):
 
     def __init__(self, *args, **kwargs):
         super(ProductoForm, self).__init__(*args, **kwargs)
-        self.estado_id.choices = [(estado.id, estado.nombre) for estado in Estado.query.all()]
+        self.estado_id.choices = registro_estados.opciones()
 
 
 
 """
-Renders the admin view for listing all products.
+Renders the admin view for listing products.
 
 This route is only accessible to users with the 'ADMIN' role. 
-It retrieves all products from the database and renders the 
-'admin/lista_productos.html' template, passing the list of 
-products as the 'productos' parameter.
+Products are shown one keyset page at a time, ordered by `id`, and can be
+filtered server-side by `estado` and `categoria` (ids). The page size comes
+from `limite` and the position from the opaque `cursor` query parameter
+(see `pagination.paginar`). With a `q` search text the page instead holds the
+`limite` best full-text matches, with the same filters (see `busqueda.py`).
+
+Loading: `estado` is joined in; any other relationship access raises.
 
 """
 @app.route('/admin/productos')
 @requiere_roles(RoleEnum.ADMIN.value)
+@presupuesto_consultas(3)
+@lectura.solo_lectura(retraso_maximo=0)
 def lista_productos():
-    productos = Producto.query.all()
-    return render_template('admin/lista_productos.html', productos=productos)
+    filtros = {
+        'q': request.args.get('q', '').strip(),
+        'estado': request.args.get('estado', type=int),
+        'categoria': request.args.get('categoria', type=int)
+    }
+    if filtros['q']:
+        return render_template(
+            'admin/lista_productos.html',
+            productos=busqueda.buscar_productos(
+                filtros['q'], filtros['estado'], filtros['categoria'], obtener_limite(),
+                opciones=(joinedload(Producto.estado), raiseload('*'))
+            ),
+            filtros=filtros,
+            estados=registro_estados.todos(),
+            categorias=Categoria.query.order_by(Categoria.nombre).all(),
+            url_primera=url_for('lista_productos'),
+            url_siguiente=None
+        )
+    query = Producto.query.options(joinedload(Producto.estado), raiseload('*'))
+    if filtros['estado']:
+        query = query.filter(Producto.estado_id == filtros['estado'])
+    if filtros['categoria']:
+        query = query.filter(Producto.categoria_id == filtros['categoria'])
+
+    pagina = paginar_o_primera(query, [Producto.id], descendente=False)
+    return render_template(
+        'admin/lista_productos.html',
+        productos=pagina.elementos,
+        filtros=filtros,
+        estados=registro_estados.todos(),
+        categorias=Categoria.query.order_by(Categoria.nombre).all(),
+        **urls_paginacion('lista_productos', pagina, filtros)
+    )
+
+
+"""
+Full-text product search as JSON, for search boxes and scripts.
+
+Query parameters: `q` (required; every word matches as a prefix of a word
+in the name, code or description), optional `estado` and `categoria` ids,
+and `limite` (at most `busqueda.LIMITE_MAXIMO`). Results come best match
+first (bm25, name hits weighted highest).
+"""
+@app.route('/api/productos/buscar')
+@requiere_roles(RoleEnum.ADMIN.value, RoleEnum.PROFESOR.value)
+@presupuesto_consultas(2)
+def buscar_productos_api():
+    texto = request.args.get('q', '').strip()
+    if not busqueda.expresion_fts(texto):
+        return jsonify({'error': 'Indica un texto de búsqueda en q'}), 400
+    productos = busqueda.buscar_productos(
+        texto,
+        estado_id=request.args.get('estado', type=int),
+        categoria_id=request.args.get('categoria', type=int),
+        limite=request.args.get('limite', 20, type=int),
+        opciones=(raiseload('*'),)
+    )
+    return jsonify({
+        'q': texto,
+        'resultados': [{
+            'id': producto.id,
+            'nombre': producto.nombre,
+            'codigo': producto.codigo,
+            'descripcion': producto.descripcion,
+            'estado': registro_estados.por_id(producto.estado_id).nombre,
+            'categoria_id': producto.categoria_id,
+            'ubicacion_actual': producto.ubicacion_actual
+        } for producto in productos]
+    })
+
+
+"""
+Typeahead suggestions for product codes: the first `limite` (default 10)
+products whose `codigo` starts with `q`, case-insensitively, in code order,
+with their name and estado.
+
+Served from the worker's sorted in-memory index (see `autocompletado.py`),
+so a keystroke costs no query beyond the index's periodic catch-up.
+"""
+@app.route('/api/autocompletar/productos')
+@requiere_roles(RoleEnum.ADMIN.value, RoleEnum.PROFESOR.value)
+@presupuesto_consultas(2)
+def autocompletar_productos():
+    prefijo = request.args.get('q', '').strip()
+    if not prefijo:
+        return jsonify({'q': prefijo, 'resultados': []})
+    codigos_producto.sincronizar()
+    entradas = codigos_producto.buscar(prefijo, request.args.get('limite', 10, type=int))
+    return jsonify({
+        'q': prefijo,
+        'resultados': [{
+            'id': entrada.id,
+            'codigo': entrada.codigo,
+            'nombre': entrada.nombre,
+            'estado': getattr(registro_estados.por_id(entrada.estado_id), 'nombre', None)
+        } for entrada in entradas]
+    })
+
+
+"""
+Typeahead suggestions for user names: the first `limite` (default 10)
+users whose `nombre_usuario` starts with `q`, case-insensitively, with
+their role and whether they are active. Same index as
+`autocompletar_productos`.
+"""
+@app.route('/api/autocompletar/usuarios')
+@requiere_roles(RoleEnum.ADMIN.value)
+@presupuesto_consultas(3)
+def autocompletar_usuarios():
+    prefijo = request.args.get('q', '').strip()
+    if not prefijo:
+        return jsonify({'q': prefijo, 'resultados': []})
+    nombres_usuario.sincronizar()
+    entradas = nombres_usuario.buscar(prefijo, request.args.get('limite', 10, type=int))
+    return jsonify({
+        'q': prefijo,
+        'resultados': [{
+            'id': entrada.id,
+            'nombre_usuario': entrada.nombre_usuario,
+            'rol': entrada.rol.value,
+            'activo': entrada.activo
+        } for entrada in entradas]
+    })
+
+
+"""
+    Paginates ``query`` with the cursor and limit of the current request.
+
+    An invalid or stale cursor falls back to the first page with a warning
+    instead of failing the request.
+"""
+def paginar_o_primera(query, columnas, descendente=True):
+    limite = obtener_limite()
+    try:
+        return paginar(query, columnas, request.args.get('cursor'), limite, descendente)
+    except ValueError:
+        flash('El enlace de paginación no es válido; se muestra la primera página.', 'warning')
+        return paginar(query, columnas, None, limite, descendente)
+
+
+"""
+    Builds the first-page and next-page URLs of a list view keeping the active filters.
+
+    Returns:
+        dict: `url_primera` and `url_siguiente` (None on the last page), ready to pass to the template.
+"""
+def urls_paginacion(endpoint, pagina, filtros):
+    parametros = {clave: valor for clave, valor in filtros.items() if valor}
+    url_siguiente = None
+    if pagina.cursor_siguiente is not None:
+        url_siguiente = url_for(endpoint, cursor=pagina.cursor_siguiente, limite=pagina.limite, **parametros)
+    return {
+        'url_primera': url_for(endpoint, limite=pagina.limite, **parametros),
+        'url_siguiente': url_siguiente
+    }
 
 
     
@@ -207,6 +462,10 @@ def agregar_producto():
         )
         try:
             db.session.add(nuevo_producto)
+            counters.incrementar({
+                counters.PRODUCTOS: 1,
+                counters.clave_estado(nuevo_producto.estado_id): 1
+            })
             db.session.commit()
             flash('Producto agregado exitosamente.', 'success')
         except Exception as e:
@@ -216,6 +475,79 @@ def agregar_producto():
     return render_template('admin/agregar_producto.html', form=form)
 
 
+from importacion import FORMATOS_IMPORTACION, encolar_importacion, serializar_importacion
+from models import TrabajoImportacion
+
+
+def _guardar_importacion(tipo, archivo, extension, simulacion=False):
+    trabajo = TrabajoImportacion(tipo=tipo, simulacion=simulacion, usuario_id=current_user.id)
+    db.session.add(trabajo)
+    db.session.flush()
+    os.makedirs(app.config['IMPORT_DIR'], exist_ok=True)
+    trabajo.ruta_archivo = os.path.join(app.config['IMPORT_DIR'], f'importacion_{trabajo.id}{extension}')
+    archivo.save(trabajo.ruta_archivo)
+    if not simulacion:
+        auditoria.registrar(
+            f'Importación de {tipo}',
+            f'Importación {trabajo.id} desde {archivo.filename}',
+            sincrono=True
+        )
+    db.session.commit()
+    encolar_importacion(app, trabajo)
+    return trabajo
+
+
+def _extension_importacion(archivo):
+    return os.path.splitext(archivo.filename or '')[1].lower() if archivo else ''
+
+
+"""
+Submits a bulk product catalogue import from a CSV or XLSX file.
+
+The multipart body carries the file in `archivo`, with a header row naming
+the `nombre`, `descripcion`, `codigo`, `estado`, `categoria` and `rfid_tag`
+columns (only `nombre` is required; `estado` defaults to Disponible, and
+`estado`/`categoria` are matched by name). A background job streams the
+rows, checks `codigo` and `rfid_tag` uniqueness in memory and inserts them
+in batches with their initial Movimiento and Auditoria rows (see
+`importacion.importar_productos`).
+
+With `simulacion` set, the file is only validated: the job reports what
+would be created and every row error without writing anything.
+
+Returns:
+    A 202 JSON response with the job status and the URL to poll it, or 400 if
+    the file is missing or not .csv/.xlsx.
+"""
+@app.route('/admin/productos/importar', methods=['POST'])
+@requiere_roles(RoleEnum.ADMIN.value)
+def importar_productos():
+    archivo = request.files.get('archivo')
+    extension = _extension_importacion(archivo)
+    if extension not in FORMATOS_IMPORTACION:
+        return jsonify({'error': 'Se esperaba un archivo .csv o .xlsx en el campo archivo.'}), 400
+
+    simulacion = request.form.get('simulacion', '').lower() in ('1', 'true', 'si', 'sí', 'on')
+    trabajo = _guardar_importacion('productos', archivo, extension, simulacion=simulacion)
+    respuesta = serializar_importacion(trabajo)
+    respuesta['url_estado'] = url_for('estado_importacion_productos', trabajo_id=trabajo.id)
+    return jsonify(respuesta), 202
+
+
+"""
+Returns the state and progress of a product import as JSON; once completed
+it includes the per-row errors (row number, code or name and reason).
+
+Args:
+    trabajo_id (int): The ID of the import job.
+"""
+@app.route('/admin/productos/importar/<int:trabajo_id>')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estado_importacion_productos(trabajo_id):
+    trabajo = TrabajoImportacion.query.filter_by(id=trabajo_id, tipo='productos').first_or_404()
+    return jsonify(serializar_importacion(trabajo, con_errores=trabajo.estado == 'completado'))
+
+
 
 """
 Renders the admin view for changing the state of a product.
@@ -242,10 +574,10 @@ Returns:
 
 @app.route('/admin/producto/<int:producto_id>/cambiar_estado', methods=['GET', 'POST'])
 @requiere_roles(RoleEnum.ADMIN.value)
+@presupuesto_consultas(2)
 def cambiar_estado_producto(producto_id):
-    producto = Producto.query.get_or_404(producto_id)
+    producto = Producto.query.options(joinedload(Producto.estado)).get_or_404(producto_id)
     form = CambiarEstadoForm()
-    form.estado_nuevo.choices = [(estado.id, estado.nombre) for estado in Estado.query.all()]
 
     if form.validate_on_submit():
         actualizar_estado_producto(producto, form.estado_nuevo.data)
@@ -264,20 +596,31 @@ def cambiar_estado_producto(producto_id):
     - Retrieves the previous state of the product.
     - Registers an audit record for the state change.
     - Registers a movement record for the state change.
+    - Adjusts the dashboard counters (see `counters.py`).
     - Creates a notification if the new state is one that requires a notification.
+
+    The state change, movement and counters are committed together; the
+    audit record is written by the background audit writer once that
+    commit succeeds (see `auditoria.py`).
     
     Args:
         producto (Producto): The product whose state is to be updated.
         estado_nuevo_id (int): The ID of the new state for the product.
     """
 def actualizar_estado_producto(producto, estado_nuevo_id):
-    estado_anterior = producto.estado.nombre
-    estado_nuevo = Estado.query.get(estado_nuevo_id)
-    producto.estado = estado_nuevo
-    db.session.commit()
+    estado_anterior_id = producto.estado_id
+    estado_anterior = registro_estados.por_id(estado_anterior_id).nombre
+    estado_nuevo = registro_estados.por_id(estado_nuevo_id)
+    producto.estado_id = estado_nuevo.id
 
     registrar_auditoria(producto, estado_anterior, estado_nuevo)
     registrar_movimiento(producto, estado_anterior, estado_nuevo)
+    counters.incrementar({
+        counters.MOVIMIENTOS: 1,
+        **counters.deltas_cambio_estado(estado_anterior_id, estado_nuevo.id)
+    })
+    db.session.commit()
+
     crear_notificacion_si_necesario(producto, estado_nuevo)
     
 
@@ -285,8 +628,9 @@ def actualizar_estado_producto(producto, estado_nuevo_id):
 """
         Registers an audit record for a change in the state of a product.
     
-        This function creates an Auditoria record to log the change in state of the
-        given product from the previous state to the new state.
+        This function queues an Auditoria record, with the client's address and
+        user agent, to log the change in state of the given product from the
+        previous state to the new state. It is written after the caller commits.
     
         Args:
             producto (Producto): The product whose state has changed.
@@ -295,12 +639,10 @@ def actualizar_estado_producto(producto, estado_nuevo_id):
 
 """
 def registrar_auditoria(producto, estado_anterior, estado_nuevo):
-    auditoria = Auditoria(
-        usuario_id=current_user.id,
-        accion='Cambio de estado',
-        detalle=f'Producto {producto.nombre} de {estado_anterior} a {estado_nuevo.nombre}'
+    auditoria.registrar(
+        'Cambio de estado',
+        f'Producto {producto.nombre} de {estado_anterior} a {estado_nuevo.nombre}'
     )
-    db.session.add(auditoria)
 
 
 """
@@ -461,6 +803,7 @@ def registro():
         )
         nuevo_usuario.password = form.contrasena.data
         db.session.add(nuevo_usuario)
+        counters.incrementar({counters.USUARIOS: 1, counters.clave_rol(nuevo_usuario.rol): 1})
         db.session.commit()
         flash('Usuario registrado exitosamente.', 'success')
         return redirect(url_for('login'))
@@ -485,6 +828,9 @@ def login():
     if form.validate_on_submit():
         usuario = Usuario.query.filter_by(nombre_usuario=form.nombre_usuario.data).first()
         if usuario and usuario.check_password(form.contrasena.data):
+            if usuario.necesita_rehash():
+                usuario.password = form.contrasena.data
+                db.session.commit()
             login_user(usuario)
             flash('Has iniciado sesión correctamente.', 'success')
             return redirect(url_for('dashboard'))
@@ -492,6 +838,56 @@ def login():
     return render_template('login.html', form=form)
 
 
+"""
+Answers 503 when the password hashing pool of this worker is saturated
+(see `hashing.PoolHash`), asking the client to retry shortly.
+"""
+@app.errorhandler(hashing.HashSaturado)
+def hash_saturado(error):
+    flash('El servidor está ocupado. Inténtalo de nuevo en unos segundos.', 'warning')
+    if request.endpoint == 'registro':
+        return render_template('registro.html', form=FormularioRegistro()), 503, {'Retry-After': '2'}
+    return render_template('login.html', form=FormularioLogin()), 503, {'Retry-After': '2'}
+
+
+"""
+Returns this worker's password hashing pool statistics as JSON: hashes
+queued, running, completed and rejected, and queue wait percentiles.
+"""
+@app.route('/api/contrasenas/estadisticas')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estadisticas_hash():
+    return jsonify(hashing.get_pool().estadisticas())
+
+
+"""
+Returns this worker's audit writer statistics as JSON: events queued and
+written, overflows, failed batches, and flush and queue wait percentiles.
+"""
+@app.route('/api/auditoria/estadisticas')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estadisticas_auditoria():
+    return jsonify(auditoria.get_escritor().estadisticas())
+
+
+"""
+Returns the pragmas in effect on one of this worker's SQLite connections, the
+maintenance thread's statistics (runs, failures, last checkpoint) and the
+read-only engine's pool status (see `lectura.py`) as JSON.
+"""
+@app.route('/api/sqlite/estadisticas')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estadisticas_sqlite():
+    if db.engine.dialect.name != 'sqlite':
+        return jsonify({'error': 'La base de datos no es SQLite'}), 404
+    mantenimiento = get_mantenimiento()
+    return jsonify({
+        'pragmas': pragmas_actuales(db.session.connection()),
+        'mantenimiento': mantenimiento.estadisticas() if mantenimiento else None,
+        'lectura': lectura.estadisticas()
+    })
+
+
 """
 Route handler for user logout.
 
@@ -548,8 +944,11 @@ Returns:
 """
 @app.route('/usuario/dashboard')
 @requiere_roles(RoleEnum.USUARIO.value)
+@presupuesto_consultas(2)
 def usuario_dashboard():
-    productos_asignados = Producto.query.filter_by(usuario_asignado=current_user.id).all()
+    productos_asignados = Producto.query.options(
+        joinedload(Producto.estado), raiseload('*')
+    ).filter_by(usuario_asignado=current_user.id).all()
     return render_template('usuario/dashboard.html', productos=productos_asignados)
 
 
@@ -560,7 +959,7 @@ This route is responsible for rendering the professor dashboard page, which disp
 
 The route is decorated with the `@requiere_roles` decorator, which ensures that only users with the `RoleEnum.PROFESOR.value` role can access this route.
 
-The route queries the `Producto` model to retrieve all products that are currently available (i.e., have a status of 'Disponible'), as well as all products that have been assigned to the current professor. These products are then passed to the `profesor/dashboard.html` template for rendering.
+The route queries the `Producto` model to retrieve all products that are currently available (i.e., have a status of 'Disponible'), as well as all products that have been assigned to the current professor. These products are then passed to the `profesor/dashboard.html` template for rendering. With a `q` search text only the best full-text matches among the available products are listed.
 
 Args:
     None
@@ -570,16 +969,26 @@ Returns:
 """
 @app.route('/profesor/dashboard')
 @requiere_roles(RoleEnum.PROFESOR.value)
+@presupuesto_consultas(3)
 def profesor_dashboard():
-    estado_disponible = Estado.query.filter_by(nombre='Disponible').first()
-    if estado_disponible:
-        productos_disponibles = Producto.query.filter_by(estado_id=estado_disponible.id).all()
+    busqueda_texto = request.args.get('q', '').strip()
+    estado_disponible = registro_estados.por_nombre('Disponible')
+    if estado_disponible and busqueda_texto:
+        productos_disponibles = busqueda.buscar_productos(
+            busqueda_texto, estado_id=estado_disponible.id, limite=busqueda.LIMITE_MAXIMO,
+            opciones=(raiseload('*'),)
+        )
+    elif estado_disponible:
+        productos_disponibles = Producto.query.options(raiseload('*')).filter_by(estado_id=estado_disponible.id).all()
     else:
         productos_disponibles = []
-    productos_asignados = Producto.query.filter_by(usuario_asignado=current_user.id).all()
+    productos_asignados = Producto.query.options(
+        joinedload(Producto.estado), raiseload('*')
+    ).filter_by(usuario_asignado=current_user.id).all()
     return render_template('profesor/dashboard.html', 
                           productos_disponibles=productos_disponibles,
-                          productos_asignados=productos_asignados)
+                          productos_asignados=productos_asignados,
+                          busqueda=busqueda_texto)
 
 
 
@@ -598,10 +1007,11 @@ Returns:
 """
 @app.route('/alumno/dashboard')
 @requiere_roles(RoleEnum.ALUMNO.value)
+@presupuesto_consultas(2)
 def alumno_dashboard():
-    estado_prestado = Estado.query.filter_by(nombre='Prestado').first()
+    estado_prestado = registro_estados.por_nombre('Prestado')
     if estado_prestado:
-        productos_prestados = Producto.query.filter_by(
+        productos_prestados = Producto.query.options(raiseload('*')).filter_by(
             usuario_asignado=current_user.id,
             estado_id=estado_prestado.id
         ).all()
@@ -620,10 +1030,10 @@ various statistics and recent activities related to the application.
 The route is decorated with the `@requiere_roles` decorator, which ensures that 
 only users with the `RoleEnum.ADMIN.value` or `RoleEnum.PROFESOR.value` roles can access this route.
 
-The route queries the `Producto`, `Usuario`, `Auditoria`, and `Movimiento` models to 
-retrieve data for the dashboard, including the total number of products, users, movements, 
-and audits, as well as the latest 5 audits and movements. This data is then passed to the 
-`admin/dashboard.html` template for rendering.
+The totals of products, users, movements and audits are read from the `contador` 
+table (see `counters.py`) in a single query, and the latest 5 audits and movements 
+are queried directly. This data is then passed to the `admin/dashboard.html` template 
+for rendering.
 
 Args:
     None
@@ -633,40 +1043,46 @@ Returns:
 """
 @app.route('/admin/dashboard')
 @requiere_roles(RoleEnum.ADMIN.value, RoleEnum.PROFESOR.value)
+@presupuesto_consultas(4)
+@lectura.solo_lectura(retraso_maximo=60)
 def admin_dashboard():
-    productos = Producto.query.all()
-    usuarios = Usuario.query.all()
-    auditorias = Auditoria.query.order_by(Auditoria.fecha_hora.desc()).limit(5).all()
-    movimientos = Movimiento.query.order_by(Movimiento.fecha_hora.desc()).limit(5).all()
+    totales = counters.leer(counters.PRODUCTOS, counters.USUARIOS, counters.MOVIMIENTOS, counters.AUDITORIAS)
+    auditorias = Auditoria.query.options(
+        joinedload(Auditoria.usuario), raiseload('*')
+    ).order_by(Auditoria.fecha_hora.desc()).limit(5).all()
+    movimientos = Movimiento.query.options(
+        joinedload(Movimiento.producto), joinedload(Movimiento.usuario), raiseload('*')
+    ).order_by(Movimiento.fecha_hora.desc()).limit(5).all()
     
     # Get latest activities
     actividades = []
-    for auditoria in auditorias:
-        actividades.append(f"{auditoria.accion} por {auditoria.usuario.nombre_usuario}")
+    for registro in auditorias:
+        actividades.append(f"{registro.accion} por {registro.usuario.nombre_usuario}")
     
     # Prepare dashboard stats
     stats = {
-        'total_productos': len(productos),
-        'total_usuarios': len(usuarios),
-        'total_movimientos': Movimiento.query.count(),
-        'total_auditorias': Auditoria.query.count()
+        'total_productos': totales[counters.PRODUCTOS],
+        'total_usuarios': totales[counters.USUARIOS],
+        'total_movimientos': totales[counters.MOVIMIENTOS],
+        'total_auditorias': totales[counters.AUDITORIAS]
     }
     
     return render_template('admin/dashboard.html', 
                           actividades=actividades,
                           stats=stats,
-                          ultimos_movimientos=movimientos,
-                          productos=productos)  # Pass productos to the template
+                          ultimos_movimientos=movimientos)
 
 
 """
 Route handler for the admin users page.
 
-This route is responsible for rendering the admin users page, which displays a list of all registered users.
+This route is responsible for rendering the admin users page, which displays the registered users one keyset page at a time, ordered by `id`.
 
 The route is decorated with the `@requiere_roles` decorator, which ensures that only users with the `RoleEnum.ADMIN.value` role can access this route.
 
-The route queries the `Usuario` model to retrieve all registered users, and passes this data to the `admin/usuarios.html` template for rendering.
+The page size comes from the `limite` query parameter and the position from the opaque `cursor` parameter (see `pagination.paginar`).
+
+Audit and notification counts are computed with one grouped query each for the users on the page instead of loading both collections per user; archived audit rows are counted from the archive indexes.
 
 Args:
     None
@@ -676,9 +1092,118 @@ Returns:
 """
 @app.route('/admin/usuarios')
 @requiere_roles(RoleEnum.ADMIN.value)
+@presupuesto_consultas(4)
+@lectura.solo_lectura(retraso_maximo=0)
 def lista_usuarios():
-    usuarios = Usuario.query.all()
-    return render_template('admin/usuarios.html', usuarios=usuarios)
+    pagina = paginar_o_primera(Usuario.query.options(raiseload('*')), [Usuario.id], descendente=False)
+    ids = [usuario.id for usuario in pagina.elementos]
+    conteo_auditorias = Counter(dict(
+        db.session.query(Auditoria.usuario_id, func.count(Auditoria.id))
+        .filter(Auditoria.usuario_id.in_(ids)).group_by(Auditoria.usuario_id).all()
+    ))
+    conteo_auditorias.update(catalogo_auditoria.conteo_por_usuario(ids))
+    conteo_notificaciones = dict(
+        db.session.query(Notificacion.usuario_id, func.count(Notificacion.id))
+        .filter(Notificacion.usuario_id.in_(ids)).group_by(Notificacion.usuario_id).all()
+    )
+    return render_template(
+        'admin/usuarios.html',
+        usuarios=pagina.elementos,
+        conteo_auditorias=conteo_auditorias,
+        conteo_notificaciones=conteo_notificaciones,
+        **urls_paginacion('lista_usuarios', pagina, {})
+    )
+
+
+"""
+Submits a bulk user import from a CSV or XLSX file.
+
+The multipart body carries the file in `archivo`, with a header row naming the
+`nombre_usuario`, `contrasena` and `rol` columns (and optionally `activo`).
+Rows are validated with the registration rules, hashed by a process pool
+and inserted in batches by a background job (see `importacion.py`), so the
+request returns as soon as the file is stored.
+
+Returns:
+    A 202 JSON response with the job status and the URL to poll it, or 400 if
+    the file is missing or not .csv/.xlsx.
+"""
+@app.route('/admin/usuarios/importar', methods=['POST'])
+@requiere_roles(RoleEnum.ADMIN.value)
+def importar_usuarios():
+    archivo = request.files.get('archivo')
+    extension = _extension_importacion(archivo)
+    if extension not in FORMATOS_IMPORTACION:
+        return jsonify({'error': 'Se esperaba un archivo .csv o .xlsx en el campo archivo.'}), 400
+
+    trabajo = _guardar_importacion('usuarios', archivo, extension)
+    respuesta = serializar_importacion(trabajo)
+    respuesta['url_estado'] = url_for('estado_importacion_usuarios', trabajo_id=trabajo.id)
+    return jsonify(respuesta), 202
+
+
+"""
+Returns the state and progress of a user import as JSON; once completed it
+includes the per-row errors (row number, username and reason).
+
+Args:
+    trabajo_id (int): The ID of the import job.
+"""
+@app.route('/admin/usuarios/importar/<int:trabajo_id>')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estado_importacion_usuarios(trabajo_id):
+    trabajo = TrabajoImportacion.query.filter_by(id=trabajo_id, tipo='usuarios').first_or_404()
+    return jsonify(serializar_importacion(trabajo, con_errores=trabajo.estado == 'completado'))
+
+
+"""
+    Returns one keyset page of audit events from the hot table and the archive.
+
+    Archived events are older than every row left in `auditoria`, so while
+    the hot page is full only archived events newer than its last row (rows
+    written late) can belong on it; the archive indexes rule that out without
+    reading any segment. Once the hot table is exhausted, the page is filled
+    from the archive. Both sources share the `(fecha_hora, id)` cursor.
+
+    Args:
+        query: The filtered `Auditoria` query.
+        filtros_archivo (dict): Filters for `CatalogoArchivo.buscar`, or None to skip the archive.
+
+    Returns:
+        Pagina: The merged page.
+"""
+def paginar_auditoria(query, filtros_archivo):
+    columnas = [Auditoria.fecha_hora, Auditoria.id]
+    limite = obtener_limite()
+    cursor = request.args.get('cursor')
+    try:
+        antes_de = tuple(decodificar_cursor(cursor, columnas)) if cursor else None
+        pagina = paginar(query, columnas, cursor, limite)
+    except ValueError:
+        flash('El enlace de paginación no es válido; se muestra la primera página.', 'warning')
+        antes_de = None
+        pagina = paginar(query, columnas, None, limite)
+    if filtros_archivo is None:
+        return pagina
+
+    despues_de = None
+    if pagina.cursor_siguiente is not None:
+        despues_de = (pagina.elementos[-1].fecha_hora, pagina.elementos[-1].id)
+    archivadas = catalogo_auditoria.buscar(limite + 1, antes_de=antes_de, despues_de=despues_de, **filtros_archivo)
+    if not archivadas:
+        return pagina
+    usuarios = {usuario.id: usuario for usuario in Usuario.query.options(raiseload('*')).filter(
+        Usuario.id.in_({evento.usuario_id for evento in archivadas})
+    )}
+    for evento in archivadas:
+        evento.usuario = usuarios.get(evento.usuario_id)
+
+    elementos = sorted(pagina.elementos + archivadas, key=lambda evento: (evento.fecha_hora, evento.id), reverse=True)
+    cursor_siguiente = None
+    if len(elementos) > limite or pagina.cursor_siguiente is not None:
+        elementos = elementos[:limite]
+        cursor_siguiente = codificar_cursor([elementos[-1].fecha_hora, elementos[-1].id])
+    return Pagina(elementos, cursor_siguiente, limite)
 
 
 """
@@ -690,9 +1215,12 @@ a list of all auditing events recorded in the system.
 The route is decorated with the `@requiere_roles` decorator, which ensures that 
 only users with the `RoleEnum.ADMIN.value` role can access this route.
 
-The route queries the `Auditoria` model to retrieve all auditing events, ordered 
-by the `fecha_hora` field in descending order, and passes this data to the 
-`admin/auditoria.html` template for rendering.
+The route queries the `Auditoria` model for one keyset page of auditing events, 
+ordered by `(fecha_hora, id)` in descending order, and passes it to the 
+`admin/auditoria.html` template for rendering. Events can be filtered server-side 
+by `usuario` (user name), `accion` and a `fecha_inicio`/`fecha_fin` date range.
+Once the hot table runs out, the page continues with archived events (see
+`paginar_auditoria`).
 
 Args:
     None
@@ -702,9 +1230,47 @@ Returns:
 """
 @app.route('/admin/auditoria')
 @requiere_roles(RoleEnum.ADMIN.value)
+@presupuesto_consultas(3)
+@lectura.solo_lectura(retraso_maximo=60)
 def lista_auditoria():
-    auditorias = Auditoria.query.order_by(Auditoria.fecha_hora.desc()).all()
-    return render_template('admin/auditoria.html', auditorias=auditorias)
+    filtros = {
+        'usuario': request.args.get('usuario', '').strip(),
+        'accion': request.args.get('accion', '').strip(),
+        'fecha_inicio': request.args.get('fecha_inicio', ''),
+        'fecha_fin': request.args.get('fecha_fin', '')
+    }
+    query = Auditoria.query.options(joinedload(Auditoria.usuario), raiseload('*'))
+    filtros_archivo = {}
+    if filtros['usuario']:
+        usuario = Usuario.query.filter_by(nombre_usuario=filtros['usuario']).first()
+        query = query.filter(Auditoria.usuario_id == (usuario.id if usuario else None))
+        filtros_archivo = {'usuario_id': usuario.id} if usuario else None
+    if filtros['accion']:
+        query = query.filter(Auditoria.accion == filtros['accion'])
+        if filtros_archivo is not None:
+            filtros_archivo['accion'] = filtros['accion']
+    try:
+        if filtros['fecha_inicio']:
+            fecha_desde = datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d')
+            query = query.filter(Auditoria.fecha_hora >= fecha_desde)
+            if filtros_archivo is not None:
+                filtros_archivo['fecha_desde'] = fecha_desde
+        if filtros['fecha_fin']:
+            fecha_hasta = datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d') + timedelta(days=1)
+            query = query.filter(Auditoria.fecha_hora < fecha_hasta)
+            if filtros_archivo is not None:
+                filtros_archivo['fecha_hasta'] = fecha_hasta
+    except ValueError:
+        flash('Formato de fecha inválido. Use AAAA-MM-DD.', 'danger')
+        return redirect(url_for('lista_auditoria'))
+
+    pagina = paginar_auditoria(query, filtros_archivo)
+    return render_template(
+        'admin/auditoria.html',
+        auditorias=pagina.elementos,
+        filtros=filtros,
+        **urls_paginacion('lista_auditoria', pagina, filtros)
+    )
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -752,16 +1318,23 @@ Returns:
 """
 @app.route('/solicitar-producto/<int:producto_id>', methods=['GET', 'POST'])
 @login_required
+@presupuesto_consultas(2)
 def solicitar_producto(producto_id):
-    producto = Producto.query.get_or_404(producto_id)
+    producto = Producto.query.options(joinedload(Producto.estado)).get_or_404(producto_id)
     form = SolicitudProductoForm()
     
     if form.validate_on_submit():
         if producto.estado.nombre == 'Disponible':
+            estado_prestado_id = registro_estados.por_nombre('Prestado').id
+            counters.incrementar({
+                counters.MOVIMIENTOS: 1,
+                counters.PRESTAMOS_ACTIVOS: 0 if producto.usuario_asignado else 1,
+                **counters.deltas_cambio_estado(producto.estado_id, estado_prestado_id)
+            })
             producto.usuario_asignado = current_user.id
             producto.fecha_asignacion = datetime.utcnow()
             producto.fecha_devolucion = datetime.utcnow() + timedelta(days=form.duracion_dias.data)
-            producto.estado = Estado.query.filter_by(nombre='Prestado').first()
+            producto.estado_id = estado_prestado_id
             
             movimiento = Movimiento(
                 producto_id=producto.id,
@@ -803,14 +1376,21 @@ Returns:
 """
 @app.route('/devolver-producto/<int:producto_id>', methods=['GET', 'POST'])
 @login_required
+@presupuesto_consultas(2)
 def devolver_producto(producto_id):
-    producto = Producto.query.get_or_404(producto_id)
+    producto = Producto.query.options(joinedload(Producto.estado)).get_or_404(producto_id)
     
     if request.method == 'POST':
         estado_anterior = producto.estado.nombre
+        estado_disponible_id = registro_estados.por_nombre('Disponible').id
+        counters.incrementar({
+            counters.MOVIMIENTOS: 1,
+            counters.PRESTAMOS_ACTIVOS: -1 if producto.usuario_asignado else 0,
+            **counters.deltas_cambio_estado(producto.estado_id, estado_disponible_id)
+        })
         producto.usuario_asignado = None
         producto.fecha_devolucion = datetime.utcnow()
-        producto.estado = Estado.query.filter_by(nombre='Disponible').first()
+        producto.estado_id = estado_disponible_id
         
         movimiento = Movimiento(
             producto_id=producto.id,
@@ -841,16 +1421,24 @@ and renders the 'historial_producto.html' template with the product and movement
 Args:
     producto_id (int): The ID of the product to retrieve the history for.
 
+Tagged products also list their latest RFID dwell intervals (see
+`rfid_historial.estancias_producto`) rather than every raw scan.
+
 Returns:
     A rendered template for the product history page, displaying the product 
     information and its movement history.
 """
 @app.route('/producto/<int:producto_id>/historial')
 @login_required
+@presupuesto_consultas(5)
 def historial_producto(producto_id):
-    producto = Producto.query.get_or_404(producto_id)
-    movimientos = Movimiento.query.filter_by(producto_id=producto_id).order_by(Movimiento.fecha_hora.desc()).all()
-    return render_template('historial_producto.html', producto=producto, movimientos=movimientos)
+    producto = Producto.query.options(joinedload(Producto.estado)).get_or_404(producto_id)
+    movimientos = Movimiento.query.options(
+        joinedload(Movimiento.usuario), raiseload('*')
+    ).filter_by(producto_id=producto_id).order_by(Movimiento.fecha_hora.desc()).all()
+    ubicaciones = rfid_historial.estancias_producto(producto_id) if producto.rfid_tag else []
+    return render_template('historial_producto.html', producto=producto, movimientos=movimientos,
+                           ubicaciones=ubicaciones)
 
 
 
@@ -868,6 +1456,7 @@ from decorators import requiere_roles
 from flask import Flask, render_template, redirect, url_for, flash, request, Response, jsonify
 from flask_login import login_required, current_user
 from models import Producto, Estado, Movimiento, Usuario, RoleEnum
+from models import ResumenMovimientoDia, ResumenMovimientoUsuarioDia, ResumenMovimientoProductoDia
 from datetime import datetime, timedelta
 from io import BytesIO
 from reportlab.lib import colors
@@ -897,6 +1486,8 @@ All of this data is then passed to the 'reportes.html' template for rendering.
 @app.route('/reportes', methods=['GET'])
 @login_required
 @requiere_roles(RoleEnum.ADMIN.value, RoleEnum.PROFESOR.value)
+@presupuesto_consultas(8)
+@lectura.solo_lectura(retraso_maximo=300)
 def reportes():
     app.logger.debug("Accediendo a la ruta /reportes")
 
@@ -909,7 +1500,8 @@ def reportes():
     # Calcular estadísticas adicionales
     stats = calculate_stats(productos_disponibles, productos_prestados)
 
-    # Obtener datos analíticos
+    # Obtener datos analíticos (tablas resumen_movimiento_*)
+    rollups.refrescar_si_necesario()
     movimientos_por_usuario = get_movimientos_por_usuario()
     movimientos_por_dia = get_movimientos_por_dia(fecha_inicio, fecha_fin)
     productos_frecuentes = get_productos_frecuentes()
@@ -933,7 +1525,7 @@ def reportes():
         ultimos_movimientos=ultimos_movimientos,
         fecha_inicio=fecha_inicio,
         fecha_fin=fecha_fin,
-        estados=Estado.query.all(),
+        estados=registro_estados.todos(),
         estado_filter=estado_filter
     )
 
@@ -961,6 +1553,8 @@ def get_filter_parameters():
 
 """
 Obtain product statistics based on the state filter.
+
+    The per-estado product counts are read from the `contador` table.
     
     Args:
         estado_filter (str): The state filter to apply. If 'todos', retrieve statistics for both available and loaned products.
@@ -970,25 +1564,28 @@ Obtain product statistics based on the state filter.
 """    
 def get_product_statistics(estado_filter):
     if estado_filter == 'todos':
-        estado_disponible = Estado.query.filter_by(nombre='Disponible').first()
-        estado_prestado = Estado.query.filter_by(nombre='Prestado').first()
+        estado_disponible = registro_estados.por_nombre('Disponible')
+        estado_prestado = registro_estados.por_nombre('Prestado')
 
         if not estado_disponible or not estado_prestado:
             app.logger.error("Faltan estados necesarios en la tabla 'Estado'.")
             flash("Error interno: faltan estados necesarios.", "danger")
             return 0, 0
 
-        productos_disponibles = Producto.query.filter_by(estado_id=estado_disponible.id).count()
-        productos_prestados = Producto.query.filter_by(estado_id=estado_prestado.id).count()
+        conteos = counters.leer(
+            counters.clave_estado(estado_disponible.id), counters.clave_estado(estado_prestado.id)
+        )
+        productos_disponibles = conteos[counters.clave_estado(estado_disponible.id)]
+        productos_prestados = conteos[counters.clave_estado(estado_prestado.id)]
     else:
-        estado = Estado.query.filter_by(nombre=estado_filter).first()
+        estado = registro_estados.por_nombre(estado_filter)
         if not estado:
             app.logger.error(f"Estado '{estado_filter}' no encontrado en la tabla 'Estado'.")
             flash(f"Estado '{estado_filter}' no encontrado.", "warning")
             productos_disponibles = 0
             productos_prestados = 0
         else:
-            productos_disponibles = Producto.query.filter_by(estado_id=estado.id).count()
+            productos_disponibles = counters.leer(counters.clave_estado(estado.id))[counters.clave_estado(estado.id)]
             productos_prestados = 0  # Ajusta la lógica según sea necesario
 
     return productos_disponibles, productos_prestados
@@ -1005,7 +1602,7 @@ Calculate and return statistics about the available and loaned products.
         dict: A dictionary containing the total number of products, the number of available products, and the number of loaned products.
 """
 def calculate_stats(productos_disponibles, productos_prestados):
-    total_productos = Producto.query.count()
+    total_productos = counters.leer(counters.PRODUCTOS)[counters.PRODUCTOS]
     return {
         'total_productos': total_productos,
         'productos_disponibles': productos_disponibles,
@@ -1014,7 +1611,7 @@ def calculate_stats(productos_disponibles, productos_prestados):
 
 
 """
-Get movements grouped by user.
+Get movements grouped by user, summed from the daily per-user rollup.
     
     Returns:
         list: A list of tuples, where each tuple contains the user's name and the count of movements for that user.
@@ -1023,28 +1620,35 @@ Get movements grouped by user.
 def get_movimientos_por_usuario():
     return db.session.query(
         Usuario.nombre_usuario,
-        func.count(Movimiento.id)
-    ).join(Movimiento).group_by(Usuario.id).all()
+        func.sum(ResumenMovimientoUsuarioDia.total)
+    ).join(ResumenMovimientoUsuarioDia).group_by(Usuario.id).all()
 
 
 """
-    Get movements grouped by day.
+    Get movements grouped by day, read from the daily rollup.
     
     Args:
-        fecha_inicio (datetime): The start date for the date range.
-        fecha_fin (datetime): The end date for the date range.
+        fecha_inicio (str): The start date for the date range ('YYYY-MM-DD').
+        fecha_fin (str): The end date for the date range ('YYYY-MM-DD'), inclusive.
     
     Returns:
         list: A list of tuples, where each tuple contains the date (in the format 'YYYY-MM-DD') and the count of movements for that day.
 """
 def get_movimientos_por_dia(fecha_inicio, fecha_fin):
-    return db.session.query(
-        func.strftime('%Y-%m-%d', Movimiento.fecha_hora),
-        func.count(Movimiento.id)
-    ).filter(
-        Movimiento.fecha_hora >= fecha_inicio,
-        Movimiento.fecha_hora <= fecha_fin
-    ).group_by(func.strftime('%Y-%m-%d', Movimiento.fecha_hora)).all()
+    query = db.session.query(
+        ResumenMovimientoDia.fecha,
+        func.sum(ResumenMovimientoDia.total)
+    )
+    try:
+        query = query.filter(
+            ResumenMovimientoDia.fecha >= datetime.strptime(fecha_inicio, '%Y-%m-%d').date(),
+            ResumenMovimientoDia.fecha <= datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+        )
+    except ValueError:
+        flash('Formato de fecha inválido. Use AAAA-MM-DD.', 'warning')
+        return []
+    filas = query.group_by(ResumenMovimientoDia.fecha).order_by(ResumenMovimientoDia.fecha).all()
+    return [(fecha.strftime('%Y-%m-%d'), total) for fecha, total in filas]
 
 
 """
@@ -1066,9 +1670,10 @@ def get_movimientos_por_dia(fecha_inicio, fecha_fin):
          total count in descending order, and limited to the top 5 products.
 """
 def get_productos_frecuentes():
+    total = func.sum(ResumenMovimientoProductoDia.total)
     return db.session.query(
-        Producto, func.count(Movimiento.id).label('total')
-    ).join(Movimiento).group_by(Producto.id).order_by(func.count(Movimiento.id).desc()).limit(5).all()
+        Producto, total.label('total')
+    ).join(ResumenMovimientoProductoDia).group_by(Producto.id).order_by(total.desc()).limit(5).all()
 
 
 
@@ -1097,10 +1702,10 @@ def get_tiempo_prestamo_promedio():
             count in descending order, and limited to the top 5 products.
 """
 def get_productos_populares():
-
+    total = func.sum(ResumenMovimientoProductoDia.total)
     return db.session.query(
-        Producto.nombre, func.count(Movimiento.id).label('total')
-    ).join(Movimiento).group_by(Producto.id).order_by(func.count(Movimiento.id).desc()).limit(5).all()
+        Producto.nombre, total.label('total')
+    ).join(ResumenMovimientoProductoDia).group_by(Producto.id).order_by(total.desc()).limit(5).all()
 
 
 """
@@ -1112,144 +1717,120 @@ def get_productos_populares():
 """
 def get_ultimos_movimientos():
 
-    return Movimiento.query.order_by(Movimiento.fecha_hora.desc()).limit(10).all()
+    return Movimiento.query.options(
+        joinedload(Movimiento.producto), joinedload(Movimiento.usuario), raiseload('*')
+    ).order_by(Movimiento.fecha_hora.desc()).limit(10).all()
 
-from openpyxl import Workbook
 from datetime import timedelta
 import json
-from io import BytesIO
+import tempfile
+from flask import abort, send_file, stream_with_context
+from exports import (
+    consulta_movimientos_exportacion,
+    iterar_movimientos_exportacion,
+    generar_csv,
+    generar_json,
+    generar_ndjson
+)
+from jobs import escribir_excel
 
 """
 Export movements report in various formats.
 
-This function handles the export of the movements report in different formats, such as Excel, JSON, and CSV. It retrieves the movements from the database, orders them by the most recent, and then generates the appropriate output based on the requested format.
+This function handles the export of the movements report in different formats, such as Excel, JSON, NDJSON and CSV. The movements are read with a single joined query (see `exports.consulta_movimientos_exportacion`) in server-side chunks, and the CSV, JSON and NDJSON outputs are streamed to the client through a generator, so worker memory stays flat whatever the size of the `movimiento` table. The Excel workbook is written in openpyxl's write-only mode to a temporary file (see `jobs.escribir_excel`), which is streamed back and deleted once sent, so it is never held in memory either.
+
+The optional query parameters `fecha_inicio`, `fecha_fin` (YYYY-MM-DD, inclusive) and `estado` match the filters of the /reportes page. When omitted the whole history is exported.
 
 Args:
-    formato (str): The requested format for the report, can be 'excel', 'json', or 'csv'.
+    formato (str): The requested format for the report, can be 'excel', 'json', 'ndjson' or 'csv'.
 
 Returns:
     Response: A response object containing the generated report in the requested format, with the appropriate content type and headers.
 """
 @app.route('/reportes/exportar/<formato>')
 @requiere_roles(RoleEnum.ADMIN.value)
+@presupuesto_consultas(2)
+@lectura.solo_lectura(retraso_maximo=300)
 def exportar_reportes(formato):
-    movimientos = Movimiento.query.order_by(Movimiento.fecha_hora.desc()).all()
-    
+    try:
+        stmt = consulta_movimientos_exportacion(
+            request.args.get('fecha_inicio'),
+            request.args.get('fecha_fin'),
+            request.args.get('estado', 'todos')
+        )
+    except ValueError:
+        flash('Formato de fecha inválido. Use AAAA-MM-DD.', 'danger')
+        return redirect(url_for('reportes'))
+
     if formato == 'excel':
-        wb = Workbook()
-        ws = wb.active
-        ws.append(['Fecha', 'Producto', 'Usuario', 'Estado Anterior', 'Estado Nuevo'])
-        
-        for mov in movimientos:
-            ws.append([
-                mov.fecha_hora.strftime('%Y-%m-%d %H:%M'),
-                mov.producto.nombre,
-                mov.usuario.nombre_usuario,
-                mov.estado_anterior,
-                mov.estado_nuevo
-            ])
-            
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
-        
-        return Response(
-            output.getvalue(),
+        # Unnamed temporary file: removed by the OS when send_file closes it.
+        archivo = tempfile.TemporaryFile()
+        try:
+            escribir_excel(iterar_movimientos_exportacion(stmt), archivo)
+            archivo.seek(0)
+        except Exception:
+            archivo.close()
+            raise
+        return send_file(
+            archivo,
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_movimientos.xlsx'}
+            as_attachment=True,
+            download_name='reporte_movimientos.xlsx'
         )
         
     elif formato == 'json':
-        data = [{
-            'fecha': mov.fecha_hora.strftime('%Y-%m-%d %H:%M'),
-            'producto': mov.producto.nombre,
-            'usuario': mov.usuario.nombre_usuario,
-            'estado_anterior': mov.estado_anterior,
-            'estado_nuevo': mov.estado_nuevo
-        } for mov in movimientos]
-        
-        return jsonify(data)
+        return Response(
+            stream_with_context(generar_json(stmt)),
+            mimetype='application/json',
+            headers={'Content-Disposition': 'attachment; filename=reporte_movimientos.json'}
+        )
+
+    elif formato == 'ndjson':
+        return Response(
+            stream_with_context(generar_ndjson(stmt)),
+            mimetype='application/x-ndjson',
+            headers={'Content-Disposition': 'attachment; filename=reporte_movimientos.ndjson'}
+        )
     
     elif formato == 'csv':
-        from io import StringIO
-        import csv
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['Fecha', 'Producto', 'Usuario', 'Estado Anterior', 'Estado Nuevo'])
-        
-        for mov in movimientos:
-            writer.writerow([
-                mov.fecha_hora.strftime('%Y-%m-%d %H:%M'),
-                mov.producto.nombre,
-                mov.usuario.nombre_usuario,
-                mov.estado_anterior,
-                mov.estado_nuevo
-            ])
-        
         return Response(
-            output.getvalue(),
+            stream_with_context(generar_csv(stmt)),
             mimetype='text/csv',
             headers={'Content-Disposition': 'attachment; filename=reporte_movimientos.csv'}
         )
 
+    abort(404)
+
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 from io import BytesIO
+from pdf_report import render_pdf_paginado
+from flask import send_file
+from jobs import FORMATOS_TRABAJO, encolar_trabajo, serializar_trabajo
+from models import TrabajoExportacion
 
 
 """
 Exports a PDF report of all product movements, including the date, product, user, and previous and new states.
 
-This function requires the ADMIN role to access. It generates a PDF report using the ReportLab library, with a table displaying the movement details.
+This function requires the ADMIN role to access. It generates a PDF report using the ReportLab library, with the movement details split into fixed-size page tables with repeated headers (see `pdf_report.render_pdf_paginado`). Rows beyond `pdf_report.MAX_FILAS_PDF` are summarised in an appendix.
+For large histories submit a background job instead (POST /reportes/jobs with tipo=pdf).
 
 The report is downloaded as an attachment with the filename "reporte_movimientos.pdf".
 """
 @app.route('/reportes/exportar/pdf')
 @requiere_roles(RoleEnum.ADMIN.value)
+@lectura.solo_lectura(retraso_maximo=300)
 def exportar_pdf():
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Title
-    elements.append(Paragraph("Reporte de Movimientos", styles['Heading1']))
-    elements.append(Spacer(1, 12))
-    
-    # Table data
-    data = [['Fecha', 'Producto', 'Usuario', 'Estado Anterior', 'Estado Nuevo']]
-    movimientos = Movimiento.query.order_by(Movimiento.fecha_hora.desc()).all()
-    
-    for mov in movimientos:
-        data.append([
-            mov.fecha_hora.strftime('%Y-%m-%d %H:%M'),
-            mov.producto.nombre,
-            mov.usuario.nombre_usuario,
-            mov.estado_anterior,
-            mov.estado_nuevo
-        ])
-    
-    # Create table
-    t = Table(data)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 14),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (0, 1), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-    ]))
-    
-    elements.append(t)
-    doc.build(elements)
+    stmt = consulta_movimientos_exportacion()
+    render_pdf_paginado(
+        (fila for filas in iterar_movimientos_exportacion(stmt) for fila in filas),
+        buffer,
+        procesos=app.config['PDF_RENDER_PROCESSES']
+    )
     
     buffer.seek(0)
     return Response(
@@ -1260,6 +1841,410 @@ def exportar_pdf():
 
 
 
+"""
+Submits a background export job for the movements report.
+
+Excel and PDF reports of a large history take minutes to build, so they are
+produced by a process pool (see `jobs.py`) instead of inside the request.
+The body (form or JSON) takes `tipo` ('excel' or 'pdf') and the optional
+`fecha_inicio`, `fecha_fin` and `estado` filters used by the streaming exports.
+
+Returns:
+    A 202 JSON response with the job status and the URLs to poll and download it.
+"""
+@app.route('/reportes/jobs', methods=['POST'])
+@requiere_roles(RoleEnum.ADMIN.value)
+def crear_trabajo_exportacion():
+    datos = request.get_json(silent=True) or request.form
+    tipo = datos.get('tipo')
+    if tipo not in FORMATOS_TRABAJO:
+        return jsonify({'error': f'Tipo de exportación no soportado: {tipo}'}), 400
+
+    parametros = {clave: datos.get(clave) for clave in ('fecha_inicio', 'fecha_fin', 'estado') if datos.get(clave)}
+    try:
+        consulta_movimientos_exportacion(**parametros)
+    except ValueError:
+        return jsonify({'error': 'Formato de fecha inválido. Use AAAA-MM-DD.'}), 400
+
+    trabajo = TrabajoExportacion(
+        tipo=tipo,
+        parametros=json.dumps(parametros),
+        usuario_id=current_user.id
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+    encolar_trabajo(app, trabajo)
+
+    respuesta = serializar_trabajo(trabajo)
+    respuesta['url_estado'] = url_for('estado_trabajo_exportacion', trabajo_id=trabajo.id)
+    respuesta['url_descarga'] = url_for('descargar_trabajo_exportacion', trabajo_id=trabajo.id)
+    return jsonify(respuesta), 202
+
+
+"""
+Returns the state and progress of a background export job as JSON.
+
+Args:
+    trabajo_id (int): The ID of the export job.
+"""
+@app.route('/reportes/jobs/<int:trabajo_id>')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estado_trabajo_exportacion(trabajo_id):
+    trabajo = TrabajoExportacion.query.get_or_404(trabajo_id)
+    return jsonify(serializar_trabajo(trabajo))
+
+
+"""
+Downloads the file produced by a completed background export job.
+
+Args:
+    trabajo_id (int): The ID of the export job.
+
+Returns:
+    The generated report as an attachment, or a 409 JSON response while the job is not completed.
+"""
+@app.route('/reportes/jobs/<int:trabajo_id>/descargar')
+@requiere_roles(RoleEnum.ADMIN.value)
+def descargar_trabajo_exportacion(trabajo_id):
+    trabajo = TrabajoExportacion.query.get_or_404(trabajo_id)
+    if trabajo.estado != 'completado' or not trabajo.ruta_archivo or not os.path.exists(trabajo.ruta_archivo):
+        return jsonify(serializar_trabajo(trabajo)), 409
+
+    extension, mimetype = FORMATOS_TRABAJO[trabajo.tipo]
+    return send_file(
+        trabajo.ruta_archivo,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=f'reporte_movimientos.{extension}'
+    )
+
+
+from decorators import requiere_token_lector
+from indice_rfid import indice_tags
+from ocupacion import ocupacion
+import rfid
+
+filtro_rebote = rfid.FiltroRebote(
+    ventana_segundos=app.config['RFID_VENTANA_REBOTE_SEGUNDOS'],
+    capacidad=app.config['RFID_REBOTE_CAPACIDAD']
+)
+
+
+"""
+Ingests a batch of RFID reads from the readers.
+
+The JSON body is either an array of reads or an object with a `lecturas`
+array. Each read is `{"rfid_tag", "lector_id", "ubicacion", "timestamp"}`
+or the same four values as an array; `timestamp` is ISO 8601 or epoch
+seconds (UTC). Known tags are stored in `escaneo_rfid` and move the
+product's `ultimo_escaneo`/`ubicacion_actual` forward (see `rfid.ingerir_escaneos`);
+malformed reads and unknown tags are listed in `rechazos`. Repeated reads of
+a tag by the same reader within `RFID_VENTANA_REBOTE_SEGUNDOS` are counted in
+`suprimidas` but not stored, unless the location changed.
+
+Readers authenticate with the `X-Lector-Token` header. The route is exempt
+from the default rate limits because readers post continuously.
+
+Returns:
+    A JSON report with the received, accepted and rejected counts, or 400/413
+    if the body is not a list of reads or exceeds `rfid.LOTE_MAXIMO`.
+"""
+@app.route('/api/rfid/escaneos', methods=['POST'])
+@limiter.exempt
+@requiere_token_lector
+def ingerir_escaneos_rfid():
+    datos = request.get_json(silent=True)
+    if isinstance(datos, dict):
+        datos = datos.get('lecturas')
+    if not isinstance(datos, list):
+        return jsonify({'error': 'Se esperaba una lista de lecturas.'}), 400
+    if len(datos) > rfid.LOTE_MAXIMO:
+        return jsonify({'error': f'El lote supera el máximo de {rfid.LOTE_MAXIMO} lecturas.'}), 413
+
+    informe = rfid.ingerir_escaneos(datos, filtro=filtro_rebote)
+    if informe['rechazadas']:
+        app.logger.warning(f"Lote RFID: {informe['rechazadas']} de {informe['recibidas']} lecturas rechazadas")
+    return jsonify(informe)
+
+
+"""
+Returns the latest RFID dwell intervals of a product as JSON, newest first.
+
+Query parameters:
+    limite (int): Number of intervals to return (default 50, maximum 200).
+"""
+@app.route('/api/rfid/productos/<int:producto_id>/ubicaciones')
+@login_required
+def ubicaciones_producto(producto_id):
+    producto = Producto.query.get_or_404(producto_id)
+    estancias = rfid_historial.estancias_producto(producto.id, limite=obtener_limite())
+    for estancia in estancias:
+        estancia.pop('id', None)
+        estancia['primera_lectura'] = estancia['primera_lectura'].isoformat()
+        estancia['ultima_lectura'] = estancia['ultima_lectura'].isoformat()
+    return jsonify({'producto_id': producto.id, 'rfid_tag': producto.rfid_tag, 'ubicaciones': estancias})
+
+
+"""
+Returns how many products are at each location right now, as JSON.
+
+Served from the worker's in-memory occupancy map (see `ocupacion.py`),
+which catches up with other processes' scans at most every few seconds.
+"""
+@app.route('/api/ubicaciones')
+@login_required
+def conteos_ubicaciones():
+    ocupacion.sincronizar()
+    conteos = ocupacion.conteos()
+    return jsonify({'ubicaciones': conteos, 'total': sum(conteos.values())})
+
+
+"""
+Returns the ids of the products currently at a location, as JSON.
+
+Query parameters:
+    ubicacion (str): The location, as reported by the RFID readers.
+"""
+@app.route('/api/ubicaciones/contenido')
+@login_required
+def contenido_ubicacion():
+    ubicacion = request.args.get('ubicacion')
+    if not ubicacion:
+        return jsonify({'error': 'Falta el parámetro ubicacion.'}), 400
+    ocupacion.sincronizar()
+    productos = ocupacion.contenido(ubicacion)
+    return jsonify({'ubicacion': ubicacion, 'total': len(productos), 'productos': productos})
+
+
+"""
+Lists the products whose last RFID scan is older than N hours, oldest first.
+
+Query parameters:
+    horas (float): Hours without a scan (default 24, more than 0 and at
+        most a year; anything else is a 400).
+    limite (int): Maximum products listed (default 50, maximum 200); `total`
+        always counts all of them.
+"""
+@app.route('/api/ubicaciones/sin-ver')
+@login_required
+def productos_sin_ver():
+    horas = request.args.get('horas', 24, type=float)
+    # Also rejects nan and inf, which timedelta cannot take.
+    if not 0 < horas <= 24 * 365:
+        return jsonify({'error': 'El parámetro horas debe estar entre 0 y 8760.'}), 400
+    desde = datetime.utcnow() - timedelta(hours=horas)
+    ocupacion.sincronizar()
+    productos = ocupacion.sin_ver(desde, limite=obtener_limite())
+    return jsonify({
+        'horas': horas,
+        'total': ocupacion.contar_sin_ver(desde),
+        'productos': [
+            {'producto_id': producto_id, 'ubicacion': ubicacion, 'ultimo_escaneo': ultimo_escaneo.isoformat()}
+            for producto_id, ubicacion, ultimo_escaneo in productos
+        ]
+    })
+
+
+"""
+Returns this worker's RFID ingestion statistics as JSON: the debounce filter
+(stored and suppressed reads, evicted keys) and the tag index (size, hit
+rate, approximate memory).
+"""
+@app.route('/api/rfid/estadisticas')
+@requiere_roles(RoleEnum.ADMIN.value)
+def estadisticas_rfid():
+    return jsonify({
+        'rebote': filtro_rebote.estadisticas(),
+        'indice_tags': indice_tags.estadisticas()
+    })
+
+
+import io
+
+from flask import g
+
+import barridos
+from models import BarridoInventario
+
+
+def _anadir_lecturas_barrido(barrido, tags):
+    escritas = barridos.anadir_lecturas(barridos.ruta_lecturas(app.config['BARRIDOS_DIR'], barrido.id), tags)
+    barrido.total_lecturas += escritas
+    db.session.commit()
+    return escritas
+
+
+def _conciliar_barrido(barrido, corregir):
+    estado_prestado = registro_estados.por_nombre('Prestado')
+    informe = barridos.ejecutar_conciliacion(
+        barrido,
+        app.config['BARRIDOS_DIR'],
+        estado_excluido_id=estado_prestado.id if estado_prestado else None,
+        corregir=corregir
+    )
+    if informe['corregidos']:
+        detalle = f"Barrido {barrido.id} en {barrido.ubicacion}: {informe['corregidos']} ubicaciones corregidas"
+        usuario_id = None
+        if not current_user.is_authenticated:
+            # Handhelds authenticate with a reader token, not as a user.
+            usuario_id = auditoria.usuario_lectores()
+            detalle += f" (lector {auditoria.huella_token(g.token_lector)})"
+        auditoria.registrar('Conciliación de inventario', detalle, usuario_id=usuario_id, sincrono=True)
+    db.session.commit()
+    barridos.publicar_correcciones(informe)
+    respuesta = barridos.serializar_barrido(barrido)
+    respuesta['url_informe'] = url_for('informe_barrido', barrido_id=barrido.id)
+    return respuesta
+
+
+def _es_verdadero(valor):
+    return str(valor).lower() in ('1', 'true', 'si', 'sí', 'on')
+
+
+"""
+Opens a handheld inventory sweep of a location.
+
+The body is JSON (`{"ubicacion": ..., "lecturas": [tags]}`, `lecturas`
+optional) to start a sweep whose reads arrive in later batches, or a
+multipart form with `ubicacion`, the sweep file in `archivo` (one tag per
+line, or a CSV with an `rfid_tag` column) and an optional `corregir` flag,
+which stores and reconciles the whole sweep in one request.
+
+Handhelds authenticate like the fixed readers (`X-Lector-Token`) or with an
+admin session.
+
+Returns:
+    A 201 JSON response with the sweep summary; for file uploads it is
+    already reconciled and includes the report URL.
+"""
+@app.route('/api/rfid/barridos', methods=['POST'])
+@limiter.exempt
+@requiere_token_lector
+def crear_barrido():
+    datos = request.get_json(silent=True) or request.form
+    ubicacion = (datos.get('ubicacion') or '').strip()
+    if not ubicacion:
+        return jsonify({'error': 'Falta la ubicación del barrido.'}), 400
+    lecturas = (datos.get('lecturas') or []) if request.is_json else []
+    if not isinstance(lecturas, list) or len(lecturas) > barridos.LOTE_MAXIMO:
+        return jsonify({'error': f'Se esperaba una lista de hasta {barridos.LOTE_MAXIMO} tags.'}), 400
+
+    barrido = BarridoInventario(
+        ubicacion=ubicacion,
+        total_lecturas=0,
+        usuario_id=current_user.id if current_user.is_authenticated else None
+    )
+    db.session.add(barrido)
+    db.session.commit()
+
+    archivo = request.files.get('archivo')
+    if archivo is not None:
+        _anadir_lecturas_barrido(barrido, barridos.leer_tags(io.TextIOWrapper(archivo.stream, encoding='utf-8')))
+        return jsonify(_conciliar_barrido(barrido, _es_verdadero(datos.get('corregir')))), 201
+    if lecturas:
+        _anadir_lecturas_barrido(barrido, (str(tag).strip() for tag in lecturas))
+    return jsonify(barridos.serializar_barrido(barrido)), 201
+
+
+"""
+Appends a batch of tag reads to an open sweep.
+
+The body is a JSON array of tags (or `{"lecturas": [...]}`, at most
+`barridos.LOTE_MAXIMO`), or a text body with one tag per line, which is
+streamed to the sweep's read file without being held in memory.
+
+Returns:
+    A JSON response with the tags added and the sweep total, or 409 if the
+    sweep was already reconciled.
+"""
+@app.route('/api/rfid/barridos/<int:barrido_id>/lecturas', methods=['POST'])
+@limiter.exempt
+@requiere_token_lector
+def anadir_lecturas_barrido(barrido_id):
+    barrido = BarridoInventario.query.get_or_404(barrido_id)
+    if barrido.estado != 'abierto':
+        return jsonify({'error': 'El barrido ya está conciliado.'}), 409
+
+    if request.is_json:
+        datos = request.get_json(silent=True)
+        if isinstance(datos, dict):
+            datos = datos.get('lecturas')
+        if not isinstance(datos, list):
+            return jsonify({'error': 'Se esperaba una lista de tags.'}), 400
+        if len(datos) > barridos.LOTE_MAXIMO:
+            return jsonify({'error': f'El lote supera el máximo de {barridos.LOTE_MAXIMO} tags.'}), 413
+        tags = (str(tag).strip() for tag in datos)
+    else:
+        tags = barridos.leer_tags(io.TextIOWrapper(request.stream, encoding='utf-8'))
+
+    escritas = _anadir_lecturas_barrido(barrido, tags)
+    return jsonify({'barrido_id': barrido.id, 'anadidas': escritas, 'total_lecturas': barrido.total_lecturas})
+
+
+"""
+Reconciles an open sweep against the products recorded at its location.
+
+Every tagged product is read in one streaming pass and compared with the
+sweep's tags (see `barridos.conciliar`): products expected there but not
+read (loaned products excepted), products read there but recorded
+elsewhere, and tags of no product. The full lists go to a JSON report.
+
+With `corregir` (form, JSON or query string) the misplaced products are
+moved to the swept location in bulk and the change is audited in the
+same transaction; corrections requested with a reader token are attributed
+to the inactive `auditoria.USUARIO_LECTORES` account, with the token's
+fingerprint in the detail.
+
+Returns:
+    A JSON response with the sweep counts and the report URL, or 409 if
+    the sweep was already reconciled.
+"""
+@app.route('/api/rfid/barridos/<int:barrido_id>/conciliar', methods=['POST'])
+@limiter.exempt
+@requiere_token_lector
+def conciliar_barrido(barrido_id):
+    barrido = BarridoInventario.query.get_or_404(barrido_id)
+    if barrido.estado != 'abierto':
+        return jsonify({'error': 'El barrido ya está conciliado.'}), 409
+    datos = request.get_json(silent=True) or request.form
+    corregir = _es_verdadero(datos.get('corregir', request.args.get('corregir')))
+    return jsonify(_conciliar_barrido(barrido, corregir))
+
+
+"""
+Returns the summary of a sweep as JSON.
+
+Args:
+    barrido_id (int): The ID of the sweep.
+"""
+@app.route('/api/rfid/barridos/<int:barrido_id>')
+@requiere_token_lector
+def estado_barrido(barrido_id):
+    barrido = BarridoInventario.query.get_or_404(barrido_id)
+    return jsonify(barridos.serializar_barrido(barrido))
+
+
+"""
+Downloads the JSON reconciliation report of a sweep, with the missing,
+misplaced and unexpected lists.
+
+Returns:
+    The report file, or a 409 JSON response while the sweep is not reconciled.
+"""
+@app.route('/api/rfid/barridos/<int:barrido_id>/informe')
+@requiere_token_lector
+def informe_barrido(barrido_id):
+    barrido = BarridoInventario.query.get_or_404(barrido_id)
+    if barrido.estado != 'conciliado' or not barrido.ruta_informe or not os.path.exists(barrido.ruta_informe):
+        return jsonify(barridos.serializar_barrido(barrido)), 409
+    return send_file(
+        barrido.ruta_informe,
+        mimetype='application/json',
+        as_attachment=True,
+        download_name=f'barrido_{barrido.id}.json'
+    )
+
+
 """
     Initializes the required product states in the database.
     
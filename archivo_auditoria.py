@@ -0,0 +1,352 @@
+# archivo_auditoria.py
+"""
+Archival of old ``auditoria`` rows to immutable compressed segment files.
+
+Rows older than the retention window are moved, one calendar month at a
+time, into a gzip NDJSON segment ``auditoria_<YYYY-MM>_<first id>.ndjson.gz``
+written next to a sidecar index ``<segment>.idx.json``. The segment is a
+series of independent gzip members (blocks) of ``TAMANO_BLOQUE`` rows in
+``(fecha_hora, id)`` order, so it is still a plain gzip file for ``zcat``;
+the index records each block's byte range, date and id range and the
+usuario ids and acciones it contains, so a search only decompresses the
+blocks that can match.
+
+The index is renamed into place last and is what makes a segment visible.
+Archived rows are then deleted from ``auditoria`` in short batches; a run
+interrupted between the two finishes the deletes the next time.
+
+Usage: python archivo_auditoria.py [--dias N] [--vacuum]
+"""
+import gzip
+import itertools
+import json
+import os
+import threading
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select, text, tuple_
+
+from comun import config
+from extensions import db
+from models import Auditoria
+
+# Rows per gzip member; the unit a search decompresses.
+TAMANO_BLOQUE = 1000
+# Rows read, or deleted once archived, per ``auditoria`` transaction.
+TAMANO_LOTE = 5000
+# Ids per DELETE ... WHERE id IN (...), kept well below SQLite's bound-parameter limit.
+TAMANO_BLOQUE_SQL = 500
+SUFIJO_SEGMENTO = '.ndjson.gz'
+SUFIJO_INDICE = '.idx.json'
+COLUMNAS = ('id', 'usuario_id', 'accion', 'fecha_hora', 'detalle', 'ip_address', 'user_agent')
+
+
+def directorio_archivo():
+    return config('AUDITORIA_ARCHIVO_DIR', os.path.join('instance', 'auditoria_archivo'))
+
+
+class AuditoriaArchivada:
+    """An archived audit event, with the attributes the audit views read from an `Auditoria`."""
+
+    __slots__ = COLUMNAS + ('usuario',)
+    archivada = True
+
+    def __init__(self, fila):
+        for columna in COLUMNAS:
+            setattr(self, columna, fila.get(columna))
+        self.fecha_hora = datetime.fromisoformat(self.fecha_hora)
+        self.usuario = None
+
+
+def _inicio_mes(fecha):
+    return datetime(fecha.year, fecha.month, 1)
+
+
+def _mes_siguiente(inicio):
+    return datetime(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+
+
+def _escribir_segmento(filas, directorio, mes):
+    """
+    Write ``filas`` (dicts in key order, any iterable) as a segment and its index.
+
+    Rows are consumed one block at a time, so a month is never held in
+    memory. Returns the ids written, or an empty list if there were no rows.
+    """
+    os.makedirs(directorio, exist_ok=True)
+    temporal = os.path.join(directorio, f'.auditoria_{mes}.tmp')
+    filas = iter(filas)
+    ids = []
+    bloques = []
+    uso_usuarios = Counter()
+    with open(temporal, 'wb') as archivo:
+        while True:
+            bloque = list(itertools.islice(filas, TAMANO_BLOQUE))
+            if not bloque:
+                break
+            datos = gzip.compress(
+                ''.join(json.dumps(fila, ensure_ascii=False) + '\n' for fila in bloque).encode('utf-8'),
+                mtime=0
+            )
+            bloques.append({
+                'offset': archivo.tell(),
+                'bytes': len(datos),
+                'filas': len(bloque),
+                'desde': [bloque[0]['fecha_hora'], bloque[0]['id']],
+                'hasta': [bloque[-1]['fecha_hora'], bloque[-1]['id']],
+                'id_min': min(fila['id'] for fila in bloque),
+                'id_max': max(fila['id'] for fila in bloque),
+                'usuarios': sorted({fila['usuario_id'] for fila in bloque}),
+                'acciones': sorted({fila['accion'] for fila in bloque}),
+            })
+            ids.extend(fila['id'] for fila in bloque)
+            uso_usuarios.update(fila['usuario_id'] for fila in bloque)
+            archivo.write(datos)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    if not bloques:
+        os.remove(temporal)
+        return ids
+
+    nombre = f'auditoria_{mes}_{min(ids):09d}{SUFIJO_SEGMENTO}'
+    os.replace(temporal, os.path.join(directorio, nombre))
+    indice = {
+        'segmento': nombre,
+        'mes': mes,
+        'filas': len(ids),
+        'desde': bloques[0]['desde'],
+        'hasta': bloques[-1]['hasta'],
+        'id_min': min(ids),
+        'id_max': max(ids),
+        'por_usuario': {str(usuario_id): total for usuario_id, total in uso_usuarios.items()},
+        'bloques': bloques,
+        'fecha_archivo': datetime.utcnow().isoformat(),
+    }
+    destino = os.path.join(directorio, nombre + SUFIJO_INDICE)
+    with open(destino + '.tmp', 'w', encoding='utf-8') as archivo:
+        json.dump(indice, archivo, ensure_ascii=False)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(destino + '.tmp', destino)
+    return ids
+
+
+def _borrar(ids, session):
+    for inicio in range(0, len(ids), TAMANO_LOTE):
+        lote = ids[inicio:inicio + TAMANO_LOTE]
+        for desde in range(0, len(lote), TAMANO_BLOQUE_SQL):
+            session.execute(
+                delete(Auditoria)
+                .where(Auditoria.id.in_(lote[desde:desde + TAMANO_BLOQUE_SQL]))
+                .execution_options(synchronize_session=False)
+            )
+        session.commit()
+
+
+def _completar_borrados(directorio, session):
+    """Delete rows left in ``auditoria`` by a run that stopped after writing their segment."""
+    completados = 0
+    for indice in catalogo.indices(directorio):
+        desde = datetime.fromisoformat(indice['desde'][0])
+        hasta = datetime.fromisoformat(indice['hasta'][0])
+        quedan = session.scalar(
+            select(Auditoria.id)
+            .where(Auditoria.fecha_hora.between(desde, hasta),
+                   Auditoria.id.between(indice['id_min'], indice['id_max']))
+            .limit(1)
+        )
+        if quedan is None:
+            continue
+        ids = [fila['id'] for bloque in indice['bloques'] for fila in _leer_bloque(directorio, indice, bloque)]
+        _borrar(ids, session)
+        completados += len(ids)
+    return completados
+
+
+def _filas_periodo(session, inicio, fin):
+    """Yield the rows with ``inicio <= fecha_hora < fin`` as dicts in key order, one short transaction per batch."""
+    tabla = Auditoria.__table__
+    clave = tuple_(tabla.c.fecha_hora, tabla.c.id)
+    ultima = None
+    while True:
+        consulta = (
+            select(*(tabla.c[columna] for columna in COLUMNAS))
+            .where(tabla.c.fecha_hora >= inicio, tabla.c.fecha_hora < fin)
+            .order_by(tabla.c.fecha_hora, tabla.c.id)
+            .limit(TAMANO_LOTE)
+        )
+        if ultima is not None:
+            consulta = consulta.where(clave > tuple_(*ultima))
+        filas = session.execute(consulta).mappings().all()
+        session.commit()
+        for fila in filas:
+            yield {**fila, 'fecha_hora': fila['fecha_hora'].isoformat()}
+        if len(filas) < TAMANO_LOTE:
+            return
+        ultima = (filas[-1]['fecha_hora'], filas[-1]['id'])
+
+
+def archivar(retencion_dias, directorio=None, session=None):
+    """
+    Move ``auditoria`` rows older than ``retencion_dias`` days to segment files.
+
+    Each month is read in key order, ``TAMANO_LOTE`` rows per short read
+    transaction, into a new segment, and only then deleted in transactions
+    of ``TAMANO_LOTE`` rows, so writers are never blocked for long.
+    Segments are never modified: a later run over the same month adds
+    another one.
+
+    Returns:
+        int: The number of rows archived.
+    """
+    session = session or db.session
+    directorio = directorio or directorio_archivo()
+    _completar_borrados(directorio, session)
+    corte = datetime.utcnow() - timedelta(days=retencion_dias)
+    archivadas = 0
+    while True:
+        primera = session.scalar(select(func.min(Auditoria.fecha_hora)).where(Auditoria.fecha_hora < corte))
+        if primera is None:
+            return archivadas
+        inicio = _inicio_mes(primera)
+        fin = min(_mes_siguiente(inicio), corte)
+        ids = _escribir_segmento(
+            _filas_periodo(session, inicio, fin),
+            directorio,
+            f'{inicio:%Y-%m}'
+        )
+        session.commit()
+        _borrar(ids, session)
+        archivadas += len(ids)
+
+
+def _leer_bloque(directorio, indice, bloque):
+    with open(os.path.join(directorio, indice['segmento']), 'rb') as archivo:
+        archivo.seek(bloque['offset'])
+        datos = zlib.decompress(archivo.read(bloque['bytes']), wbits=31)
+    return [json.loads(linea) for linea in datos.decode('utf-8').splitlines()]
+
+
+class CatalogoArchivo:
+    """
+    Worker-local cache of the segment indexes of an archive directory.
+
+    Indexes are reloaded only when the directory listing changes, so a
+    search costs one ``scandir`` plus the blocks it decompresses.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._indices = {}
+
+    def indices(self, directorio):
+        """Return the indexes of every visible segment, oldest first."""
+        try:
+            nombres = sorted(
+                entrada.name for entrada in os.scandir(directorio) if entrada.name.endswith(SUFIJO_INDICE)
+            )
+        except FileNotFoundError:
+            return []
+        with self._lock:
+            cache = self._indices.setdefault(directorio, {})
+            for nombre in nombres:
+                if nombre not in cache:
+                    with open(os.path.join(directorio, nombre), encoding='utf-8') as archivo:
+                        cache[nombre] = json.load(archivo)
+            for nombre in set(cache) - set(nombres):
+                del cache[nombre]
+            return [cache[nombre] for nombre in nombres]
+
+    def total(self, directorio=None):
+        """Number of archived rows."""
+        return sum(indice['filas'] for indice in self.indices(directorio or directorio_archivo()))
+
+    def conteo_por_usuario(self, usuario_ids, directorio=None):
+        """``{usuario_id: archived rows}`` for the given users, read from the indexes only."""
+        conteo = Counter()
+        claves = {str(usuario_id): usuario_id for usuario_id in usuario_ids}
+        for indice in self.indices(directorio or directorio_archivo()):
+            for clave, usuario_id in claves.items():
+                conteo[usuario_id] += indice['por_usuario'].get(clave, 0)
+        return {usuario_id: total for usuario_id, total in conteo.items() if total}
+
+    def buscar(self, limite, antes_de=None, despues_de=None, usuario_id=None, accion=None,
+               fecha_desde=None, fecha_hasta=None, directorio=None):
+        """
+        Return up to ``limite`` archived events, newest first, as `AuditoriaArchivada`.
+
+        ``antes_de`` and ``despues_de`` are exclusive ``(fecha_hora, id)``
+        bounds (keyset cursors); ``fecha_desde`` is inclusive and
+        ``fecha_hasta`` exclusive. Blocks whose index entry rules them out
+        are never read, and blocks are visited newest first until no
+        remaining block can hold a newer match than the ones found.
+        """
+        directorio = directorio or directorio_archivo()
+        bloques = []
+        for indice in self.indices(directorio):
+            for bloque in indice['bloques']:
+                desde = (datetime.fromisoformat(bloque['desde'][0]), bloque['desde'][1])
+                hasta = (datetime.fromisoformat(bloque['hasta'][0]), bloque['hasta'][1])
+                if antes_de is not None and desde >= antes_de:
+                    continue
+                if despues_de is not None and hasta <= despues_de:
+                    continue
+                if fecha_desde is not None and hasta[0] < fecha_desde:
+                    continue
+                if fecha_hasta is not None and desde[0] >= fecha_hasta:
+                    continue
+                if usuario_id is not None and usuario_id not in bloque['usuarios']:
+                    continue
+                if accion is not None and accion not in bloque['acciones']:
+                    continue
+                bloques.append((hasta, indice, bloque))
+        bloques.sort(key=lambda entrada: entrada[0], reverse=True)
+
+        encontrados = []
+        for hasta, indice, bloque in bloques:
+            if len(encontrados) >= limite and hasta < encontrados[limite - 1][0]:
+                break
+            for fila in _leer_bloque(directorio, indice, bloque):
+                evento = AuditoriaArchivada(fila)
+                clave = (evento.fecha_hora, evento.id)
+                if ((antes_de is None or clave < antes_de)
+                        and (despues_de is None or clave > despues_de)
+                        and (fecha_desde is None or evento.fecha_hora >= fecha_desde)
+                        and (fecha_hasta is None or evento.fecha_hora < fecha_hasta)
+                        and (usuario_id is None or evento.usuario_id == usuario_id)
+                        and (accion is None or evento.accion == accion)):
+                    encontrados.append((clave, evento))
+            encontrados.sort(key=lambda entrada: entrada[0], reverse=True)
+            del encontrados[limite:]
+        return [evento for _, evento in encontrados]
+
+
+catalogo = CatalogoArchivo()
+
+
+def vacuum(session=None):
+    """Rebuild the database file so the space freed by archival is returned to the OS."""
+    session = session or db.session
+    session.commit()
+    with session.get_bind().connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text('VACUUM'))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from app import app
+
+    parser = argparse.ArgumentParser(description='Archiva auditorías antiguas en segmentos comprimidos.')
+    parser.add_argument('--dias', type=int, default=None,
+                        help='días de auditoría que se conservan en la tabla (por defecto AUDITORIA_RETENCION_DIAS)')
+    parser.add_argument('--vacuum', action='store_true', help='compactar la base de datos al terminar')
+    args = parser.parse_args()
+
+    with app.app_context():
+        dias = args.dias if args.dias is not None else app.config['AUDITORIA_RETENCION_DIAS']
+        print(f'Auditorías archivadas (> {dias} días): {archivar(dias)}')
+        if args.vacuum:
+            vacuum()
@@ -0,0 +1,257 @@
+# auditoria.py
+import atexit
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import has_request_context, request
+from flask_login import current_user
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import sqlite
+
+import counters
+from comun import al_confirmar, config, pendientes, percentil
+from extensions import db
+from models import Auditoria, RoleEnum, Usuario
+
+logger = logging.getLogger(__name__)
+
+# Defaults when there is no app context (scripts) or the app leaves them unset.
+COLA_MAXIMA = 10000
+TAMANO_LOTE = 500
+# Seconds the writer waits to fill a batch once it holds the first event.
+INTERVALO = 0.5
+# Attempts per batch before its events are written to the log instead.
+MAX_INTENTOS = 3
+# Flush samples kept for the percentiles in `estadisticas`.
+MUESTRAS = 10000
+# Session.info key holding the events of the open transaction.
+CLAVE_PENDIENTES = 'auditorias_pendientes'
+# Inactive account that audit rows of RFID readers (authenticated by token, not by a user) are attributed to.
+USUARIO_LECTORES = 'lectores-rfid'
+
+
+def evento(accion, detalle=None, usuario_id=None):
+    """
+    Build an ``auditoria`` row as a dict, stamped now.
+
+    ``usuario_id`` defaults to the logged-in user, and inside a request the
+    client address and user agent are filled in.
+    """
+    fila = {
+        'usuario_id': current_user.id if usuario_id is None else usuario_id,
+        'accion': accion,
+        'detalle': detalle,
+        'fecha_hora': datetime.utcnow(),
+        'ip_address': None,
+        'user_agent': None
+    }
+    if has_request_context():
+        fila['ip_address'] = request.remote_addr
+        fila['user_agent'] = request.user_agent.string[:255] or None
+    return fila
+
+
+def usuario_lectores(session=None):
+    """
+    Return the id of the `USUARIO_LECTORES` account, creating it on first use.
+
+    The account is inactive and its password field holds no valid hash, so
+    nobody can log in with it. It is created in the caller's transaction.
+    """
+    session = session or db.session
+    consulta = select(Usuario.id).where(Usuario.nombre_usuario == USUARIO_LECTORES)
+    usuario_id = session.scalar(consulta)
+    if usuario_id is None:
+        # Two workers auditing their first reader action may both get here; only one insert wins.
+        session.execute(sqlite.insert(Usuario).values(
+            nombre_usuario=USUARIO_LECTORES, contrasena='!', rol=RoleEnum.USUARIO, activo=False
+        ).on_conflict_do_nothing(index_elements=[Usuario.nombre_usuario]))
+        usuario_id = session.scalar(consulta)
+    return usuario_id
+
+
+def huella_token(token):
+    """Short, non-reversible identifier of a reader token, for audit details."""
+    return hashlib.sha256(token.encode()).hexdigest()[:12]
+
+
+class EscritorAuditoria:
+    """
+    Background thread that writes queued audit events in multi-row inserts.
+
+    Events wait in a bounded queue and are written in batches of up to
+    ``tamano_lote`` rows, each in one transaction together with the
+    ``auditorias`` counter, at most ``intervalo`` seconds after the first
+    one was taken. When the queue is full the calling thread writes its
+    events itself, so a burst slows requests down instead of losing
+    events. A batch that still fails after ``MAX_INTENTOS`` attempts is
+    logged as JSON and counted in ``perdidos``.
+    """
+
+    def __init__(self, engine, cola_maxima=COLA_MAXIMA, tamano_lote=TAMANO_LOTE, intervalo=INTERVALO):
+        self.engine = engine
+        self.cola_maxima = cola_maxima
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.cola = queue.Queue(maxsize=cola_maxima)
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._ejecutar, name='auditoria', daemon=True)
+        self.encolados = 0
+        self.escritos = 0
+        self.desbordados = 0
+        self.lotes = 0
+        self.fallos = 0
+        self.perdidos = 0
+        self.duraciones = deque(maxlen=MUESTRAS)
+        self.esperas = deque(maxlen=MUESTRAS)
+
+    def iniciar(self):
+        self._hilo.start()
+        atexit.register(self.detener)
+
+    def encolar(self, filas):
+        """Queue ``filas`` for the writer; write them here if the queue is full."""
+        desbordadas = []
+        for fila in filas:
+            try:
+                self.cola.put_nowait((fila, time.monotonic()))
+            except queue.Full:
+                desbordadas.append(fila)
+        with self._lock:
+            self.encolados += len(filas) - len(desbordadas)
+            self.desbordados += len(desbordadas)
+        if desbordadas:
+            self._escribir(desbordadas)
+
+    def _ejecutar(self):
+        while not (self._parar.is_set() and self.cola.empty()):
+            try:
+                lote = [self.cola.get(timeout=self.intervalo)]
+            except queue.Empty:
+                continue
+            limite = time.monotonic() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                restante = 0 if self._parar.is_set() else limite - time.monotonic()
+                try:
+                    lote.append(self.cola.get(timeout=restante) if restante > 0 else self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._escribir([fila for fila, _ in lote])
+                confirmado = time.monotonic()
+                with self._lock:
+                    self.esperas.extend(confirmado - encolado for _, encolado in lote)
+            finally:
+                for _ in lote:
+                    self.cola.task_done()
+
+    def _escribir(self, filas):
+        for intento in range(1, MAX_INTENTOS + 1):
+            inicio = time.monotonic()
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(insert(Auditoria), filas)
+                    counters.incrementar({counters.AUDITORIAS: len(filas)}, session=connection)
+            except Exception:
+                with self._lock:
+                    self.fallos += 1
+                logger.exception(f'No se pudo escribir un lote de {len(filas)} auditorías (intento {intento})')
+                if intento < MAX_INTENTOS and not self._parar.is_set():
+                    time.sleep(0.1 * 2 ** intento)
+                continue
+            with self._lock:
+                self.lotes += 1
+                self.escritos += len(filas)
+                self.duraciones.append(time.monotonic() - inicio)
+            return
+        with self._lock:
+            self.perdidos += len(filas)
+        for fila in filas:
+            logger.error('Auditoría no escrita: %s', json.dumps(fila, default=str, ensure_ascii=False))
+
+    def vaciar(self):
+        """Block until every event queued so far has been written."""
+        self.cola.join()
+
+    def detener(self, espera=10):
+        """Stop the writer after writing whatever is still queued."""
+        self._parar.set()
+        if self._hilo.is_alive():
+            self._hilo.join(espera)
+
+    def estadisticas(self):
+        with self._lock:
+            duraciones = sorted(self.duraciones)
+            esperas = sorted(self.esperas)
+            return {
+                'en_cola': self.cola.qsize(),
+                'cola_maxima': self.cola_maxima,
+                'encolados': self.encolados,
+                'escritos': self.escritos,
+                'desbordados': self.desbordados,
+                'lotes': self.lotes,
+                'fallos': self.fallos,
+                'perdidos': self.perdidos,
+                'vaciado_p50': percentil(duraciones, 0.50),
+                'vaciado_p99': percentil(duraciones, 0.99),
+                'espera_p50': percentil(esperas, 0.50),
+                'espera_p99': percentil(esperas, 0.99),
+            }
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def get_escritor():
+    """Return the worker-wide audit writer, starting it on first use (needs an app context)."""
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                escritor = EscritorAuditoria(
+                    db.engine,
+                    cola_maxima=config('AUDITORIA_COLA_MAXIMA', COLA_MAXIMA),
+                    tamano_lote=config('AUDITORIA_LOTE', TAMANO_LOTE),
+                    intervalo=config('AUDITORIA_INTERVALO', INTERVALO)
+                )
+                escritor.iniciar()
+                _escritor = escritor
+    return _escritor
+
+
+def registrar(accion, detalle=None, usuario_id=None, sincrono=False, session=None):
+    """
+    Record an audit event for the caller's transaction.
+
+    By default the event is handed to the background writer when the
+    transaction commits and dropped if it rolls back, so the request never
+    waits for the audit insert. With ``sincrono=True`` (or with
+    ``AUDITORIA_ASINCRONA`` off) the row is added to the transaction itself
+    and commits or rolls back with the change it records; use it for
+    actions whose trail must be durable as soon as they are.
+
+    The caller commits in both cases.
+    """
+    session = session or db.session
+    fila = evento(accion, detalle, usuario_id)
+    if sincrono or not config('AUDITORIA_ASINCRONA', True):
+        session.add(Auditoria(**fila))
+        counters.incrementar({counters.AUDITORIAS: 1}, session=session)
+        return
+    get_escritor()
+    pendientes(session, CLAVE_PENDIENTES).append(fila)
+
+
+def _confirmar(filas):
+    _escritor.encolar(filas)
+
+
+al_confirmar(CLAVE_PENDIENTES, _confirmar)
@@ -0,0 +1,271 @@
+# autocompletado.py
+import abc
+import itertools
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sortedcontainers import SortedList
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import object_session
+
+from comun import al_confirmar, pendientes
+from extensions import db
+from models import ConfiguracionSistema, Producto, Usuario
+from usuario_registry import CLAVE_VERSION
+
+EntradaProducto = namedtuple('EntradaProducto', ['id', 'codigo', 'nombre', 'estado_id'])
+EntradaUsuario = namedtuple('EntradaUsuario', ['id', 'nombre_usuario', 'rol', 'activo'])
+
+# Rows fetched per round trip while rebuilding.
+TAMANO_BLOQUE_CARGA = 5000
+# Minimum seconds between catch-up queries for writes made by other processes.
+INTERVALO_SINCRONIZACION = 2
+# Catch-up overlap, covering clock skew between processes and long transactions.
+MARGEN_SINCRONIZACION = timedelta(seconds=30)
+# Full reload period; the only way rows deleted by another process leave the index.
+TTL_SEGUNDOS = 600
+# Most suggestions one lookup returns.
+LIMITE_MAXIMO = 50
+# Sorts after any character, so (prefijo + FIN,) bounds every key starting with prefijo.
+FIN = '\U0010ffff'
+
+
+def normalizar(texto):
+    """Lookup key for ``texto``: stripped and case-folded."""
+    return texto.strip().casefold()
+
+
+class IndicePrefijos(abc.ABC):
+    """
+    Worker-local sorted index answering "which keys start with this prefix".
+
+    Keys are kept in a SortedList of ``(normalised key, id)``, so a lookup
+    is a bisection plus a slice of at most ``limite`` entries whatever the
+    table size. Built with one streaming query, then kept current like
+    `ocupacion.OcupacionUbicaciones`: this process's ORM writes are applied
+    when their transaction commits (see the listeners below) and every
+    ``INTERVALO_SINCRONIZACION`` seconds one query picks up rows other
+    processes inserted or changed. The whole index is reloaded after
+    ``TTL_SEGUNDOS``. The id watermark of that query only advances with
+    rows read from the database, never with this process's own inserts,
+    which may have higher ids than rows another process committed first.
+
+    Subclasses say how to load rows and which column is the key.
+    """
+
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._carga_lock = threading.RLock()
+        self._claves = None
+        self._entradas = {}
+        self._max_id = 0
+        self._marca = None
+        self._cargado_en = 0.0
+        self._sincronizado_en = 0.0
+        self.consultas = 0
+        self.cargas = 0
+
+    @abc.abstractmethod
+    def _clave(self, entrada):
+        """Sort key of an entry."""
+
+    @abc.abstractmethod
+    def _filas(self, session):
+        """Every row, as entries."""
+
+    @abc.abstractmethod
+    def _cambios(self, session):
+        """Rows changed since the last load or catch-up; None to ask for a full reload."""
+
+    def _poner(self, entrada):
+        self._quitar(entrada.id)
+        self._entradas[entrada.id] = entrada
+        clave = self._clave(entrada)
+        if clave:
+            self._claves.add((normalizar(clave), entrada.id))
+
+    def _quitar(self, entrada_id):
+        previa = self._entradas.pop(entrada_id, None)
+        if previa is not None and self._clave(previa):
+            self._claves.discard((normalizar(self._clave(previa)), entrada_id))
+
+    def reconstruir(self, session=None):
+        """Load every row with a single streaming query; lookups keep using the old index meanwhile."""
+        session = session or db.session
+        with self._carga_lock:
+            consulta_en = datetime.utcnow()
+            entradas = {entrada.id: entrada for entrada in self._filas(session)}
+            claves = SortedList(
+                (normalizar(self._clave(entrada)), entrada.id) for entrada in entradas.values() if self._clave(entrada)
+            )
+            with self._lock:
+                self._claves = claves
+                self._entradas = entradas
+                self._max_id = max(entradas, default=0)
+                self._marca = consulta_en
+                self._cargado_en = self._sincronizado_en = time.monotonic()
+                self.cargas += 1
+
+    def sincronizar(self, session=None):
+        """Build on first use or after ``ttl``, then apply rows changed by other processes."""
+        ahora = time.monotonic()
+        if self._claves is None or (self.ttl and ahora - self._cargado_en >= self.ttl):
+            cargado_en = self._cargado_en
+            with self._carga_lock:
+                # Another thread may have finished the same reload while this one waited.
+                if self._cargado_en == cargado_en:
+                    self.reconstruir(session)
+            return
+        if ahora - self._sincronizado_en < INTERVALO_SINCRONIZACION:
+            return
+        session = session or db.session
+        consulta_en = datetime.utcnow()
+        cambios = self._cambios(session)
+        if cambios is None:
+            self.reconstruir(session)
+            return
+        with self._lock:
+            for entrada in cambios:
+                self._poner(entrada)
+                self._max_id = max(self._max_id, entrada.id)
+            self._marca = consulta_en
+            self._sincronizado_en = ahora
+
+    def aplicar(self, cambios):
+        """Apply ``(id, entrada)`` changes written by this process; ``entrada`` None removes ``id``."""
+        with self._lock:
+            if self._claves is None:
+                return
+            for entrada_id, entrada in cambios:
+                if entrada is None:
+                    self._quitar(entrada_id)
+                    if entrada_id == self._max_id:
+                        # SQLite hands the highest deleted rowid to the next insert, so
+                        # the catch-up must look from the highest id read below it again.
+                        self._max_id = max((i for i in self._entradas if i < entrada_id), default=0)
+                else:
+                    self._poner(entrada)
+
+    def buscar(self, prefijo, limite=10):
+        """Return up to ``limite`` entries whose key starts with ``prefijo`` (any case), in key order."""
+        prefijo = normalizar(prefijo)
+        limite = max(1, min(limite, LIMITE_MAXIMO))
+        with self._lock:
+            self.consultas += 1
+            if not self._claves:
+                return []
+            claves = self._claves.irange((prefijo,), (prefijo + FIN,))
+            return [self._entradas[entrada_id] for _, entrada_id in itertools.islice(claves, limite)]
+
+    def estadisticas(self):
+        return {
+            'claves': len(self._claves) if self._claves is not None else 0,
+            'consultas': self.consultas,
+            'cargas': self.cargas
+        }
+
+
+class IndiceCodigosProducto(IndicePrefijos):
+    """`IndicePrefijos` over ``Producto.codigo``; entries carry the name and estado."""
+
+    def _clave(self, entrada):
+        return entrada.codigo
+
+    def _filas(self, session):
+        return (EntradaProducto(*fila) for fila in session.execute(
+            select(Producto.id, Producto.codigo, Producto.nombre, Producto.estado_id)
+            .execution_options(stream_results=True, yield_per=TAMANO_BLOQUE_CARGA)
+        ))
+
+    def _cambios(self, session):
+        # New rows by id (inserts leave ultima_actualizacion empty), changed
+        # rows by the indexed ultima_actualizacion.
+        return [EntradaProducto(*fila) for fila in session.execute(
+            select(Producto.id, Producto.codigo, Producto.nombre, Producto.estado_id)
+            .where(or_(Producto.id > self._max_id,
+                       Producto.ultima_actualizacion >= self._marca - MARGEN_SINCRONIZACION))
+        )]
+
+
+class IndiceNombresUsuario(IndicePrefijos):
+    """
+    `IndicePrefijos` over ``Usuario.nombre_usuario``.
+
+    Users carry no modification date, so other processes' renames and
+    deletions are detected through the ``usuarios_version`` key that
+    `usuario_registry` bumps, which triggers a full (small) reload.
+    """
+
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        super().__init__(ttl)
+        self._version = None
+
+    def _clave(self, entrada):
+        return entrada.nombre_usuario
+
+    def _leer_version(self, session):
+        return session.scalar(select(ConfiguracionSistema.valor).where(ConfiguracionSistema.clave == CLAVE_VERSION))
+
+    def _filas(self, session):
+        self._version = self._leer_version(session)
+        return (EntradaUsuario(*fila) for fila in session.execute(
+            select(Usuario.id, Usuario.nombre_usuario, Usuario.rol, Usuario.activo)
+            .execution_options(stream_results=True, yield_per=TAMANO_BLOQUE_CARGA)
+        ))
+
+    def _cambios(self, session):
+        if self._leer_version(session) != self._version:
+            return None
+        return [EntradaUsuario(*fila) for fila in session.execute(
+            select(Usuario.id, Usuario.nombre_usuario, Usuario.rol, Usuario.activo)
+            .where(Usuario.id > self._max_id)
+        )]
+
+
+codigos_producto = IndiceCodigosProducto()
+nombres_usuario = IndiceNombresUsuario()
+
+
+def _pendientes(target):
+    session = object_session(target)
+    if session is None:
+        return None
+    return pendientes(session, 'autocompletado_pendientes')
+
+
+def _producto_escrito(mapper, connection, target):
+    cambios = _pendientes(target)
+    if cambios is not None:
+        entrada = EntradaProducto(target.id, target.codigo, target.nombre, target.estado_id)
+        cambios.append((codigos_producto, target.id, entrada))
+
+
+def _usuario_escrito(mapper, connection, target):
+    cambios = _pendientes(target)
+    if cambios is not None:
+        entrada = EntradaUsuario(target.id, target.nombre_usuario, target.rol, target.activo)
+        cambios.append((nombres_usuario, target.id, entrada))
+
+
+def _borrado(mapper, connection, target):
+    cambios = _pendientes(target)
+    if cambios is not None:
+        indice = codigos_producto if isinstance(target, Producto) else nombres_usuario
+        cambios.append((indice, target.id, None))
+
+
+def _confirmar(cambios):
+    for indice in (codigos_producto, nombres_usuario):
+        indice.aplicar((entrada_id, entrada) for propio, entrada_id, entrada in cambios if propio is indice)
+
+
+event.listen(Producto, 'after_insert', _producto_escrito)
+event.listen(Producto, 'after_update', _producto_escrito)
+event.listen(Producto, 'after_delete', _borrado)
+event.listen(Usuario, 'after_insert', _usuario_escrito)
+event.listen(Usuario, 'after_update', _usuario_escrito)
+event.listen(Usuario, 'after_delete', _borrado)
+al_confirmar('autocompletado_pendientes', _confirmar)
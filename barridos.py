@@ -0,0 +1,215 @@
+# barridos.py
+import csv
+import itertools
+import json
+import os
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from extensions import db
+from indice_rfid import indice_tags
+from models import Producto
+
+# Rows fetched per round trip during the reconciliation pass.
+TAMANO_BLOQUE_CARGA = 5000
+# Products per UPDATE ... WHERE id IN (...) when correcting locations.
+TAMANO_BLOQUE_SQL = 500
+# Tags appended to a sweep's read file per write.
+TAMANO_BLOQUE_ESCRITURA = 10000
+# Tags accepted in one JSON batch; larger sweeps are sent as several batches or as a file.
+LOTE_MAXIMO = 50000
+
+
+def ruta_lecturas(directorio, barrido_id):
+    return os.path.join(directorio, f'barrido_{barrido_id}.tags')
+
+
+def ruta_informe(directorio, barrido_id):
+    return os.path.join(directorio, f'barrido_{barrido_id}.json')
+
+
+def leer_tags(lineas):
+    """
+    Yield the tags of an uploaded sweep, one per line.
+
+    Plain files hold one tag per line. CSV exports from handhelds are also
+    accepted: if the first line has an ``rfid_tag`` column, only that
+    column is read.
+    """
+    lineas = iter(lineas)
+    primera = next(lineas, None)
+    if primera is None:
+        return
+    columnas = next(csv.reader([primera]))
+    if 'rfid_tag' in columnas:
+        indice = columnas.index('rfid_tag')
+        for fila in csv.reader(lineas):
+            if len(fila) > indice and fila[indice].strip():
+                yield fila[indice].strip()
+        return
+    for linea in itertools.chain([primera], lineas):
+        if linea.strip():
+            yield linea.strip()
+
+
+def anadir_lecturas(ruta, tags):
+    """
+    Append ``tags`` to a sweep's read file and return how many were written.
+
+    ``tags`` may be any iterable (e.g. `leer_tags` over a streamed upload);
+    it is consumed in blocks so the whole sweep is never held in memory.
+    """
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    tags = iter(tags)
+    escritos = 0
+    with open(ruta, 'a', encoding='utf-8') as archivo:
+        while True:
+            bloque = [tag for tag in itertools.islice(tags, TAMANO_BLOQUE_ESCRITURA) if tag]
+            if not bloque:
+                return escritos
+            archivo.write('\n'.join(bloque) + '\n')
+            escritos += len(bloque)
+
+
+def conciliar(ubicacion, tags, session=None, estado_excluido_id=None):
+    """
+    Compare the tags read in a sweep of ``ubicacion`` with what is recorded there.
+
+    The scanned tags are deduplicated into a set and every tagged product is
+    read once with a single streaming query, so the cost is one pass over
+    ``producto`` whatever the sweep size. Results:
+
+    - ``faltantes``: products recorded at ``ubicacion`` (and not in
+      ``estado_excluido_id``, i.e. 'Prestado') that were not read.
+    - ``mal_ubicados``: products read here but recorded elsewhere or nowhere.
+    - ``inesperados``: tags read that belong to no product.
+
+    Returns:
+        dict: The reconciliation report.
+    """
+    session = session or db.session
+    escaneados = set(tags)
+    conocidos = set()
+    presentes = 0
+    faltantes = []
+    mal_ubicados = []
+    resultado = session.execute(
+        select(Producto.id, Producto.rfid_tag, Producto.ubicacion_actual, Producto.estado_id)
+        .where(Producto.rfid_tag.isnot(None))
+        .execution_options(stream_results=True, yield_per=TAMANO_BLOQUE_CARGA)
+    )
+    for producto_id, rfid_tag, ubicacion_actual, estado_id in resultado:
+        leido = rfid_tag in escaneados
+        if leido:
+            conocidos.add(rfid_tag)
+        if ubicacion_actual == ubicacion:
+            if leido:
+                presentes += 1
+            elif estado_id != estado_excluido_id:
+                faltantes.append({'producto_id': producto_id, 'rfid_tag': rfid_tag})
+        elif leido:
+            mal_ubicados.append({
+                'producto_id': producto_id,
+                'rfid_tag': rfid_tag,
+                'ubicacion_registrada': ubicacion_actual
+            })
+
+    return {
+        'ubicacion': ubicacion,
+        'tags_distintos': len(escaneados),
+        'presentes': presentes,
+        'faltantes': faltantes,
+        'mal_ubicados': mal_ubicados,
+        'inesperados': sorted(escaneados - conocidos),
+        'corregidos': 0
+    }
+
+
+def corregir_ubicaciones(informe, session=None):
+    """
+    Move every misplaced product of ``informe`` to the swept location.
+
+    Runs one ``UPDATE ... WHERE id IN (...)`` per block in the caller's
+    transaction (the caller commits) and returns how many rows changed.
+    Missing products are left as they are: not being read is not enough
+    to know where they went.
+    """
+    session = session or db.session
+    ids = [producto['producto_id'] for producto in informe['mal_ubicados']]
+    corregidos = 0
+    for inicio in range(0, len(ids), TAMANO_BLOQUE_SQL):
+        resultado = session.execute(
+            update(Producto)
+            .where(Producto.id.in_(ids[inicio:inicio + TAMANO_BLOQUE_SQL]))
+            .values(ubicacion_actual=informe['ubicacion'])
+            .execution_options(synchronize_session=False)
+        )
+        corregidos += resultado.rowcount
+    informe['corregidos'] = corregidos
+    return corregidos
+
+
+def ejecutar_conciliacion(barrido, directorio, session=None, estado_excluido_id=None, corregir=False):
+    """
+    Reconcile a sweep from its read file, write the JSON report and update ``barrido``.
+
+    The caller commits; the tag index is told about corrected locations
+    only after that commit (see `publicar_correcciones`).
+    """
+    session = session or db.session
+    ruta = ruta_lecturas(directorio, barrido.id)
+    if os.path.exists(ruta):
+        with open(ruta, encoding='utf-8') as archivo:
+            informe = conciliar(barrido.ubicacion, (linea.rstrip('\n') for linea in archivo),
+                                session, estado_excluido_id)
+    else:
+        informe = conciliar(barrido.ubicacion, (), session, estado_excluido_id)
+    informe['barrido_id'] = barrido.id
+    informe['lecturas'] = barrido.total_lecturas
+    if corregir:
+        corregir_ubicaciones(informe, session)
+    informe['fecha_conciliacion'] = datetime.utcnow().isoformat()
+
+    os.makedirs(directorio, exist_ok=True)
+    destino = ruta_informe(directorio, barrido.id)
+    with open(destino + '.tmp', 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, ensure_ascii=False)
+    os.replace(destino + '.tmp', destino)
+
+    barrido.estado = 'conciliado'
+    barrido.tags_distintos = informe['tags_distintos']
+    barrido.presentes = informe['presentes']
+    barrido.faltantes = len(informe['faltantes'])
+    barrido.mal_ubicados = len(informe['mal_ubicados'])
+    barrido.inesperados = len(informe['inesperados'])
+    barrido.corregidos = informe['corregidos']
+    barrido.ruta_informe = destino
+    barrido.fecha_conciliacion = datetime.utcnow()
+    return informe
+
+
+def publicar_correcciones(informe):
+    """Update the worker's tag index after the corrections in ``informe`` were committed."""
+    if informe['corregidos']:
+        indice_tags.actualizar_ubicaciones(
+            (producto['rfid_tag'], informe['ubicacion']) for producto in informe['mal_ubicados']
+        )
+
+
+def serializar_barrido(barrido):
+    """Return the JSON-friendly summary of a sweep."""
+    return {
+        'id': barrido.id,
+        'ubicacion': barrido.ubicacion,
+        'estado': barrido.estado,
+        'total_lecturas': barrido.total_lecturas,
+        'tags_distintos': barrido.tags_distintos,
+        'presentes': barrido.presentes,
+        'faltantes': barrido.faltantes,
+        'mal_ubicados': barrido.mal_ubicados,
+        'inesperados': barrido.inesperados,
+        'corregidos': barrido.corregidos,
+        'fecha_creacion': barrido.fecha_creacion.isoformat() if barrido.fecha_creacion else None,
+        'fecha_conciliacion': barrido.fecha_conciliacion.isoformat() if barrido.fecha_conciliacion else None,
+    }
@@ -0,0 +1,120 @@
+# benchmarks/bench_auditoria.py
+"""
+State-change latency with audit rows written in the request vs by the background writer.
+
+Usage: python benchmarks/bench_auditoria.py [--clientes N] [--cambios N] [--productos N]
+
+Runs against a scratch SQLite database. ``--clientes`` threads post
+state changes through the Flask test client, first with
+``AUDITORIA_ASINCRONA`` off (the audit row commits with the change) and
+then with the writer on. Reports changes/s, request latency, the writer's
+flush times, and checks that every audit row and the counter arrived.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_auditoria_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+
+import auditoria  # noqa: E402
+import counters  # noqa: E402
+from app import app, initialize_estados, limiter  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Auditoria, Estado, Producto, RoleEnum, Usuario  # noqa: E402
+
+CONTRASENA = 'contrasena-bench'
+
+
+def sembrar(n_productos, n_clientes):
+    db.create_all()
+    initialize_estados()
+    estado = Estado.query.order_by(Estado.orden).first()
+    db.session.execute(db.insert(Producto), [
+        {'nombre': f'Producto {i}', 'codigo': f'BENCH-{i:06d}', 'estado_id': estado.id}
+        for i in range(n_productos)
+    ])
+    for i in range(n_clientes):
+        usuario = Usuario(nombre_usuario=f'admin{i}', rol=RoleEnum.ADMIN)
+        usuario.password = CONTRASENA
+        db.session.add(usuario)
+    db.session.commit()
+    return [estado.id for estado in Estado.query.order_by(Estado.orden)]
+
+
+def ronda(nombre, clientes, cambios, n_productos, estados):
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+
+    def cliente(indice):
+        client = app.test_client()
+        client.post('/login', data={'nombre_usuario': f'admin{indice}', 'contrasena': CONTRASENA})
+        propias = []
+        for j in range(cambios):
+            producto_id = (indice * cambios + j) % n_productos + 1
+            t0 = time.perf_counter()
+            respuesta = client.post(f'/admin/producto/{producto_id}/cambiar_estado',
+                                    data={'estado_nuevo': estados[j % len(estados)]})
+            propias.append(time.perf_counter() - t0)
+            if respuesta.status_code != 302:
+                errores.append(respuesta.status_code)
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - t0
+    latencias.sort()
+    p50 = latencias[len(latencias) // 2]
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+    print(f'{nombre:<26} {len(latencias) / total:8.1f} cambios/s   p50 {p50 * 1000:7.2f} ms   '
+          f'p99 {p99 * 1000:7.2f} ms   errores {len(errores)}')
+
+
+def comprobar():
+    with app.app_context():
+        filas = db.session.scalar(db.select(db.func.count(Auditoria.id)))
+        contador = counters.leer(counters.AUDITORIAS)[counters.AUDITORIAS]
+    print(f"{'':<26} {filas} auditorías, contador {contador}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=8, help='concurrent admin threads')
+    parser.add_argument('--cambios', type=int, default=200, help='state changes per thread and round')
+    parser.add_argument('--productos', type=int, default=5000)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERACIONES'] = 1000
+    limiter.enabled = False
+    with app.app_context():
+        estados = sembrar(args.productos, args.clientes)
+
+    app.config['AUDITORIA_ASINCRONA'] = False
+    ronda('en la transacción', args.clientes, args.cambios, args.productos, estados)
+    comprobar()
+
+    app.config['AUDITORIA_ASINCRONA'] = True
+    ronda('escritor en segundo plano', args.clientes, args.cambios, args.productos, estados)
+    escritor = auditoria._escritor
+    escritor.vaciar()
+    estadisticas = escritor.estadisticas()
+    print(f"{'':<26} {estadisticas['lotes']} lotes, vaciado p50 {estadisticas['vaciado_p50'] * 1000:.2f} ms, "
+          f"p99 {estadisticas['vaciado_p99'] * 1000:.2f} ms, espera p99 {estadisticas['espera_p99'] * 1000:.0f} ms")
+    comprobar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+# benchmarks/bench_autocompletado.py
+"""
+Typeahead latency under concurrent typing: sorted in-memory index vs a database prefix query.
+
+Usage: python benchmarks/bench_autocompletado.py [--productos N] [--clientes N] [--codigos N]
+
+Builds a scratch SQLite database with ``--productos`` products. ``--clientes``
+threads then "type" ``--codigos`` random product codes each, one request
+per keystroke against ``/api/autocompletar/productos``, while another
+thread keeps changing product estados (so the index's commit hooks and
+catch-up run during the measurement). The same keystrokes are then
+replayed as ``codigo LIKE 'prefix%'`` queries over the unique index on
+``codigo``. Reports p50/p99 per keystroke for both.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_autocompletado_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+
+from autocompletado import codigos_producto  # noqa: E402
+from app import app, initialize_estados, limiter  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Estado, Producto, RoleEnum, Usuario  # noqa: E402
+
+CONTRASENA = 'contrasena-bench'
+PREFIJOS = ['LAP', 'CAM', 'TRI', 'PRO', 'MIC', 'MON', 'TAB', 'ALT', 'OSC', 'MUL']
+
+
+def sembrar(n_productos, n_clientes):
+    db.create_all()
+    initialize_estados()
+    estados = [estado.id for estado in Estado.query.all()]
+    azar = random.Random(42)
+    for inicio in range(0, n_productos, 20000):
+        db.session.execute(db.insert(Producto), [
+            {'nombre': f'Producto {i}', 'codigo': f'{PREFIJOS[i % len(PREFIJOS)]}-{i:07d}',
+             'estado_id': azar.choice(estados)}
+            for i in range(inicio, min(n_productos, inicio + 20000))
+        ])
+    for i in range(n_clientes):
+        usuario = Usuario(nombre_usuario=f'admin{i}', rol=RoleEnum.ADMIN)
+        usuario.password = CONTRASENA
+        db.session.add(usuario)
+    db.session.commit()
+    return estados
+
+
+def pulsaciones(n_productos, n_codigos, semilla):
+    """Every prefix of ``n_codigos`` random codes, as typed one key at a time (lower case, as staff type)."""
+    azar = random.Random(semilla)
+    for _ in range(n_codigos):
+        i = azar.randrange(n_productos)
+        codigo = f'{PREFIJOS[i % len(PREFIJOS)]}-{i:07d}'.lower()
+        for fin in range(1, len(codigo) + 1):
+            yield codigo[:fin]
+
+
+def percentiles(tiempos):
+    tiempos.sort()
+    p50 = tiempos[len(tiempos) // 2]
+    p99 = tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.99))]
+    return p50 * 1000, p99 * 1000
+
+
+def concurrente(nombre, clientes, funcion, args):
+    tiempos = []
+    lock = threading.Lock()
+
+    def cliente(indice):
+        propios = funcion(indice, args)
+        with lock:
+            tiempos.extend(propios)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - t0
+    p50, p99 = percentiles(tiempos)
+    print(f'{nombre:<28} {len(tiempos) / total:9.0f} pulsaciones/s   p50 {p50:7.3f} ms   p99 {p99:7.3f} ms')
+
+
+def teclear_api(indice, args):
+    client = app.test_client()
+    client.post('/login', data={'nombre_usuario': f'admin{indice}', 'contrasena': CONTRASENA})
+    tiempos = []
+    for prefijo in pulsaciones(args.productos, args.codigos, indice):
+        t0 = time.perf_counter()
+        respuesta = client.get('/api/autocompletar/productos', query_string={'q': prefijo})
+        tiempos.append(time.perf_counter() - t0)
+        assert respuesta.status_code == 200, respuesta.status_code
+    return tiempos
+
+
+def teclear_indice(indice, args):
+    tiempos = []
+    with app.app_context():
+        for prefijo in pulsaciones(args.productos, args.codigos, indice):
+            t0 = time.perf_counter()
+            codigos_producto.sincronizar()
+            codigos_producto.buscar(prefijo, 10)
+            tiempos.append(time.perf_counter() - t0)
+    return tiempos
+
+
+def teclear_bd(indice, args):
+    tiempos = []
+    with app.app_context():
+        for prefijo in pulsaciones(args.productos, args.codigos, indice):
+            t0 = time.perf_counter()
+            # The case-insensitive LIKE of SQLite cannot use the index on codigo; upper-casing
+            # the prefix and comparing a range is the best a plain query can do.
+            clave = prefijo.upper()
+            db.session.execute(
+                db.select(Producto.id, Producto.codigo, Producto.nombre, Producto.estado_id)
+                .where(Producto.codigo >= clave, Producto.codigo < clave + '\U0010ffff')
+                .order_by(Producto.codigo).limit(10)
+            ).all()
+            tiempos.append(time.perf_counter() - t0)
+            db.session.rollback()
+    return tiempos
+
+
+def escribir(parar, n_productos, estados):
+    azar = random.Random(7)
+    with app.app_context():
+        while not parar.is_set():
+            producto = db.session.get(Producto, azar.randrange(n_productos) + 1)
+            producto.estado_id = azar.choice(estados)
+            db.session.commit()
+            time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--productos', type=int, default=200000)
+    parser.add_argument('--clientes', type=int, default=8, help='concurrent typing threads')
+    parser.add_argument('--codigos', type=int, default=30, help='codes typed per thread')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERACIONES'] = 1000
+    limiter.enabled = False
+    with app.app_context():
+        estados = sembrar(args.productos, args.clientes)
+        t0 = time.perf_counter()
+        codigos_producto.sincronizar()
+        print(f'índice de {codigos_producto.estadisticas()["claves"]} códigos cargado en '
+              f'{time.perf_counter() - t0:.2f} s')
+
+    parar = threading.Event()
+    escritor = threading.Thread(target=escribir, args=(parar, args.productos, estados))
+    escritor.start()
+    try:
+        concurrente('endpoint (índice)', args.clientes, teclear_api, args)
+        concurrente('índice en memoria', args.clientes, teclear_indice, args)
+        concurrente('consulta por rango en BD', args.clientes, teclear_bd, args)
+    finally:
+        parar.set()
+        escritor.join()
+    print(f"{'':<28} {codigos_producto.estadisticas()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_barrido.py
+"""
+Reconciliation time of a handheld inventory sweep, by sweep size.
+
+Usage: python benchmarks/bench_barrido.py [--productos N] [--esperados N] [--base N]
+
+Runs against a scratch SQLite database where ``--esperados`` of the tagged
+products are recorded at the swept location. The sweep reads 97% of them
+(each tag about 1.5 times, as handhelds do), plus products recorded
+elsewhere and unknown tags. The per-tag lookup it replaces is timed on
+``--base`` tags and extrapolated.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_barrido_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+
+from app import app, initialize_estados  # noqa: E402
+import barridos  # noqa: E402
+from extensions import db  # noqa: E402
+from models import BarridoInventario, Estado, Producto  # noqa: E402
+
+UBICACION = 'Almacén'
+
+
+def sembrar(n_productos, n_esperados):
+    db.create_all()
+    initialize_estados()
+    estado_id = Estado.query.filter_by(nombre='Disponible').first().id
+    for inicio in range(0, n_productos, 50000):
+        db.session.execute(db.insert(Producto), [
+            {'nombre': f'Producto {i}', 'codigo': f'P{i:07d}', 'estado_id': estado_id,
+             'rfid_tag': f'E200{i:012d}', 'fecha_alta': datetime.utcnow(),
+             'ubicacion_actual': UBICACION if i < n_esperados else f'Aula {i % 50}'}
+            for i in range(inicio, min(inicio + 50000, n_productos))
+        ])
+    db.session.commit()
+
+
+def barrido_sintetico(n_productos, n_esperados, rng):
+    leidos = [f'E200{i:012d}' for i in range(n_esperados) if rng.random() < 0.97]
+    leidos += [f'E200{rng.randrange(n_esperados, n_productos):012d}' for _ in range(n_esperados // 50)]
+    leidos += [f'FFFF{i:012d}' for i in range(n_esperados // 100)]
+    leidos += rng.sample(leidos, len(leidos) // 2)
+    rng.shuffle(leidos)
+    return leidos
+
+
+def por_tag(tags):
+    """Baseline: one lookup per distinct tag read."""
+    for tag in tags:
+        Producto.query.filter_by(rfid_tag=tag).first()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--productos', type=int, default=200000)
+    parser.add_argument('--esperados', type=int, default=100000)
+    parser.add_argument('--base', type=int, default=5000, help='tags for the per-tag baseline')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with app.app_context():
+        t0 = time.perf_counter()
+        sembrar(args.productos, args.esperados)
+        print(f'siembra de {args.productos} productos: {time.perf_counter() - t0:.1f} s')
+        tags = barrido_sintetico(args.productos, args.esperados, rng)
+        distintos = list(set(tags))
+        print(f'barrido: {len(tags)} lecturas, {len(distintos)} tags distintos')
+
+        muestra = distintos[:args.base]
+        t0 = time.perf_counter()
+        por_tag(muestra)
+        base = (time.perf_counter() - t0) / len(muestra) * len(distintos)
+        print(f'{"consulta por tag (extrapolada)":<34} {base:8.2f} s')
+
+        directorio = os.path.join(_directorio, 'barridos')
+        barrido = BarridoInventario(ubicacion=UBICACION, total_lecturas=0)
+        db.session.add(barrido)
+        db.session.commit()
+        t0 = time.perf_counter()
+        barrido.total_lecturas = barridos.anadir_lecturas(barridos.ruta_lecturas(directorio, barrido.id), tags)
+        print(f'{"anadir_lecturas":<34} {time.perf_counter() - t0:8.2f} s')
+
+        t0 = time.perf_counter()
+        informe = barridos.ejecutar_conciliacion(barrido, directorio, corregir=True)
+        db.session.commit()
+        print(f'{"conciliación + corrección":<34} {time.perf_counter() - t0:8.2f} s')
+        print(f"presentes {informe['presentes']}, faltantes {len(informe['faltantes'])}, "
+              f"mal ubicados {len(informe['mal_ubicados'])}, inesperados {len(informe['inesperados'])}, "
+              f"corregidos {informe['corregidos']}")
+
+
+if __name__ == '__main__':
+    main()
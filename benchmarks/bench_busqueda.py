@@ -0,0 +1,125 @@
+# benchmarks/bench_busqueda.py
+"""
+Product search latency: FTS5 index (busqueda.py) vs a LIKE '%term%' scan.
+
+Usage: python benchmarks/bench_busqueda.py [--productos N] [--repeticiones N]
+
+Builds a scratch SQLite database with ``--productos`` products whose names,
+codes and descriptions are drawn from a small vocabulary, so there are
+common, rare and absent words. Each query is timed ``--repeticiones`` times
+through `busqueda.buscar_productos` (top 20 by bm25) and through the
+equivalent LIKE over name, code and description (first 20 by id).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_busqueda_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+
+from sqlalchemy import or_  # noqa: E402
+
+import busqueda  # noqa: E402
+from app import app, initialize_estados  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Categoria, Estado, Producto  # noqa: E402
+
+TIPOS = ['Portátil', 'Cámara', 'Trípode', 'Proyector', 'Micrófono', 'Monitor', 'Tableta', 'Altavoz',
+         'Osciloscopio', 'Multímetro', 'Soldador', 'Router', 'Impresora', 'Escáner', 'Teclado']
+MARCAS = ['Canon', 'Nikon', 'Sony', 'Dell', 'Lenovo', 'HP', 'Epson', 'Rode', 'Shure', 'Fluke',
+          'Rigol', 'Weller', 'Cisco', 'Logitech', 'Apple', 'Samsung', 'Asus', 'Acer', 'Tektronix', 'Zoom']
+PALABRAS = ['con', 'funda', 'cargador', 'cable', 'batería', 'repuesto', 'laboratorio', 'aula', 'taller',
+            'inalámbrico', 'digital', 'analógico', 'profesional', 'portátil', 'revisado', 'garantía',
+            'adaptador', 'maletín', 'soporte', 'mando', 'lente', 'objetivo', 'filtro', 'sonda', 'punta']
+CONSULTAS = [
+    ('palabra común', 'cámara'),
+    ('marca + tipo', 'canon cámara'),
+    ('prefijo', 'osci'),
+    ('código exacto', None),
+    ('prefijo de código', None),
+    ('palabra rara', 'zafiro'),
+]
+
+
+def sembrar(n_productos):
+    db.create_all()
+    initialize_estados()
+    estados = [estado.id for estado in Estado.query.all()]
+    categorias = [Categoria(nombre=f'Categoría {i}') for i in range(5)]
+    db.session.add_all(categorias)
+    db.session.commit()
+    azar = random.Random(42)
+    filas = []
+    for i in range(n_productos):
+        tipo = azar.choice(TIPOS)
+        descripcion = ' '.join(azar.choice(PALABRAS) for _ in range(azar.randint(4, 12)))
+        if i % 50000 == 0:
+            descripcion += ' zafiro'
+        filas.append({
+            'nombre': f'{tipo} {azar.choice(MARCAS)} {azar.randint(100, 999)}',
+            'codigo': f'{unicodedata.normalize("NFKD", tipo).encode("ascii", "ignore").decode()[:3].upper()}-{i:06d}',
+            'descripcion': descripcion,
+            'estado_id': azar.choice(estados),
+            'categoria_id': azar.choice(categorias).id
+        })
+    t0 = time.perf_counter()
+    for inicio in range(0, len(filas), 20000):
+        db.session.execute(db.insert(Producto), filas[inicio:inicio + 20000])
+    db.session.commit()
+    print(f'{n_productos} productos insertados e indexados por los triggers en {time.perf_counter() - t0:.1f} s')
+    t0 = time.perf_counter()
+    busqueda.reconstruir_indice()
+    print(f"'rebuild' del índice completo en {time.perf_counter() - t0:.1f} s")
+
+
+def buscar_like(texto, limite=20):
+    condiciones = []
+    for palabra in texto.split():
+        patron = f'%{palabra}%'
+        condiciones.append(or_(Producto.nombre.like(patron), Producto.codigo.like(patron),
+                               Producto.descripcion.like(patron)))
+    return Producto.query.filter(*condiciones).order_by(Producto.id).limit(limite).all()
+
+
+def medir(funcion, texto, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        resultado = funcion(texto)
+        tiempos.append(time.perf_counter() - t0)
+        db.session.rollback()
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2] * 1000, len(resultado)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--productos', type=int, default=500000)
+    parser.add_argument('--repeticiones', type=int, default=7)
+    args = parser.parse_args()
+
+    with app.app_context():
+        sembrar(args.productos)
+        codigo = db.session.get(Producto, args.productos // 2).codigo
+        textos = {'código exacto': codigo, 'prefijo de código': codigo[:-2]}
+        print(f"{'consulta':<20} {'texto':<14} {'FTS5 p50':>11} {'LIKE p50':>11}  resultados")
+        for nombre, texto in CONSULTAS:
+            texto = texto or textos[nombre]
+            fts, n_fts = medir(busqueda.buscar_productos, texto, args.repeticiones)
+            like, n_like = medir(buscar_like, texto, args.repeticiones)
+            print(f'{nombre:<20} {texto:<14} {fts:8.2f} ms {like:8.2f} ms  {n_fts}/{n_like}')
+        estado = Estado.query.first()
+        fts, n_fts = medir(lambda t: busqueda.buscar_productos(t, estado_id=estado.id), 'canon cámara',
+                           args.repeticiones)
+        print(f"{'con filtro de estado':<20} {'canon cámara':<14} {fts:8.2f} ms {'':>11}  {n_fts}")
+
+
+if __name__ == '__main__':
+    main()
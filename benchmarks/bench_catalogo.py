@@ -0,0 +1,111 @@
+# benchmarks/bench_catalogo.py
+"""
+Rows/minute of the bulk product catalogue import, for CSV and XLSX.
+
+Usage: python benchmarks/bench_catalogo.py [--filas N] [--existentes N] [--base N]
+
+Each run imports a generated catalogue (1% of rows collide with existing
+codes or tags, so the error path is exercised) into a scratch SQLite
+database already holding ``--existentes`` products, with and without
+``simulacion``. The baseline is `agregar_producto`'s path (one ORM insert
+and commit per product) timed on ``--base`` rows and extrapolated.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openpyxl import Workbook  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from extensions import db  # noqa: E402
+from importacion import contar_filas, importar_productos, leer_filas  # noqa: E402
+from models import Categoria, Estado, Producto, RoleEnum, Usuario  # noqa: E402
+
+COLUMNAS = ['nombre', 'descripcion', 'codigo', 'estado', 'categoria', 'rfid_tag']
+
+
+def filas_catalogo(n):
+    for i in range(n):
+        # Every 100th row reuses the code of an existing product.
+        codigo = f'EX{i:07d}' if i % 100 == 0 else f'CAT{i:07d}'
+        yield [f'Producto {i}', f'Descripción del producto {i}', codigo, 'Disponible',
+               f'Categoría {i % 5}', f'E280{i:012d}']
+
+
+def generar(directorio, n):
+    ruta_csv = os.path.join(directorio, 'catalogo.csv')
+    with open(ruta_csv, 'w', encoding='utf-8') as archivo:
+        archivo.write(','.join(COLUMNAS) + '\n')
+        for fila in filas_catalogo(n):
+            archivo.write(','.join(fila) + '\n')
+    ruta_xlsx = os.path.join(directorio, 'catalogo.xlsx')
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(COLUMNAS)
+    for fila in filas_catalogo(n):
+        ws.append(fila)
+    wb.save(ruta_xlsx)
+    return ruta_csv, ruta_xlsx
+
+
+def base_de_datos(ruta, existentes):
+    engine = create_engine('sqlite:///' + ruta)
+    db.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(Usuario(nombre_usuario='importador', _password='-', rol=RoleEnum.ADMIN))
+        session.add(Estado(nombre='Disponible', orden=1))
+        session.add_all(Categoria(nombre=f'Categoría {i}') for i in range(5))
+        session.flush()
+        session.execute(insert(Producto), [
+            {'nombre': f'Existente {i}', 'codigo': f'EX{i:07d}', 'estado_id': 1, 'fecha_alta': datetime.utcnow()}
+            for i in range(existentes)
+        ])
+        session.commit()
+    return engine
+
+
+def por_producto(engine, n):
+    """Baseline: what `agregar_producto` does, once per row."""
+    with Session(engine) as session:
+        for i in range(n):
+            session.add(Producto(nombre=f'Formulario {i}', codigo=f'FORM{i:07d}', estado_id=1))
+            session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filas', type=int, default=100000)
+    parser.add_argument('--existentes', type=int, default=100000)
+    parser.add_argument('--base', type=int, default=2000, help='rows for the per-row baseline')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_catalogo_')
+    rutas = generar(directorio, args.filas)
+
+    engine = base_de_datos(os.path.join(directorio, 'base.db'), args.existentes)
+    t0 = time.perf_counter()
+    por_producto(engine, args.base)
+    print(f'{"formulario, uno a uno":<28} {args.base / (time.perf_counter() - t0) * 60:12,.0f} filas/min')
+
+    for ruta in rutas:
+        for simulacion in (True, False):
+            engine = base_de_datos(os.path.join(directorio, f'{os.path.basename(ruta)}_{simulacion}.db'),
+                                   args.existentes)
+            with Session(engine) as session:
+                t0 = time.perf_counter()
+                creados, errores = importar_productos(leer_filas(ruta), session, 1, simulacion=simulacion)
+                total = time.perf_counter() - t0
+            assert creados + len(errores) == contar_filas(ruta)
+            nombre = f'{os.path.splitext(ruta)[1]}{" simulación" if simulacion else ""}'
+            print(f'{nombre:<28} {args.filas / total * 60:12,.0f} filas/min   '
+                  f'({total:.1f} s, {creados} creados, {len(errores)} errores)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_importacion.py
+"""
+Bulk user import time for a generated CSV, by hashing process count.
+
+Usage: python benchmarks/bench_importacion.py [--usuarios N] [--iteraciones N] [--procesos N ...]
+
+Each run imports ``--usuarios`` rows into a fresh scratch SQLite database
+with `importacion.validar_usuarios` and `importacion.importar_usuarios`.
+The baseline is the registration path (one ORM insert, hash and commit per
+user), timed on ``--base`` users and extrapolated.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from extensions import db  # noqa: E402
+from importacion import importar_usuarios, leer_filas, validar_usuarios  # noqa: E402
+from models import RoleEnum, Usuario  # noqa: E402
+
+
+def generar_csv(ruta, n):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write('nombre_usuario,contrasena,rol\n')
+        for i in range(n):
+            archivo.write(f'alumno{i:06d},clave-{i:06d},alumno\n')
+
+
+def base_de_datos(directorio, nombre):
+    engine = create_engine('sqlite:///' + os.path.join(directorio, nombre))
+    db.metadata.create_all(engine)
+    return engine
+
+
+def por_usuario(engine, n, metodo):
+    """Baseline: what `registro` does, once per user."""
+    with Session(engine) as session:
+        for i in range(n):
+            session.add(Usuario(
+                nombre_usuario=f'registro{i:06d}',
+                _password=generate_password_hash(f'clave-{i:06d}', metodo, 16),
+                rol=RoleEnum.ALUMNO
+            ))
+            session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--usuarios', type=int, default=10000)
+    parser.add_argument('--iteraciones', type=int, default=600000, help='pbkdf2 iterations per hash')
+    parser.add_argument('--procesos', type=int, nargs='*', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--base', type=int, default=20, help='users for the per-user baseline')
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp(prefix='bench_importacion_')
+    ruta = os.path.join(directorio, 'usuarios.csv')
+    generar_csv(ruta, args.usuarios)
+    metodo = f'pbkdf2:sha256:{args.iteraciones}'
+    print(f'{os.cpu_count()} CPUs, {args.usuarios} usuarios, {metodo}')
+
+    engine = base_de_datos(directorio, 'base.db')
+    t0 = time.perf_counter()
+    por_usuario(engine, args.base, metodo)
+    base = (time.perf_counter() - t0) / args.base * args.usuarios
+    print(f'{"registro uno a uno (extrapolado)":<34} {base:8.1f} s')
+
+    for procesos in args.procesos:
+        engine = base_de_datos(directorio, f'importacion_{procesos}.db')
+        with Session(engine) as session:
+            t0 = time.perf_counter()
+            validos, errores = validar_usuarios(leer_filas(ruta), session)
+            validacion = time.perf_counter() - t0
+            creados, omitidos = importar_usuarios(validos, session, metodo, procesos=procesos)
+            total = time.perf_counter() - t0
+            assert session.scalar(select(func.count(Usuario.id))) == creados == args.usuarios
+        print(f'{f"importación, {procesos} procesos":<34} {total:8.1f} s   '
+              f'(validación {validacion:.2f} s, {creados / total:.0f} usuarios/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# benchmarks/bench_lectura.py
+"""
+Loan/return latency while reports run, with reports on the write engine vs the read-only engine.
+
+Usage: python benchmarks/bench_lectura.py [--reportes N] [--prestamos N] [--segundos N] [--movimientos N]
+
+Builds a scratch database with ``--movimientos`` movements. In each round
+``--reportes`` threads keep downloading the streamed CSV export and the
+/reportes page while ``--prestamos`` threads lend and return products
+through /solicitar-producto and /devolver-producto, all through the Flask
+test client in one process, like the threads of one worker. The first
+round runs with ``LECTURA_SEPARADA`` off, so reports share the write
+engine's connection pool; the second sends them to `lectura.get_engine`.
+Reports loan/return p50/p99 latency and throughput of both kinds.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_lectura_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+
+import counters  # noqa: E402
+import lectura  # noqa: E402
+from app import app, initialize_estados, limiter  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Estado, Movimiento, Producto, RoleEnum, Usuario  # noqa: E402
+from rollups import reconstruir_resumenes  # noqa: E402
+
+CONTRASENA = 'contrasena-bench'
+
+
+def sembrar(n_movimientos, n_prestamos, n_reportes):
+    db.create_all()
+    initialize_estados()
+    disponible = Estado.query.filter_by(nombre='Disponible').one()
+    usuarios = []
+    for i in range(n_reportes):
+        usuarios.append(Usuario(nombre_usuario=f'admin{i}', rol=RoleEnum.ADMIN))
+    for i in range(n_prestamos):
+        usuarios.append(Usuario(nombre_usuario=f'profesor{i}', rol=RoleEnum.PROFESOR))
+    for usuario in usuarios:
+        usuario.password = CONTRASENA
+    db.session.add_all(usuarios)
+    db.session.flush()
+    n_productos = max(1000, n_prestamos * 10)
+    db.session.execute(db.insert(Producto), [
+        {'nombre': f'Producto {i}', 'codigo': f'BENCH-{i:06d}', 'estado_id': disponible.id}
+        for i in range(n_productos)
+    ])
+    azar = random.Random(42)
+    for inicio in range(0, n_movimientos, 50000):
+        db.session.execute(db.insert(Movimiento), [
+            {'producto_id': azar.randrange(n_productos) + 1, 'usuario_id': azar.choice(usuarios).id,
+             'estado_anterior': 'Disponible', 'estado_nuevo': 'Prestado'}
+            for _ in range(inicio, min(n_movimientos, inicio + 50000))
+        ])
+    db.session.commit()
+    counters.reconstruir_contadores()
+    reconstruir_resumenes()
+
+
+def login(nombre):
+    client = app.test_client()
+    client.post('/login', data={'nombre_usuario': nombre, 'contrasena': CONTRASENA})
+    return client
+
+
+def ronda(nombre, args):
+    parar = threading.Event()
+    latencias = []
+    informes = []
+    lock = threading.Lock()
+
+    def reportar(indice):
+        client = login(f'admin{indice}')
+        propios = 0
+        while not parar.is_set():
+            url = '/reportes/exportar/csv' if indice % 2 == 0 else '/reportes'
+            respuesta = client.get(url)
+            respuesta.get_data()
+            assert respuesta.status_code == 200, (url, respuesta.status_code)
+            propios += 1
+        with lock:
+            informes.append(propios)
+
+    def prestar(indice):
+        client = login(f'profesor{indice}')
+        # Each thread owns a disjoint slice of products, so loans never collide.
+        productos = range(indice * 10 + 1, indice * 10 + 11)
+        propios = []
+        j = 0
+        while not parar.is_set():
+            producto_id = productos[j % len(productos)]
+            t0 = time.perf_counter()
+            client.post(f'/solicitar-producto/{producto_id}', data={'razon': 'bench', 'duracion_dias': 7})
+            propios.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            client.post(f'/devolver-producto/{producto_id}')
+            propios.append(time.perf_counter() - t0)
+            j += 1
+        with lock:
+            latencias.extend(propios)
+
+    hilos = [threading.Thread(target=reportar, args=(i,)) for i in range(args.reportes)]
+    hilos += [threading.Thread(target=prestar, args=(i,)) for i in range(args.prestamos)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(args.segundos)
+    parar.set()
+    for hilo in hilos:
+        hilo.join()
+    latencias.sort()
+    p50 = latencias[len(latencias) // 2] * 1000
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+    print(f'{nombre:<26} préstamos/devoluciones {len(latencias) / args.segundos:7.1f}/s   p50 {p50:7.2f} ms   '
+          f'p99 {p99:8.2f} ms   informes {sum(informes) / args.segundos:5.2f}/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reportes', type=int, default=16, help='threads downloading reports')
+    parser.add_argument('--prestamos', type=int, default=2, help='threads lending and returning')
+    parser.add_argument('--segundos', type=float, default=20)
+    parser.add_argument('--movimientos', type=int, default=100000)
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERACIONES'] = 1000
+    limiter.enabled = False
+    with app.app_context():
+        sembrar(args.movimientos, args.prestamos, args.reportes)
+
+    app.config['LECTURA_SEPARADA'] = False
+    ronda('motor de escritura', args)
+    app.config['LECTURA_SEPARADA'] = True
+    ronda('motor de solo lectura', args)
+    print(f"{'':<26} {lectura.estadisticas()}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_login.py
+"""
+Login throughput and latency under concurrent POST /login requests.
+
+Usage: python benchmarks/bench_login.py [--clientes N] [--logins N] [--iteraciones N] [--trabajadores N ...]
+
+Runs against a scratch SQLite database. ``--clientes`` threads log in
+repeatedly through the Flask test client, first hashing inline in the
+request thread (the old behaviour, no cap) and then through `hashing.PoolHash`
+with each ``--trabajadores`` cap. Reports logins/s, request latency and the
+pool's queue wait. A final round logs in users whose stored hashes use an
+older cost, so the rehash-on-login path is timed too.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_login_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+import hashing  # noqa: E402
+from app import app, limiter  # noqa: E402
+from extensions import db  # noqa: E402
+from models import RoleEnum, Usuario  # noqa: E402
+
+CONTRASENA = 'contrasena-bench'
+
+
+def sembrar(n_usuarios, iteraciones_antiguas):
+    db.create_all()
+    hash_actual = hashing.generar_hash(CONTRASENA)
+    hash_antiguo = generate_password_hash(CONTRASENA, f'pbkdf2:sha256:{iteraciones_antiguas}', 16)
+    db.session.execute(db.insert(Usuario), [
+        {'nombre_usuario': f'usuario{i}', '_password': hash_actual, 'rol': RoleEnum.ALUMNO, 'activo': True}
+        for i in range(n_usuarios)
+    ] + [
+        {'nombre_usuario': f'antiguo{i}', '_password': hash_antiguo, 'rol': RoleEnum.ALUMNO, 'activo': True}
+        for i in range(n_usuarios)
+    ])
+    db.session.commit()
+
+
+def ronda(nombre, clientes, logins, prefijo):
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+
+    def cliente(indice):
+        client = app.test_client()
+        propias = []
+        for j in range(logins):
+            t0 = time.perf_counter()
+            respuesta = client.post('/login', data={
+                'nombre_usuario': f'{prefijo}{(indice * logins + j) % (clientes * logins)}',
+                'contrasena': CONTRASENA
+            })
+            propias.append(time.perf_counter() - t0)
+            if respuesta.status_code != 302:
+                errores.append(respuesta.status_code)
+            client.get('/logout')
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=cliente, args=(i,)) for i in range(clientes)]
+    t0 = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    total = time.perf_counter() - t0
+    latencias.sort()
+    p50 = latencias[len(latencias) // 2]
+    p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))]
+    print(f'{nombre:<28} {len(latencias) / total:8.1f} logins/s   p50 {p50 * 1000:7.1f} ms   '
+          f'p99 {p99 * 1000:7.1f} ms   errores {len(errores)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=16, help='concurrent login threads')
+    parser.add_argument('--logins', type=int, default=8, help='logins per thread and round')
+    parser.add_argument('--iteraciones', type=int, default=600000, help='PASSWORD_HASH_ITERACIONES')
+    parser.add_argument('--trabajadores', type=int, nargs='*', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config['PASSWORD_HASH_ITERACIONES'] = args.iteraciones
+    limiter.enabled = False
+    print(f'{os.cpu_count()} CPUs, pbkdf2 {args.iteraciones} iteraciones, {args.clientes} clientes')
+
+    with app.app_context():
+        sembrar(args.clientes * args.logins, max(1000, args.iteraciones // 2))
+
+    original = hashing.PoolHash.ejecutar
+    hashing.PoolHash.ejecutar = lambda self, funcion, *a: funcion(*a)
+    ronda('en línea (sin límite)', args.clientes, args.logins, 'usuario')
+    hashing.PoolHash.ejecutar = original
+
+    for trabajadores in args.trabajadores:
+        hashing._pool = hashing.PoolHash(trabajadores=trabajadores)
+        ronda(f'pool de {trabajadores}', args.clientes, args.logins, 'usuario')
+        estadisticas = hashing._pool.estadisticas()
+        print(f"{'':<28} espera en cola p50 {estadisticas['espera_p50'] * 1000:.1f} ms, "
+              f"p99 {estadisticas['espera_p99'] * 1000:.1f} ms")
+
+    ronda('con rehash al iniciar sesión', args.clientes, args.logins, 'antiguo')
+
+
+if __name__ == '__main__':
+    main()
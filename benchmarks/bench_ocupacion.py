@@ -0,0 +1,59 @@
+# benchmarks/bench_ocupacion.py
+"""
+Latency of the in-memory location occupancy queries.
+
+Usage: python benchmarks/bench_ocupacion.py [--productos N] [--ubicaciones N]
+
+Fills `ocupacion.OcupacionUbicaciones` with synthetic products (no
+database involved) and times the calls behind the /api/ubicaciones
+endpoints, plus applying a batch of scan moves.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocupacion import OcupacionUbicaciones  # noqa: E402
+
+
+def medir(nombre, funcion, repeticiones=1000):
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    por_llamada = (time.perf_counter() - t0) / repeticiones
+    print(f'{nombre:<34} {por_llamada * 1e6:10.1f} µs')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--productos', type=int, default=50000)
+    parser.add_argument('--ubicaciones', type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    ahora = datetime.utcnow()
+    ubicaciones = [f'Aula {i}' for i in range(args.ubicaciones)]
+    ocupacion = OcupacionUbicaciones()
+    ocupacion._por_ubicacion = {}
+    t0 = time.perf_counter()
+    ocupacion.registrar(
+        (i, rng.choice(ubicaciones), ahora - timedelta(minutes=rng.randrange(7 * 24 * 60)))
+        for i in range(args.productos)
+    )
+    print(f'carga de {args.productos} productos: {time.perf_counter() - t0:.2f} s')
+
+    desde = ahora - timedelta(hours=48)
+    medir('conteos()', ocupacion.conteos)
+    medir('contenido(ubicación)', lambda: ocupacion.contenido(rng.choice(ubicaciones)))
+    medir('contar_sin_ver(48 h)', lambda: ocupacion.contar_sin_ver(desde))
+    medir('sin_ver(48 h, limite=50)', lambda: ocupacion.sin_ver(desde, limite=50))
+    lote = [(rng.randrange(args.productos), rng.choice(ubicaciones), ahora) for _ in range(1000)]
+    medir('registrar(1000 movimientos)', lambda: ocupacion.registrar(lote), repeticiones=20)
+
+
+if __name__ == '__main__':
+    main()
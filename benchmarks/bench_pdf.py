@@ -0,0 +1,61 @@
+# benchmarks/bench_pdf.py
+"""
+Rows/second of the single-table PDF renderer against the paged engine.
+
+Usage: python benchmarks/bench_pdf.py [filas ...] [--procesos N]
+
+Synthetic rows are used so the numbers measure rendering only.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pdf_report import render_pdf_movimientos, render_pdf_paginado  # noqa: E402
+
+ESTADOS = ['Disponible', 'Prestado', 'Reparación', 'Uso']
+
+
+def filas_sinteticas(n):
+    inicio = datetime(2024, 1, 1)
+    for i in range(n):
+        yield (
+            (inicio - timedelta(minutes=i)).strftime('%Y-%m-%d %H:%M'),
+            f'Producto {i % 5000}',
+            f'usuario{i % 300}',
+            ESTADOS[i % 4],
+            ESTADOS[(i + 1) % 4],
+        )
+
+
+def medir(nombre, render, n):
+    buffer = BytesIO()
+    t0 = time.perf_counter()
+    render(filas_sinteticas(n), buffer)
+    segundos = time.perf_counter() - t0
+    print(f'{nombre:<28} {n:>8} filas  {segundos:8.2f} s  {n / segundos:10.0f} filas/s  {len(buffer.getvalue()) // 1024:>7} KiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('filas', nargs='*', type=int, default=[1000, 5000, 20000])
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--max-clasico', type=int, default=20000,
+                        help='skip the single-table renderer above this many rows')
+    args = parser.parse_args()
+
+    for n in args.filas:
+        if n <= args.max_clasico:
+            medir('tabla única (actual)', render_pdf_movimientos, n)
+        medir('paginado, 1 proceso', lambda f, d: render_pdf_paginado(f, d, max_filas=None), n)
+        medir(f'paginado, {args.procesos} procesos',
+              lambda f, d: render_pdf_paginado(f, d, max_filas=None, procesos=args.procesos), n)
+        print()
+
+
+if __name__ == '__main__':
+    main()
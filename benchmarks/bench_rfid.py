@@ -0,0 +1,109 @@
+# benchmarks/bench_rfid.py
+"""
+Reads/second through POST /api/rfid/escaneos, by batch size.
+
+Usage: python benchmarks/bench_rfid.py [tamano_lote ...] [--lecturas N] [--productos N]
+
+Runs against a scratch SQLite database seeded with tagged products. A
+per-read ORM loop (lookup, add EscaneoRFID, update Producto) is timed
+first as the baseline the batch endpoint replaces; 2% of the generated
+reads use unknown tags so the reject path is exercised.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its configuration at import time, so set it up first.
+_directorio = tempfile.mkdtemp(prefix='bench_rfid_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'bench.db')
+os.environ['RFID_LECTOR_TOKENS'] = 'bench'
+
+from app import app, initialize_estados  # noqa: E402
+from extensions import db  # noqa: E402
+from indice_rfid import indice_tags  # noqa: E402
+from models import EscaneoRFID, Estado, Producto  # noqa: E402
+
+UBICACIONES = [f'Aula {i}' for i in range(1, 21)]
+
+
+def sembrar(n_productos):
+    db.create_all()
+    initialize_estados()
+    estado_id = Estado.query.filter_by(nombre='Disponible').first().id
+    db.session.execute(db.insert(Producto), [
+        {'nombre': f'Producto {i}', 'codigo': f'P{i:07d}', 'estado_id': estado_id,
+         'rfid_tag': f'E200{i:012d}', 'fecha_alta': datetime.utcnow()}
+        for i in range(n_productos)
+    ])
+    db.session.commit()
+
+
+def lecturas_sinteticas(n, n_productos, rng):
+    inicio = datetime(2026, 1, 1)
+    for i in range(n):
+        desconocido = rng.random() < 0.02
+        tag = f'FFFF{i:012d}' if desconocido else f'E200{rng.randrange(n_productos):012d}'
+        yield {
+            'rfid_tag': tag,
+            'lector_id': f'lector-{i % 8}',
+            'ubicacion': UBICACIONES[rng.randrange(len(UBICACIONES))],
+            'timestamp': (inicio + timedelta(milliseconds=i)).isoformat()
+        }
+
+
+def por_lectura(lecturas):
+    """Baseline: one lookup, insert and update per read."""
+    for dato in lecturas:
+        producto = Producto.query.filter_by(rfid_tag=dato['rfid_tag']).first()
+        if producto is None:
+            continue
+        fecha = datetime.fromisoformat(dato['timestamp'])
+        db.session.add(EscaneoRFID(producto_id=producto.id, fecha_hora=fecha,
+                                   ubicacion=dato['ubicacion'], lector_id=dato['lector_id']))
+        producto.ultimo_escaneo = fecha
+        producto.ubicacion_actual = dato['ubicacion']
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('lotes', nargs='*', type=int, default=[100, 1000, 5000])
+    parser.add_argument('--lecturas', type=int, default=50000)
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--base', type=int, default=2000, help='reads for the per-read baseline')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    app.logger.setLevel('ERROR')  # one warning per batch with rejects would dominate the output
+    with app.app_context():
+        sembrar(args.productos)
+        lecturas = list(lecturas_sinteticas(args.base, args.productos, rng))
+        t0 = time.perf_counter()
+        por_lectura(lecturas)
+        segundos = time.perf_counter() - t0
+        print(f"{'por lectura (ORM)':<22} {args.base:>8} lecturas  {segundos:8.2f} s  {args.base / segundos:10.0f} lecturas/s")
+
+    cliente = app.test_client()
+    for tamano in args.lotes:
+        lecturas = list(lecturas_sinteticas(args.lecturas, args.productos, rng))
+        aceptadas = 0
+        t0 = time.perf_counter()
+        for inicio in range(0, len(lecturas), tamano):
+            respuesta = cliente.post('/api/rfid/escaneos', json=lecturas[inicio:inicio + tamano],
+                                     headers={'X-Lector-Token': 'bench'})
+            assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+            aceptadas += respuesta.get_json()['aceptadas']
+        segundos = time.perf_counter() - t0
+        print(f"{f'lote de {tamano}':<22} {len(lecturas):>8} lecturas  {segundos:8.2f} s  "
+              f"{len(lecturas) / segundos:10.0f} lecturas/s  ({aceptadas} aceptadas)")
+    print(f'índice de tags: {indice_tags.estadisticas()}')
+
+
+if __name__ == '__main__':
+    main()
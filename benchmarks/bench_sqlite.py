@@ -0,0 +1,143 @@
+# benchmarks/bench_sqlite.py
+"""
+Concurrent read/write throughput on SQLite with default journal settings vs the tuned profile.
+
+Usage: python benchmarks/bench_sqlite.py [--lectores N] [--escritores N] [--segundos N] [--productos N]
+
+Each round seeds a scratch database file and then runs ``--lectores``
+reader and ``--escritores`` writer processes for ``--segundos`` seconds,
+like gunicorn workers sharing one file. Readers run the dashboard-style
+queries (products per estado, last movements of a product); writers
+change a product's estado and record the movement in one transaction.
+The first round uses SQLite's defaults (rollback journal,
+synchronous=FULL, only pysqlite's 5 s lock timeout); the second uses
+`extensions.PRAGMAS_SQLITE`. Reports operations/s, p50/p99 latency and
+"database is locked" errors per role.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+import busqueda  # noqa: E402,F401  (its triggers are part of every producto write)
+from extensions import PRAGMAS_SQLITE, configurar_sqlite, db  # noqa: E402
+from models import Estado, Movimiento, Producto, RoleEnum, Usuario  # noqa: E402
+
+PERFILES = [
+    ('por defecto', {'journal_mode': 'DELETE', 'synchronous': 'FULL'}),
+    ('perfil ajustado', PRAGMAS_SQLITE),
+]
+LECTURAS = (
+    'SELECT estado_id, count(*) FROM producto GROUP BY estado_id',
+    'SELECT id, estado_nuevo, fecha_hora FROM movimiento WHERE producto_id = :producto '
+    'ORDER BY fecha_hora DESC LIMIT 20',
+)
+
+
+def sembrar(uri, pragmas, n_productos):
+    configurar_sqlite(pragmas)
+    engine = create_engine(uri)
+    db.metadata.create_all(engine)
+    azar = random.Random(42)
+    with engine.begin() as connection:
+        connection.execute(insert(Estado), [{'nombre': nombre, 'orden': orden}
+                                            for orden, nombre in enumerate(['Disponible', 'Prestado', 'Reparación'])])
+        estados = list(connection.scalars(select(Estado.id)))
+        usuario_id = connection.execute(insert(Usuario).values(
+            nombre_usuario='bench', contrasena='x', rol=RoleEnum.ADMIN, activo=True, fecha_registro=datetime.utcnow()
+        )).inserted_primary_key[0]
+        connection.execute(insert(Producto), [
+            {'nombre': f'Producto {i}', 'codigo': f'BENCH-{i:06d}', 'estado_id': azar.choice(estados)}
+            for i in range(n_productos)
+        ])
+        connection.execute(insert(Movimiento), [
+            {'producto_id': azar.randrange(n_productos) + 1, 'usuario_id': usuario_id,
+             'estado_anterior': 'Disponible', 'estado_nuevo': 'Prestado'}
+            for _ in range(n_productos * 5)
+        ])
+    engine.dispose()
+    return estados, usuario_id
+
+
+def trabajar(rol, indice, uri, pragmas, segundos, n_productos, estados, usuario_id):
+    configurar_sqlite(pragmas)
+    engine = create_engine(uri)
+    azar = random.Random(indice)
+    latencias = []
+    bloqueos = 0
+    fin = time.monotonic() + segundos
+    with engine.connect() as connection:
+        while time.monotonic() < fin:
+            producto = azar.randrange(n_productos) + 1
+            t0 = time.perf_counter()
+            try:
+                if rol == 'lector':
+                    for sentencia in LECTURAS:
+                        connection.execute(text(sentencia), {'producto': producto}).all()
+                    connection.rollback()
+                else:
+                    connection.execute(text('UPDATE producto SET estado_id = :estado WHERE id = :producto'),
+                                       {'estado': azar.choice(estados), 'producto': producto})
+                    connection.execute(text(
+                        'INSERT INTO movimiento (producto_id, usuario_id, estado_anterior, estado_nuevo, fecha_hora) '
+                        "VALUES (:producto, :usuario, 'Disponible', 'Prestado', CURRENT_TIMESTAMP)"
+                    ), {'producto': producto, 'usuario': usuario_id})
+                    connection.commit()
+            except OperationalError as error:
+                connection.rollback()
+                if 'locked' not in str(error):
+                    raise
+                bloqueos += 1
+                continue
+            latencias.append(time.perf_counter() - t0)
+    engine.dispose()
+    return rol, latencias, bloqueos
+
+
+def ronda(nombre, pragmas, args):
+    directorio = tempfile.mkdtemp(prefix='bench_sqlite_')
+    uri = 'sqlite:///' + os.path.join(directorio, 'bench.db')
+    estados, usuario_id = sembrar(uri, pragmas, args.productos)
+    roles = ['lector'] * args.lectores + ['escritor'] * args.escritores
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=len(roles), mp_context=contexto) as executor:
+        futuros = [
+            executor.submit(trabajar, rol, i, uri, pragmas, args.segundos, args.productos, estados, usuario_id)
+            for i, rol in enumerate(roles)
+        ]
+        resultados = [futuro.result() for futuro in futuros]
+    for rol in ('lector', 'escritor'):
+        latencias = sorted(t for propio, tiempos, _ in resultados if propio == rol for t in tiempos)
+        bloqueos = sum(b for propio, _, b in resultados if propio == rol)
+        if not latencias:
+            print(f'{nombre:<16} {rol:<9} sin operaciones completadas, {bloqueos} bloqueos')
+            continue
+        p50 = latencias[len(latencias) // 2] * 1000
+        p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+        print(f'{nombre:<16} {rol:<9} {len(latencias) / args.segundos:8.1f} op/s   p50 {p50:7.2f} ms   '
+              f'p99 {p99:8.2f} ms   bloqueos {bloqueos}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lectores', type=int, default=4, help='reader processes')
+    parser.add_argument('--escritores', type=int, default=2, help='writer processes')
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--productos', type=int, default=20000)
+    args = parser.parse_args()
+    for nombre, pragmas in PERFILES:
+        ronda(nombre, pragmas, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+# benchmarks/rfid_simulator.py
+"""
+Replays synthetic RFID reader traffic through the asyncio gateway.
+
+Usage: python benchmarks/rfid_simulator.py [--lectores N] [--tasa N] [--duracion S]
+       [--transporte tcp|udp] [--formato lineas|msgpack] [--destino HOST:PUERTO]
+
+Each simulated reader is a portal with a few dozen tags in its field that
+are re-read continuously, with tags entering and leaving over time, like a
+fixed reader at a door. By default the gateway runs in-process against a
+scratch SQLite database seeded with tagged products, and the report gives
+the sustained reads/s (sent and written) and the latency from the moment a
+read reaches the gateway until its batch is committed. With --destino the
+traffic goes to an already running gateway instead and only the sending
+side is reported.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import msgpack  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+import rfid  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Estado, Producto  # noqa: E402
+from rfid_gateway import FORMATOS, Pasarela  # noqa: E402
+
+TAGS_EN_CAMPO = 40
+
+
+def sembrar(database_url, n_productos):
+    engine = create_engine(database_url)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        estado_id = conn.execute(insert(Estado).values(nombre='Disponible', orden=1)).inserted_primary_key[0]
+        conn.execute(insert(Producto), [
+            {'nombre': f'Producto {i}', 'codigo': f'P{i:07d}', 'estado_id': estado_id,
+             'rfid_tag': f'E200{i:012d}', 'fecha_alta': datetime.utcnow()}
+            for i in range(n_productos)
+        ])
+    engine.dispose()
+
+
+def codificar(lectura, formato):
+    if formato == 'msgpack':
+        return msgpack.packb(lectura)
+    return json.dumps(lectura).encode() + b'\n'
+
+
+async def lector(numero, args, host, puerto, enviadas):
+    """Send ``args.tasa`` reads/s for ``args.duracion`` seconds, in 10 ms ticks."""
+    rng = random.Random(numero)
+    campo = [rng.randrange(args.productos) for _ in range(TAGS_EN_CAMPO)]
+    lector_id = f'portal-{numero}'
+    ubicacion = f'Puerta {numero}'
+    por_tick = args.tasa / 100
+    pendiente = 0.0
+
+    if args.transporte == 'tcp':
+        _, writer = await asyncio.open_connection(host, puerto)
+        enviar = writer.write
+    else:
+        transporte, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(host, puerto))
+        enviar = transporte.sendto
+
+    fin = time.monotonic() + args.duracion
+    while time.monotonic() < fin:
+        pendiente += por_tick
+        while pendiente >= 1:
+            pendiente -= 1
+            if rng.random() < 0.01:
+                campo[rng.randrange(TAGS_EN_CAMPO)] = rng.randrange(args.productos)
+            tag = f'E200{campo[rng.randrange(TAGS_EN_CAMPO)]:012d}'
+            enviar(codificar([tag, lector_id, ubicacion, time.time()], args.formato))
+            enviadas[0] += 1
+        if args.transporte == 'tcp':
+            await writer.drain()  # the gateway's backpressure shows up here
+        await asyncio.sleep(0.01)
+
+    if args.transporte == 'tcp':
+        writer.close()
+        await writer.wait_closed()
+    else:
+        transporte.close()
+
+
+async def simular(args):
+    pasarela = None
+    if args.destino:
+        host, puerto = args.destino.rsplit(':', 1)
+        puerto = int(puerto)
+    else:
+        directorio = tempfile.mkdtemp(prefix='rfid_sim_')
+        database_url = 'sqlite:///' + os.path.join(directorio, 'sim.db')
+        sembrar(database_url, args.productos)
+        pasarela = Pasarela(
+            database_url, tamano_lote=args.lote, intervalo=args.intervalo,
+            filtro=rfid.FiltroRebote(args.ventana) if args.ventana else None
+        )
+        escucha = ('127.0.0.1', 0)
+        direcciones = await pasarela.iniciar(
+            tcp=escucha if args.transporte == 'tcp' else None,
+            udp=escucha if args.transporte == 'udp' else None,
+            formato=args.formato
+        )
+        host, puerto = direcciones[args.transporte]
+
+    enviadas = [0]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(lector(i, args, host, puerto, enviadas) for i in range(args.lectores)))
+    envio = time.perf_counter() - t0
+    print(f'enviadas      {enviadas[0]:>10}  {enviadas[0] / envio:10.0f} lecturas/s en {envio:.1f} s')
+    if pasarela is None:
+        return
+
+    await asyncio.sleep(0.1)  # let the last datagrams/segments arrive
+    await pasarela.detener()
+    total = time.perf_counter() - t0
+    stats = pasarela.estadisticas()
+    print(f"procesadas    {stats['recibidas']:>10}  {stats['recibidas'] / total:10.0f} lecturas/s hasta vaciar la cola")
+    for clave in ('aceptadas', 'suprimidas', 'rechazadas', 'descartadas', 'malformadas', 'lotes', 'lotes_fallidos',
+                  'perdidas'):
+        print(f'{clave:<13} {stats[clave]:>10}')
+    for clave in ('latencia_p50', 'latencia_p99', 'latencia_max'):
+        valor = stats[clave]
+        print(f"{clave:<13} {'-' if valor is None else f'{valor * 1000:.1f} ms':>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lectores', type=int, default=20)
+    parser.add_argument('--tasa', type=float, default=200, help='lecturas/s por lector')
+    parser.add_argument('--duracion', type=float, default=10, help='segundos de tráfico')
+    parser.add_argument('--transporte', choices=('tcp', 'udp'), default='tcp')
+    parser.add_argument('--formato', choices=FORMATOS, default='lineas')
+    parser.add_argument('--productos', type=int, default=20000)
+    parser.add_argument('--lote', type=int, default=1000)
+    parser.add_argument('--intervalo', type=float, default=0.2)
+    parser.add_argument('--ventana', type=float, default=5, help='ventana de rebote (0 la desactiva)')
+    parser.add_argument('--destino', help='HOST:PUERTO de una pasarela ya en marcha')
+    args = parser.parse_args()
+    asyncio.run(simular(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# busqueda.py
+"""
+Full-text product search over an SQLite FTS5 index.
+
+``producto_fts`` is an external-content FTS5 table over ``producto``
+(``nombre``, ``descripcion``, ``codigo``): it stores only the inverted
+index and reads the text back from ``producto`` by rowid. Triggers on
+``producto`` keep it in sync, so ORM writes, bulk INSERTs and raw SQL
+are all indexed in the same transaction as the row. Migration
+f8b2d6c4a913 creates it on existing databases; the ``after_create``
+listener below does the same for databases built with ``db.create_all()``.
+"""
+import re
+
+from sqlalchemy import Column, Integer, MetaData, Table, Text, event, func, literal_column, select, text
+
+from extensions import db
+from models import Producto
+
+# bm25 column weights: a hit in the name counts most, then the code, then the description.
+PESOS = (10.0, 5.0, 1.0)
+# Most results a search returns.
+LIMITE_MAXIMO = 200
+# Words beyond this are ignored; each one is a separate index lookup.
+MAX_TERMINOS = 8
+
+# Statements that create the index and its triggers; migration f8b2d6c4a913 runs the same ones.
+DDL_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS producto_fts USING fts5("
+    "nombre, codigo, descripcion, content='producto', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS producto_fts_ai AFTER INSERT ON producto BEGIN "
+    "INSERT INTO producto_fts(rowid, nombre, codigo, descripcion) "
+    "VALUES (new.id, new.nombre, new.codigo, new.descripcion); END",
+    "CREATE TRIGGER IF NOT EXISTS producto_fts_ad AFTER DELETE ON producto BEGIN "
+    "INSERT INTO producto_fts(producto_fts, rowid, nombre, codigo, descripcion) "
+    "VALUES ('delete', old.id, old.nombre, old.codigo, old.descripcion); END",
+    "CREATE TRIGGER IF NOT EXISTS producto_fts_au AFTER UPDATE OF nombre, codigo, descripcion ON producto BEGIN "
+    "INSERT INTO producto_fts(producto_fts, rowid, nombre, codigo, descripcion) "
+    "VALUES ('delete', old.id, old.nombre, old.codigo, old.descripcion); "
+    "INSERT INTO producto_fts(rowid, nombre, codigo, descripcion) "
+    "VALUES (new.id, new.nombre, new.codigo, new.descripcion); END",
+)
+
+# Kept out of db.metadata so create_all() and autogenerate leave the virtual table alone.
+producto_fts = Table(
+    'producto_fts', MetaData(),
+    Column('rowid', Integer, primary_key=True),
+    Column('nombre', Text),
+    Column('codigo', Text),
+    Column('descripcion', Text),
+)
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def expresion_fts(texto):
+    """
+    Turn free text into an FTS5 query where every word must match as a prefix.
+
+    Each whitespace-separated word becomes a phrase of its tokens, split the
+    way the ``unicode61`` tokenizer splits them, with a prefix match on the
+    last one: 'LAP-00' becomes ``"LAP 00"*`` and matches 'LAP-0012' but not
+    a 'LAP' and a '00' far apart. FTS5 syntax in the input is never
+    interpreted. Returns None if the text has no words.
+    """
+    frases = []
+    for palabra in (texto or '').split():
+        tokens = _TOKEN.findall(palabra)
+        if tokens:
+            frases.append('"' + ' '.join(tokens) + '"*')
+    if not frases:
+        return None
+    return ' AND '.join(frases[:MAX_TERMINOS])
+
+
+def buscar_productos(texto, estado_id=None, categoria_id=None, limite=20, opciones=()):
+    """
+    Return up to ``limite`` products matching ``texto``, best match first.
+
+    Ranked by bm25 with `PESOS`; ties keep the lowest id first. Without
+    filters the ranking runs inside the index and only the top rows are
+    joined to ``producto``; the ``estado_id`` and ``categoria_id`` filters
+    need producto's columns, so the matches are joined first and then
+    ranked. ``opciones`` are loader options for the query.
+    """
+    expresion = expresion_fts(texto)
+    if expresion is None:
+        return []
+    limite = max(1, min(limite, LIMITE_MAXIMO))
+    coincide = literal_column('producto_fts').op('MATCH')(expresion)
+    relevancia = func.bm25(literal_column('producto_fts'), *PESOS)
+    if estado_id or categoria_id:
+        query = Producto.query.join(producto_fts, producto_fts.c.rowid == Producto.id).filter(coincide)
+        if estado_id:
+            query = query.filter(Producto.estado_id == estado_id)
+        if categoria_id:
+            query = query.filter(Producto.categoria_id == categoria_id)
+        query = query.order_by(relevancia, Producto.id)
+    else:
+        mejores = (
+            select(producto_fts.c.rowid, relevancia.label('relevancia'))
+            .where(coincide)
+            .order_by(relevancia, producto_fts.c.rowid)
+            .limit(limite)
+            .subquery()
+        )
+        query = (
+            Producto.query
+            .join(mejores, mejores.c.rowid == Producto.id)
+            .order_by(mejores.c.relevancia, Producto.id)
+        )
+    return query.options(*opciones).limit(limite).all()
+
+
+def reconstruir_indice(session=None):
+    """Rebuild ``producto_fts`` from ``producto``, e.g. after restoring the table from a dump."""
+    session = session or db.session
+    session.execute(text("INSERT INTO producto_fts(producto_fts) VALUES ('rebuild')"))
+    session.commit()
+
+
+def _crear_indice(tabla, connection, **kwargs):
+    if connection.dialect.name != 'sqlite':
+        return
+    for sentencia in DDL_FTS:
+        connection.execute(text(sentencia))
+
+
+event.listen(Producto.__table__, 'after_create', _crear_indice)
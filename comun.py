@@ -0,0 +1,67 @@
+# comun.py
+"""
+Helpers shared by the per-worker caches, pools and background writers.
+
+`config` and `percentil` are the small lookups every module with tunable
+limits or latency statistics needs. `pendientes` and `al_confirmar` are
+the "collect in the transaction, apply on commit" pattern: ORM events or
+callers put changes in ``session.info`` under a module's key, and they
+are handed to that module once the transaction commits, or dropped if
+it rolls back, so no worker-local state ever reflects uncommitted rows.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# session.info key -> (aplicar, descartar) registered with `al_confirmar`.
+_manejadores = {}
+
+
+def config(clave, defecto):
+    """``current_app.config[clave]`` inside an app context, else ``defecto``."""
+    if has_app_context():
+        return current_app.config.get(clave, defecto)
+    return defecto
+
+
+def percentil(ordenados, p):
+    """The ``p`` quantile (0-1) of an already sorted sequence; None if it is empty."""
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def pendientes(session, clave, fabrica=list):
+    """Return the collection stored under ``clave`` for the session's open transaction, creating it with ``fabrica``."""
+    valor = session.info.get(clave)
+    if valor is None:
+        valor = session.info[clave] = fabrica()
+    return valor
+
+
+def al_confirmar(clave, aplicar, descartar=None):
+    """
+    Hand ``session.info[clave]`` to ``aplicar`` when a session commits.
+
+    On a rollback the value is dropped, after calling ``descartar`` with
+    it if given. Empty or missing values are skipped.
+    """
+    _manejadores[clave] = (aplicar, descartar)
+
+
+def _confirmar(session):
+    for clave, (aplicar, _) in _manejadores.items():
+        valor = session.info.pop(clave, None)
+        if valor:
+            aplicar(valor)
+
+
+def _descartar(session, previous_transaction=None):
+    for clave, (_, descartar) in _manejadores.items():
+        valor = session.info.pop(clave, None)
+        if valor and descartar is not None:
+            descartar(valor)
+
+
+event.listen(Session, 'after_commit', _confirmar)
+event.listen(Session, 'after_soft_rollback', _descartar)
@@ -0,0 +1,99 @@
+# counters.py
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from archivo_auditoria import catalogo as catalogo_auditoria
+from extensions import db
+from models import Auditoria, Contador, Movimiento, Producto, Usuario
+
+PRODUCTOS = 'productos'
+USUARIOS = 'usuarios'
+MOVIMIENTOS = 'movimientos'
+AUDITORIAS = 'auditorias'
+PRESTAMOS_ACTIVOS = 'prestamos_activos'
+
+
+def clave_estado(estado_id):
+    """Counter key for the number of products in an estado."""
+    return f'productos_estado:{estado_id}'
+
+
+def clave_rol(rol):
+    """Counter key for the number of users with a role (RoleEnum or its value)."""
+    return f'usuarios_rol:{getattr(rol, "value", rol)}'
+
+
+def incrementar(deltas, session=None):
+    """
+    Apply ``{clave: delta}`` to the counters in the caller's transaction.
+
+    All keys are upserted with a single executemany, so the counters commit
+    or roll back together with the write that caused them.
+    """
+    deltas = {clave: delta for clave, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    session = session or db.session
+    stmt = insert(Contador)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Contador.clave],
+        set_={'valor': Contador.valor + stmt.excluded.valor}
+    )
+    session.execute(stmt, [{'clave': clave, 'valor': delta} for clave, delta in deltas.items()])
+
+
+def deltas_cambio_estado(estado_anterior_id, estado_nuevo_id):
+    """Counter deltas for moving one product between estados."""
+    if estado_anterior_id == estado_nuevo_id:
+        return {}
+    return {clave_estado(estado_anterior_id): -1, clave_estado(estado_nuevo_id): 1}
+
+
+def leer(*claves, session=None):
+    """Return ``{clave: valor}`` for the given keys in one query; missing keys read as 0."""
+    session = session or db.session
+    valores = dict(session.execute(
+        select(Contador.clave, Contador.valor).where(Contador.clave.in_(claves))
+    ).all())
+    return {clave: valores.get(clave, 0) for clave in claves}
+
+
+def reconstruir_contadores(session=None):
+    """
+    Recompute every counter from the base tables and replace the stored values.
+
+    Use it after bulk SQL that bypassed the application or whenever a
+    counter is suspected to have drifted. Archived audit rows (see
+    `archivo_auditoria.py`) still count towards ``auditorias``.
+    """
+    session = session or db.session
+    valores = {
+        PRODUCTOS: session.scalar(select(func.count(Producto.id))),
+        USUARIOS: session.scalar(select(func.count(Usuario.id))),
+        MOVIMIENTOS: session.scalar(select(func.count(Movimiento.id))),
+        AUDITORIAS: session.scalar(select(func.count(Auditoria.id))) + catalogo_auditoria.total(),
+        PRESTAMOS_ACTIVOS: session.scalar(
+            select(func.count(Producto.id)).where(Producto.usuario_asignado.isnot(None))
+        ),
+    }
+    for estado_id, total in session.execute(
+        select(Producto.estado_id, func.count(Producto.id)).group_by(Producto.estado_id)
+    ):
+        valores[clave_estado(estado_id)] = total
+    for rol, total in session.execute(
+        select(Usuario.rol, func.count(Usuario.id)).group_by(Usuario.rol)
+    ):
+        valores[clave_rol(rol)] = total
+
+    session.query(Contador).delete()
+    session.add_all(Contador(clave=clave, valor=valor) for clave, valor in valores.items())
+    session.commit()
+    return valores
+
+
+if __name__ == '__main__':
+    from app import app
+
+    with app.app_context():
+        for clave, valor in sorted(reconstruir_contadores().items()):
+            print(f'{clave}: {valor}')
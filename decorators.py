@@ -1,5 +1,6 @@
 from functools import wraps
-from flask import flash, redirect, url_for, current_app
+from hmac import compare_digest
+from flask import flash, g, redirect, url_for, current_app, jsonify, request
 from flask_login import current_user
 from models import RoleEnum  # Asegúrate de que la ruta de importación es correcta
 
@@ -23,4 +24,49 @@ def requiere_roles(*roles):
                 return redirect(url_for('inicio'))  # Asegúrate de que 'inicio' es una ruta válida
             return f(*args, **kwargs)
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
+
+
+# Maximum SQL statements per request, by view name; checked by query_budget.py.
+PRESUPUESTOS_CONSULTAS = {}
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara cuántas sentencias SQL puede ejecutar una vista en una petición.
+
+    No cambia el comportamiento en producción: solo registra el límite para
+    que `query_budget.py` lo compruebe contra un conjunto de datos sembrado.
+
+    :param maximo: Número máximo de sentencias, incluida la carga del usuario.
+    """
+    def decorator(f):
+        PRESUPUESTOS_CONSULTAS[f.__name__] = maximo
+        return f
+    return decorator
+
+
+def requiere_token_lector(f):
+    """
+    Restringe una vista a los lectores RFID y a los administradores.
+
+    Los lectores se identifican con la cabecera ``X-Lector-Token`` (o
+    ``Authorization: Bearer <token>``), que debe estar en
+    ``RFID_LECTOR_TOKENS``. Sin token válido se exige una sesión de ADMIN.
+    Al ser una API, responde con JSON 401 en lugar de redirigir. Si la
+    petición entra por token, este queda en ``g.token_lector``.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = request.headers.get('X-Lector-Token')
+        autorizacion = request.headers.get('Authorization', '')
+        if not token and autorizacion.startswith('Bearer '):
+            token = autorizacion[len('Bearer '):]
+        tokens_validos = current_app.config.get('RFID_LECTOR_TOKENS', set())
+        es_admin = current_user.is_authenticated and current_user.rol == RoleEnum.ADMIN
+        token_valido = bool(token) and any(compare_digest(token, valido) for valido in tokens_validos)
+        if not es_admin and not token_valido:
+            return jsonify({'error': 'Token de lector no válido.'}), 401
+        g.token_lector = token if token_valido else None
+        return f(*args, **kwargs)
+    return decorated_function
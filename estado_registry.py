@@ -0,0 +1,107 @@
+# estado_registry.py
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from comun import al_confirmar
+from extensions import db
+from models import Estado
+
+EstadoInfo = namedtuple('EstadoInfo', ['id', 'nombre', 'descripcion', 'color', 'orden'])
+# One loaded copy of the table; replaced as a whole so readers never see a half-updated one.
+_Copia = namedtuple('_Copia', ['por_id', 'por_nombre', 'ordenados'])
+
+# Upper bound on how long another worker's Estado edit can go unseen here.
+TTL_SEGUNDOS = 300
+
+
+class RegistroEstados:
+    """
+    Worker-local copy of the ``estado`` table.
+
+    The table holds a handful of rows that nearly every request looks up by
+    name or id, so they are loaded once with a single query and served from
+    memory. Entries are plain `EstadoInfo` tuples, not ORM objects, so they
+    can be shared between threads and sessions; assign ``estado_id`` rather
+    than the ``estado`` relationship when using them.
+
+    The copy is dropped whenever this worker inserts, updates or deletes an
+    Estado, and in any case after ``TTL_SEGUNDOS``.
+    """
+
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._copia = None
+        self._cargado_en = 0.0
+
+    def _vigente(self):
+        copia = self._copia
+        if copia is not None and self._cargado_en and time.monotonic() - self._cargado_en < self.ttl:
+            return copia
+        with self._lock:
+            copia = self._copia
+            if copia is not None and self._cargado_en and time.monotonic() - self._cargado_en < self.ttl:
+                return copia
+            filas = db.session.query(
+                Estado.id, Estado.nombre, Estado.descripcion, Estado.color, Estado.orden
+            ).order_by(Estado.orden, Estado.id).all()
+            ordenados = tuple(EstadoInfo(*fila) for fila in filas)
+            copia = _Copia(
+                {estado.id: estado for estado in ordenados},
+                {estado.nombre: estado for estado in ordenados},
+                ordenados
+            )
+            self._copia = copia
+            self._cargado_en = time.monotonic()
+            return copia
+
+    def por_nombre(self, nombre):
+        """Return the EstadoInfo called ``nombre``, or None."""
+        return self._vigente().por_nombre.get(nombre)
+
+    def por_id(self, estado_id):
+        """Return the EstadoInfo with id ``estado_id``, or None."""
+        copia = self._vigente()
+        try:
+            return copia.por_id.get(int(estado_id))
+        except (TypeError, ValueError):
+            return None
+
+    def todos(self):
+        """Return every EstadoInfo sorted by ``orden``."""
+        return list(self._vigente().ordenados)
+
+    def opciones(self):
+        """Return ``(id, nombre)`` choices for form select fields, sorted by ``orden``."""
+        return [(estado.id, estado.nombre) for estado in self.todos()]
+
+    def invalidar(self):
+        # Under the lock, so a reload already running cannot mark its copy fresh
+        # afterwards. Readers holding the current copy keep using it.
+        with self._lock:
+            self._cargado_en = 0.0
+
+
+registro_estados = RegistroEstados()
+
+
+def _estado_modificado(mapper, connection, target):
+    registro_estados.invalidar()
+    session = object_session(target)
+    if session is not None:
+        session.info['estados_modificados'] = True
+
+
+def _fin_de_transaccion(modificados):
+    # Drop again once the change is committed or rolled back, in case another
+    # request reloaded the registry in between.
+    registro_estados.invalidar()
+
+
+for _evento in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Estado, _evento, _estado_modificado)
+al_confirmar('estados_modificados', _fin_de_transaccion, _fin_de_transaccion)
@@ -0,0 +1,143 @@
+# exports.py
+import csv
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select
+
+from extensions import db
+from models import Movimiento, Producto, Usuario
+
+# Rows fetched from the cursor per round trip while streaming an export.
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = ['Fecha', 'Producto', 'Usuario', 'Estado Anterior', 'Estado Nuevo']
+EXPORT_KEYS = ['fecha', 'producto', 'usuario', 'estado_anterior', 'estado_nuevo']
+
+
+class _Echo:
+    """File-like object whose write() hands back the line instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def consulta_movimientos_exportacion(fecha_inicio=None, fecha_fin=None, estado=None):
+    """
+    Build the single joined SELECT used by every movement export.
+
+    Producto and Usuario are joined in so no per-row lazy loads are needed.
+    The filters mirror the ones accepted by /reportes: dates are 'YYYY-MM-DD'
+    strings (fecha_fin is inclusive) and ``estado`` is an Estado name matched
+    against ``Movimiento.estado_nuevo``; 'todos' or None disables it.
+    The movement id is selected last so callers can resume after a row.
+    """
+    stmt = (
+        select(
+            Movimiento.fecha_hora,
+            Producto.nombre,
+            Usuario.nombre_usuario,
+            Movimiento.estado_anterior,
+            Movimiento.estado_nuevo,
+            Movimiento.id
+        )
+        .join(Producto, Movimiento.producto_id == Producto.id)
+        .join(Usuario, Movimiento.usuario_id == Usuario.id)
+        .order_by(Movimiento.fecha_hora.desc(), Movimiento.id.desc())
+    )
+    if fecha_inicio:
+        stmt = stmt.where(Movimiento.fecha_hora >= datetime.strptime(fecha_inicio, '%Y-%m-%d'))
+    if fecha_fin:
+        stmt = stmt.where(
+            Movimiento.fecha_hora < datetime.strptime(fecha_fin, '%Y-%m-%d') + timedelta(days=1)
+        )
+    if estado and estado != 'todos':
+        stmt = stmt.where(Movimiento.estado_nuevo == estado)
+    return stmt
+
+
+def iterar_movimientos_exportacion(stmt, session=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield lists of export rows, one list per server-side chunk.
+
+    Each row is ``(fecha, producto, usuario, estado_anterior, estado_nuevo)``
+    with the date already formatted, so callers never touch ORM objects.
+    """
+    session = session or db.session
+    result = session.execute(
+        stmt.execution_options(stream_results=True, yield_per=chunk_size)
+    )
+    for partition in result.partitions(chunk_size):
+        yield [_formatear_fila(fila) for fila in partition]
+
+
+def iterar_movimientos_por_bloques(stmt, session, chunk_size=EXPORT_CHUNK_SIZE, al_terminar_bloque=None):
+    """
+    Yield the same chunks as ``iterar_movimientos_exportacion`` using keyset pages.
+
+    Every chunk is a separate bounded query resuming after the last
+    ``(fecha_hora, id)`` seen, so no cursor stays open between chunks and
+    the session can commit (e.g. job progress) while the export runs.
+    ``al_terminar_bloque(filas_en_bloque)`` is called after each chunk.
+    """
+    ultimo = None
+    while True:
+        pagina = stmt
+        if ultimo is not None:
+            fecha, mov_id = ultimo
+            pagina = pagina.where(or_(
+                Movimiento.fecha_hora < fecha,
+                and_(Movimiento.fecha_hora == fecha, Movimiento.id < mov_id)
+            ))
+        filas = session.execute(pagina.limit(chunk_size)).all()
+        if not filas:
+            return
+        ultimo = (filas[-1][0], filas[-1][-1])
+        yield [_formatear_fila(fila) for fila in filas]
+        if al_terminar_bloque is not None:
+            al_terminar_bloque(len(filas))
+        if len(filas) < chunk_size:
+            return
+
+
+def contar_movimientos_exportacion(stmt, session=None):
+    """Return how many rows ``stmt`` will export."""
+    session = session or db.session
+    return session.execute(
+        select(func.count()).select_from(stmt.order_by(None).subquery())
+    ).scalar_one()
+
+
+def _formatear_fila(fila):
+    fecha, producto, usuario, anterior, nuevo = fila[:5]
+    return (fecha.strftime('%Y-%m-%d %H:%M'), producto, usuario, anterior, nuevo)
+
+
+def generar_csv(stmt, session=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the CSV export one chunk of lines at a time, header first."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for filas in iterar_movimientos_exportacion(stmt, session, chunk_size):
+        yield ''.join(writer.writerow(fila) for fila in filas)
+
+
+def generar_ndjson(stmt, session=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export as newline-delimited JSON, one object per movement."""
+    for filas in iterar_movimientos_exportacion(stmt, session, chunk_size):
+        yield ''.join(
+            json.dumps(dict(zip(EXPORT_KEYS, fila)), ensure_ascii=False) + '\n'
+            for fila in filas
+        )
+
+
+def generar_json(stmt, session=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the export as a single JSON array without materialising it."""
+    yield '['
+    primero = True
+    for filas in iterar_movimientos_exportacion(stmt, session, chunk_size):
+        partes = []
+        for fila in filas:
+            partes.append(('' if primero else ',') + json.dumps(dict(zip(EXPORT_KEYS, fila)), ensure_ascii=False))
+            primero = False
+        yield ''.join(partes)
+    yield ']'
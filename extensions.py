@@ -1,6 +1,206 @@
 # extensions.py
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# session.info key holding the read-only engine of a view marked with `lectura.solo_lectura`.
+CLAVE_MOTOR_LECTURA = 'motor_lectura'
+# session.info flag: the current transaction has written, so it must keep reading from the write engine.
+CLAVE_ESCRITO = 'transaccion_escrita'
+
+
+class SesionEnrutada(Session):
+    """
+    ``db.session`` class that can send reads to a read-only engine.
+
+    While ``info[CLAVE_MOTOR_LECTURA]`` holds an engine (set by
+    `lectura.solo_lectura`), SELECTs run on it. Flushes and INSERT, UPDATE
+    and DELETE statements always go to the write engine, and once a
+    transaction has written, its later reads go there too, so a view
+    reads its own uncommitted changes. Without the key this is the
+    Flask-SQLAlchemy session unchanged.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        motor = self.info.get(CLAVE_MOTOR_LECTURA)
+        if motor is None or bind is not None:
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.info[CLAVE_ESCRITO] = True
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if self.info.get(CLAVE_ESCRITO):
+            return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        return motor
+
+
+db = SQLAlchemy(session_options={'class_': SesionEnrutada})
+
+logger = logging.getLogger(__name__)
+
+# Pragmas run on every new SQLite connection, in this order. WAL lets readers
+# keep reading while one writer commits; synchronous=NORMAL is durable across
+# application crashes in WAL mode (only a power loss can drop the last
+# commits) and saves an fsync per transaction. busy_timeout goes first so a
+# writer waits for the lock, including the one journal_mode=WAL takes the
+# first time, instead of failing with "database is locked". Negative
+# cache_size is in KiB and is per connection.
+PRAGMAS_SQLITE = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -32768,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+    'journal_size_limit': 67108864,
+}
+# Seconds between `PRAGMA optimize` and passive WAL checkpoint runs (see `MantenimientoSQLite`).
+INTERVALO_MANTENIMIENTO = 3600
+
+_VALOR_PRAGMA = re.compile(r'^-?\w+$')
+_pragmas = dict(PRAGMAS_SQLITE)
+
+
+def configurar_sqlite(pragmas):
+    """
+    Replace the pragmas applied to new SQLite connections.
+
+    ``pragmas`` maps names from `PRAGMAS_SQLITE` to values; a None or empty
+    value leaves that pragma at SQLite's default. Connections already in a
+    pool keep their settings. Processes that never call this (export jobs,
+    import workers) use `PRAGMAS_SQLITE`.
+    """
+    nuevos = {}
+    for nombre, valor in pragmas.items():
+        if nombre not in PRAGMAS_SQLITE:
+            raise ValueError(f'Pragma de SQLite no admitido: {nombre}')
+        if valor is None or valor == '':
+            continue
+        if not _VALOR_PRAGMA.match(str(valor)):
+            raise ValueError(f'Valor no válido para PRAGMA {nombre}: {valor!r}')
+        nuevos[nombre] = valor
+    _pragmas.clear()
+    _pragmas.update(nuevos)
+
+
+def pragmas_actuales(connection):
+    """Read back the tuned pragmas from ``connection``, e.g. to check WAL is really on."""
+    return {nombre: connection.exec_driver_sql(f'PRAGMA {nombre}').scalar() for nombre in PRAGMAS_SQLITE}
+
+
+def _aplicar_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        for nombre, valor in _pragmas.items():
+            try:
+                cursor.execute(f'PRAGMA {nombre}={valor}')
+            except sqlite3.OperationalError:
+                # A read-only connection (see `lectura.py`) cannot switch a database
+                # that is not in WAL yet; the write engine's connections will.
+                if nombre != 'journal_mode':
+                    raise
+    finally:
+        cursor.close()
+
+
+class MantenimientoSQLite:
+    """
+    Background thread that keeps a long-lived SQLite database in shape.
+
+    Every ``intervalo`` seconds it runs ``PRAGMA optimize``, which refreshes
+    the planner statistics of tables whose size changed enough to matter,
+    and a passive WAL checkpoint, which copies committed pages back into the
+    database file without waiting for readers. SQLite checkpoints on its own
+    after every 1000 pages, but only from a committing connection; this
+    keeps the WAL from growing across quiet periods with long readers.
+    """
+
+    def __init__(self, engine, intervalo=INTERVALO_MANTENIMIENTO):
+        self.engine = engine
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._ejecutar, name='mantenimiento-sqlite', daemon=True)
+        self.ejecuciones = 0
+        self.fallos = 0
+        self.ultima_duracion = None
+        self.ultimo_checkpoint = None
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def _ejecutar(self):
+        while not self._parar.wait(self.intervalo):
+            try:
+                self.ejecutar()
+            except Exception:
+                with self._lock:
+                    self.fallos += 1
+                logger.exception('Fallo en el mantenimiento de SQLite')
+
+    def ejecutar(self):
+        """Run one optimize + checkpoint pass now."""
+        inicio = time.monotonic()
+        with self.engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA optimize')
+            # (busy, frames in the WAL, frames copied back to the database)
+            checkpoint = tuple(connection.exec_driver_sql('PRAGMA wal_checkpoint(PASSIVE)').one())
+        with self._lock:
+            self.ejecuciones += 1
+            self.ultima_duracion = time.monotonic() - inicio
+            self.ultimo_checkpoint = checkpoint
+
+    def detener(self):
+        self._parar.set()
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'intervalo': self.intervalo,
+                'ejecuciones': self.ejecuciones,
+                'fallos': self.fallos,
+                'ultima_duracion': self.ultima_duracion,
+                'ultimo_checkpoint': self.ultimo_checkpoint,
+            }
+
+
+_mantenimiento = None
+_mantenimiento_lock = threading.Lock()
+
+
+def get_mantenimiento():
+    """
+    Return the worker-wide SQLite maintenance thread, starting it on first use.
+
+    Needs an app context. Returns None for other databases or when
+    ``SQLITE_MANTENIMIENTO_SEGUNDOS`` is 0.
+    """
+    global _mantenimiento
+    if _mantenimiento is None and has_app_context():
+        intervalo = current_app.config.get('SQLITE_MANTENIMIENTO_SEGUNDOS', INTERVALO_MANTENIMIENTO)
+        if not intervalo or db.engine.dialect.name != 'sqlite':
+            return None
+        with _mantenimiento_lock:
+            if _mantenimiento is None:
+                mantenimiento = MantenimientoSQLite(db.engine, intervalo)
+                mantenimiento.iniciar()
+                _mantenimiento = mantenimiento
+    return _mantenimiento
+
+
+def _fin_transaccion(session, *args):
+    session.info.pop(CLAVE_ESCRITO, None)
 
-db = SQLAlchemy()
 
+event.listen(Engine, 'connect', _aplicar_pragmas)
+event.listen(SesionEnrutada, 'after_commit', _fin_transaccion)
+event.listen(SesionEnrutada, 'after_rollback', _fin_transaccion)
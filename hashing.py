@@ -0,0 +1,129 @@
+# hashing.py
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from comun import config, percentil
+
+# Defaults when there is no app context (scripts) or the app leaves them unset.
+ITERACIONES = 600000
+TRABAJADORES = 4
+COLA_MAXIMA = 64
+ESPERA_MAXIMA = 10
+SALT_LENGTH = 16
+# Wait/duration samples kept for the percentiles in `estadisticas`.
+MUESTRAS = 10000
+
+
+class HashSaturado(RuntimeError):
+    """Raised when ``COLA_MAXIMA`` hashes are already queued for longer than ``ESPERA_MAXIMA`` seconds."""
+
+
+def metodo():
+    """The werkzeug method string new hashes are generated with, e.g. 'pbkdf2:sha256:600000'."""
+    return f"pbkdf2:sha256:{config('PASSWORD_HASH_ITERACIONES', ITERACIONES)}"
+
+
+class PoolHash:
+    """
+    Bounded thread pool for password hashing and verification.
+
+    pbkdf2 runs in OpenSSL with the GIL released, so the hashes run in
+    parallel with the rest of the worker; what the pool adds is a cap:
+    at most ``trabajadores`` hashes use CPU at once and at most
+    ``cola_maxima`` wait behind them, so a burst of logins cannot take over
+    every core. Callers block on the result, as before, and get
+    `HashSaturado` if no slot frees up within ``espera_maxima`` seconds.
+    """
+
+    def __init__(self, trabajadores=TRABAJADORES, cola_maxima=COLA_MAXIMA, espera_maxima=ESPERA_MAXIMA):
+        self.trabajadores = trabajadores
+        self.espera_maxima = espera_maxima
+        self._executor = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix='hash')
+        self._cupos = threading.BoundedSemaphore(trabajadores + cola_maxima)
+        self._lock = threading.Lock()
+        self.en_espera = 0
+        self.en_curso = 0
+        self.completados = 0
+        self.rechazados = 0
+        self.esperas = deque(maxlen=MUESTRAS)
+        self.duraciones = deque(maxlen=MUESTRAS)
+
+    def _ejecutar(self, funcion, args, encolado_en):
+        inicio = time.monotonic()
+        with self._lock:
+            self.en_espera -= 1
+            self.en_curso += 1
+        try:
+            return funcion(*args)
+        finally:
+            fin = time.monotonic()
+            with self._lock:
+                self.en_curso -= 1
+                self.completados += 1
+                self.esperas.append(inicio - encolado_en)
+                self.duraciones.append(fin - inicio)
+
+    def ejecutar(self, funcion, *args):
+        """Run ``funcion(*args)`` on the pool and return its result."""
+        if not self._cupos.acquire(timeout=self.espera_maxima):
+            with self._lock:
+                self.rechazados += 1
+            raise HashSaturado('Demasiadas operaciones de contraseña en cola')
+        try:
+            with self._lock:
+                self.en_espera += 1
+            return self._executor.submit(self._ejecutar, funcion, args, time.monotonic()).result()
+        finally:
+            self._cupos.release()
+
+    def estadisticas(self):
+        with self._lock:
+            esperas = sorted(self.esperas)
+            duraciones = sorted(self.duraciones)
+            return {
+                'trabajadores': self.trabajadores,
+                'en_espera': self.en_espera,
+                'en_curso': self.en_curso,
+                'completados': self.completados,
+                'rechazados': self.rechazados,
+                'espera_p50': percentil(esperas, 0.50),
+                'espera_p99': percentil(esperas, 0.99),
+                'duracion_p50': percentil(duraciones, 0.50),
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the worker-wide hashing pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolHash(
+                    trabajadores=config('PASSWORD_HASH_TRABAJADORES', TRABAJADORES),
+                    cola_maxima=config('PASSWORD_HASH_COLA', COLA_MAXIMA),
+                    espera_maxima=config('PASSWORD_HASH_ESPERA', ESPERA_MAXIMA)
+                )
+    return _pool
+
+
+def generar_hash(contrasena):
+    """Hash ``contrasena`` with the configured method on the hashing pool."""
+    return get_pool().ejecutar(generate_password_hash, contrasena, metodo(), SALT_LENGTH)
+
+
+def verificar(hash_guardado, contrasena):
+    """Check ``contrasena`` against a stored werkzeug hash on the hashing pool."""
+    return get_pool().ejecutar(check_password_hash, hash_guardado, contrasena)
+
+
+def necesita_rehash(hash_guardado):
+    """True if ``hash_guardado`` was not generated with the configured method and cost."""
+    return hash_guardado.split('$', 1)[0] != metodo()
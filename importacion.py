@@ -0,0 +1,438 @@
+# importacion.py
+import csv
+import json
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+
+from openpyxl import load_workbook
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash
+
+import counters
+import hashing
+from jobs import get_executor
+from models import Auditoria, Categoria, Estado, Movimiento, Producto, RoleEnum, TrabajoImportacion, Usuario
+
+FORMATOS_IMPORTACION = ('.csv', '.xlsx')
+# Rows hashed and inserted per transaction; progress is committed after each.
+TAMANO_LOTE = 500
+# Per-row errors kept in trabajo_importacion.errores (num_errores counts them all).
+MAX_ERRORES_GUARDADOS = 1000
+# Same limits as FormularioRegistro.
+LONGITUD_NOMBRE = (4, 150)
+LONGITUD_MINIMA_CONTRASENA = 6
+ROLES = {rol.value for rol in RoleEnum}
+VALORES_FALSOS = {'0', 'false', 'no', 'n', 'falso', 'inactivo'}
+# Catalogue rows inserted per transaction.
+TAMANO_LOTE_PRODUCTOS = 2000
+# Estado of imported products without an estado column.
+ESTADO_INICIAL = 'Disponible'
+# Movimiento.estado_anterior of the initial movement of an imported product.
+ESTADO_ANTERIOR_ALTA = 'Alta'
+
+
+def leer_filas(ruta):
+    """
+    Yield ``(numero_fila, {columna: valor})`` for each data row of a CSV or XLSX file.
+
+    Column names are taken from the first row, lower-cased and stripped;
+    ``numero_fila`` is the 1-based row number in the file, header included.
+    """
+    if ruta.lower().endswith('.xlsx'):
+        wb = load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            filas = wb.active.iter_rows(values_only=True)
+            cabecera = [str(celda or '').strip().lower() for celda in next(filas, ())]
+            for numero, fila in enumerate(filas, start=2):
+                if any(celda not in (None, '') for celda in fila):
+                    yield numero, dict(zip(cabecera, fila))
+        finally:
+            wb.close()
+        return
+
+    with open(ruta, newline='', encoding='utf-8-sig') as archivo:
+        lector = csv.reader(archivo)
+        cabecera = [columna.strip().lower() for columna in next(lector, [])]
+        for numero, fila in enumerate(lector, start=2):
+            if any(valor.strip() for valor in fila):
+                yield numero, dict(zip(cabecera, fila))
+
+
+def _texto(valor):
+    return '' if valor is None else str(valor).strip()
+
+
+def validar_usuarios(filas, session):
+    """
+    Split ``(numero_fila, datos)`` rows into users to create and per-row errors.
+
+    Applies the registration form's rules and checks every username
+    against the existing ones with a single query, and against the earlier
+    rows of the same file.
+
+    Returns:
+        tuple: ``(validos, errores)``, where ``validos`` is a list of
+        ``(numero_fila, nombre_usuario, contrasena, rol, activo)`` and
+        ``errores`` a list of ``{'fila', 'valor', 'error'}`` dicts.
+    """
+    existentes = set(session.scalars(select(Usuario.nombre_usuario)))
+    vistos = set()
+    validos, errores = [], []
+    for numero, datos in filas:
+        nombre = _texto(datos.get('nombre_usuario'))
+        contrasena = _texto(datos.get('contrasena', datos.get('contraseña')))
+        rol = _texto(datos.get('rol')).lower()
+        if not LONGITUD_NOMBRE[0] <= len(nombre) <= LONGITUD_NOMBRE[1]:
+            error = f'El nombre de usuario debe tener entre {LONGITUD_NOMBRE[0]} y {LONGITUD_NOMBRE[1]} caracteres.'
+        elif nombre in existentes:
+            error = 'El nombre de usuario ya existe.'
+        elif nombre in vistos:
+            error = 'Nombre de usuario repetido en el archivo.'
+        elif len(contrasena) < LONGITUD_MINIMA_CONTRASENA:
+            error = f'La contraseña debe tener al menos {LONGITUD_MINIMA_CONTRASENA} caracteres.'
+        elif rol not in ROLES:
+            error = f'Rol no válido: {rol or "(vacío)"}.'
+        else:
+            vistos.add(nombre)
+            activo = _texto(datos.get('activo')).lower() not in VALORES_FALSOS
+            validos.append((numero, nombre, contrasena, RoleEnum(rol), activo))
+            continue
+        errores.append({'fila': numero, 'valor': nombre, 'error': error})
+    return validos, errores
+
+
+def importar_usuarios(validos, session, metodo, procesos=1, al_avanzar=None, tamano_lote=TAMANO_LOTE):
+    """
+    Hash and insert validated users in batches of ``tamano_lote``.
+
+    Password hashes are computed by a process pool of ``procesos`` workers
+    (one CPU-bound pbkdf2 per password dominates the import), and each batch
+    is written with one multi-row INSERT together with its counter deltas.
+    A username taken in the meantime (e.g. by a registration) is skipped
+    and reported rather than failing the batch.
+
+    Returns:
+        tuple: ``(creados, errores)``.
+    """
+    hashear = partial(generate_password_hash, method=metodo, salt_length=hashing.SALT_LENGTH)
+    tabla = Usuario.__table__
+    creados, errores = 0, []
+
+    def insertar(lote, hashes):
+        nonlocal creados
+        filas = [
+            {'nombre_usuario': nombre, 'contrasena': hash_, 'rol': rol, 'activo': activo,
+             'fecha_registro': datetime.utcnow()}
+            for (_, nombre, _, rol, activo), hash_ in zip(lote, hashes)
+        ]
+        insertados = set(session.execute(
+            insert(tabla).on_conflict_do_nothing(index_elements=[tabla.c.nombre_usuario])
+            .returning(tabla.c.nombre_usuario),
+            filas
+        ).scalars())
+        deltas = {counters.USUARIOS: len(insertados)}
+        for numero, nombre, _, rol, _ in lote:
+            if nombre in insertados:
+                clave = counters.clave_rol(rol)
+                deltas[clave] = deltas.get(clave, 0) + 1
+            else:
+                errores.append({'fila': numero, 'valor': nombre, 'error': 'El nombre de usuario ya existe.'})
+        counters.incrementar(deltas, session=session)
+        session.commit()
+        creados += len(insertados)
+        if al_avanzar is not None:
+            al_avanzar(len(lote))
+
+    lotes = [validos[inicio:inicio + tamano_lote] for inicio in range(0, len(validos), tamano_lote)]
+    if procesos <= 1:
+        for lote in lotes:
+            insertar(lote, [hashear(contrasena) for _, _, contrasena, _, _ in lote])
+        return creados, errores
+
+    pendientes = deque()
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for lote in lotes:
+            contrasenas = [contrasena for _, _, contrasena, _, _ in lote]
+            pendientes.append((lote, executor.map(hashear, contrasenas, chunksize=max(1, len(lote) // (procesos * 4)))))
+            # The next batch is hashed while this one is inserted.
+            if len(pendientes) > 1:
+                lote_listo, hashes = pendientes.popleft()
+                insertar(lote_listo, list(hashes))
+        while pendientes:
+            lote_listo, hashes = pendientes.popleft()
+            insertar(lote_listo, list(hashes))
+    return creados, errores
+
+
+def contar_filas(ruta):
+    """Return the number of data rows of a CSV or XLSX file (blank lines included), for progress."""
+    if ruta.lower().endswith('.xlsx'):
+        wb = load_workbook(ruta, read_only=True)
+        try:
+            ws = wb.active
+            if ws.max_row is None:
+                # Unsized sheet (e.g. saved in write-only mode): count the rows.
+                return max(sum(1 for _ in ws.iter_rows(values_only=True)) - 1, 0)
+            return max(ws.max_row - 1, 0)
+        finally:
+            wb.close()
+    with open(ruta, 'rb') as archivo:
+        return max(sum(1 for _ in archivo) - 1, 0)
+
+
+class _ValidadorProductos:
+    """Row checks for `importar_productos`, against sets loaded with one query per table."""
+
+    def __init__(self, session):
+        self.estados = {nombre.lower(): (estado_id, nombre) for estado_id, nombre in session.execute(
+            select(Estado.id, Estado.nombre))}
+        self.categorias = {}
+        for categoria_id, nombre in session.execute(select(Categoria.id, Categoria.nombre).order_by(Categoria.id)):
+            self.categorias.setdefault(nombre.strip().lower(), categoria_id)
+        self.recargar_unicos(session)
+
+    def recargar_unicos(self, session):
+        self.codigos, self.tags = set(), set()
+        for codigo, rfid_tag in session.execute(
+            select(Producto.codigo, Producto.rfid_tag)
+            .where((Producto.codigo.isnot(None)) | (Producto.rfid_tag.isnot(None)))
+        ):
+            if codigo is not None:
+                self.codigos.add(codigo)
+            if rfid_tag is not None:
+                self.tags.add(rfid_tag)
+
+    def validar(self, numero, datos):
+        """Return ``(producto, None)`` with the row ready to insert, or ``(None, error)``."""
+        nombre = _texto(datos.get('nombre'))
+        descripcion = _texto(datos.get('descripcion')) or None
+        codigo = _texto(datos.get('codigo')) or None
+        rfid_tag = _texto(datos.get('rfid_tag')) or None
+        estado = _texto(datos.get('estado')) or ESTADO_INICIAL
+        categoria = _texto(datos.get('categoria'))
+        if not nombre or len(nombre) > 150:
+            error = 'El nombre es obligatorio y tiene como máximo 150 caracteres.'
+        elif descripcion and len(descripcion) > 500:
+            error = 'La descripción tiene como máximo 500 caracteres.'
+        elif codigo and len(codigo) > 50:
+            error = 'El código tiene como máximo 50 caracteres.'
+        elif codigo in self.codigos:
+            error = f'El código {codigo} ya existe.'
+        elif rfid_tag and len(rfid_tag) > 100:
+            error = 'El tag RFID tiene como máximo 100 caracteres.'
+        elif rfid_tag in self.tags:
+            error = f'El tag RFID {rfid_tag} ya está asignado.'
+        elif estado.lower() not in self.estados:
+            error = f'Estado desconocido: {estado}.'
+        elif categoria and categoria.lower() not in self.categorias:
+            error = f'Categoría desconocida: {categoria}.'
+        else:
+            if codigo:
+                self.codigos.add(codigo)
+            if rfid_tag:
+                self.tags.add(rfid_tag)
+            estado_id, estado_nombre = self.estados[estado.lower()]
+            return {
+                'fila': numero,
+                'nombre': nombre,
+                'descripcion': descripcion,
+                'codigo': codigo,
+                'rfid_tag': rfid_tag,
+                'estado_id': estado_id,
+                'estado': estado_nombre,
+                'categoria': categoria,
+                'categoria_id': self.categorias.get(categoria.lower()) if categoria else None
+            }, None
+        return None, {'fila': numero, 'valor': codigo or nombre, 'error': error}
+
+
+def _insertar_productos(session, lote, usuario_id, importacion_id):
+    """Insert a validated batch with its initial Movimiento and Auditoria rows and counter deltas."""
+    ahora = datetime.utcnow()
+    ids = session.execute(
+        insert(Producto.__table__).returning(Producto.__table__.c.id, sort_by_parameter_order=True),
+        [
+            {'nombre': producto['nombre'], 'descripcion': producto['descripcion'], 'codigo': producto['codigo'],
+             'rfid_tag': producto['rfid_tag'], 'estado_id': producto['estado_id'],
+             'categoria_id': producto['categoria_id'], 'fecha_alta': ahora}
+            for producto in lote
+        ]
+    ).scalars().all()
+    session.execute(insert(Movimiento.__table__), [
+        {'producto_id': producto_id, 'usuario_id': usuario_id, 'estado_anterior': ESTADO_ANTERIOR_ALTA,
+         'estado_nuevo': producto['estado'], 'fecha_hora': ahora, 'detalle': f'Importación {importacion_id}'}
+        for producto_id, producto in zip(ids, lote)
+    ])
+    session.execute(insert(Auditoria.__table__), [
+        {'usuario_id': usuario_id, 'accion': 'Alta de producto', 'fecha_hora': ahora,
+         'detalle': f"Producto {producto['nombre']} importado (importación {importacion_id})"}
+        for producto in lote
+    ])
+    deltas = {counters.PRODUCTOS: len(lote), counters.MOVIMIENTOS: len(lote), counters.AUDITORIAS: len(lote)}
+    for producto in lote:
+        clave = counters.clave_estado(producto['estado_id'])
+        deltas[clave] = deltas.get(clave, 0) + 1
+    counters.incrementar(deltas, session=session)
+    session.commit()
+
+
+def importar_productos(filas, session, usuario_id, importacion_id=None, simulacion=False,
+                       al_avanzar=None, tamano_lote=TAMANO_LOTE_PRODUCTOS):
+    """
+    Validate and insert ``(numero_fila, datos)`` catalogue rows as they are read.
+
+    ``codigo`` and ``rfid_tag`` are checked against sets of the existing
+    values loaded with one query (and grown with the file's own rows), so
+    no per-row lookups are made. Valid rows are inserted ``tamano_lote`` at
+    a time, each batch in one transaction together with an initial
+    Movimiento and Auditoria per product. If another writer takes a code
+    or tag meanwhile, the batch is rolled back, re-checked against fresh
+    sets and written again without the offending rows.
+
+    With ``simulacion`` nothing is written: the same checks run and the
+    result reports what would have been created.
+
+    Returns:
+        tuple: ``(creados, errores)``.
+    """
+    validador = _ValidadorProductos(session)
+    creados, errores, lote, leidas = 0, [], [], 0
+
+    def escribir():
+        nonlocal creados, lote, leidas
+        if lote and not simulacion:
+            try:
+                _insertar_productos(session, lote, usuario_id, importacion_id)
+            except IntegrityError:
+                session.rollback()
+                validador.recargar_unicos(session)
+                revalidados = []
+                for producto in lote:
+                    producto, error = validador.validar(producto['fila'], producto)
+                    if error:
+                        errores.append(error)
+                    else:
+                        revalidados.append(producto)
+                lote = revalidados
+                if lote:
+                    _insertar_productos(session, lote, usuario_id, importacion_id)
+        creados += len(lote)
+        lote = []
+        if al_avanzar is not None:
+            al_avanzar(leidas)
+        leidas = 0
+
+    for numero, datos in filas:
+        leidas += 1
+        producto, error = validador.validar(numero, datos)
+        if error:
+            errores.append(error)
+        else:
+            lote.append(producto)
+        if leidas >= tamano_lote:
+            escribir()
+    escribir()
+    return creados, errores
+
+
+def ejecutar_importacion(trabajo_id, database_uri, metodo, procesos=1):
+    """
+    Run one import job inside a pool process.
+
+    Like `jobs.ejecutar_trabajo`, state and progress are reported through
+    the ``trabajo_importacion`` row, committed after every batch.
+    """
+    engine = create_engine(database_uri, connect_args={'timeout': 30})
+    try:
+        with Session(engine, expire_on_commit=False) as session:
+            trabajo = session.get(TrabajoImportacion, trabajo_id)
+            if trabajo is None:
+                return
+            try:
+                trabajo.estado = 'en_proceso'
+                trabajo.fecha_inicio = datetime.utcnow()
+
+                def actualizar_progreso(filas_en_lote):
+                    trabajo.filas_procesadas += filas_en_lote
+                    trabajo.progreso = min(99, trabajo.filas_procesadas * 100 // max(trabajo.filas_totales, 1))
+                    session.commit()
+
+                if trabajo.tipo == 'productos':
+                    trabajo.filas_totales = contar_filas(trabajo.ruta_archivo)
+                    session.commit()
+                    creados, errores = importar_productos(
+                        leer_filas(trabajo.ruta_archivo), session, trabajo.usuario_id, trabajo.id,
+                        simulacion=trabajo.simulacion, al_avanzar=actualizar_progreso
+                    )
+                else:
+                    validos, errores = validar_usuarios(leer_filas(trabajo.ruta_archivo), session)
+                    trabajo.filas_totales = len(validos) + len(errores)
+                    trabajo.filas_procesadas = len(errores)
+                    session.commit()
+                    creados, omitidos = importar_usuarios(
+                        validos, session, metodo, procesos=procesos, al_avanzar=actualizar_progreso
+                    )
+                    errores = sorted(errores + omitidos, key=lambda error: error['fila'])
+                trabajo.filas_procesadas = trabajo.filas_totales
+                trabajo.creados = creados
+                trabajo.num_errores = len(errores)
+                trabajo.errores = json.dumps(errores[:MAX_ERRORES_GUARDADOS], ensure_ascii=False)
+                trabajo.estado = 'completado'
+                trabajo.progreso = 100
+                trabajo.fecha_fin = datetime.utcnow()
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                trabajo.estado = 'error'
+                trabajo.error = str(e)
+                trabajo.fecha_fin = datetime.utcnow()
+                session.commit()
+                raise
+    finally:
+        engine.dispose()
+
+
+def encolar_importacion(app, trabajo):
+    """Submit an already committed import job to the export process pool."""
+    iteraciones = app.config.get('USUARIOS_IMPORTACION_ITERACIONES') or app.config['PASSWORD_HASH_ITERACIONES']
+    future = get_executor(app).submit(
+        ejecutar_importacion,
+        trabajo.id,
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        f'pbkdf2:sha256:{iteraciones}',
+        app.config.get('USUARIOS_IMPORTACION_PROCESOS', 1)
+    )
+
+    def _registrar_fallo(f):
+        if f.exception() is not None:
+            app.logger.error(f'Importación {trabajo.id} falló: {f.exception()}')
+
+    future.add_done_callback(_registrar_fallo)
+    return future
+
+
+def serializar_importacion(trabajo, con_errores=False):
+    """Return the JSON-friendly status of an import job; the error list only if ``con_errores``."""
+    respuesta = {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'filas_procesadas': trabajo.filas_procesadas,
+        'filas_totales': trabajo.filas_totales,
+        'creados': trabajo.creados,
+        'simulacion': trabajo.simulacion,
+        'num_errores': trabajo.num_errores,
+        'error': trabajo.error,
+        'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+    }
+    if con_errores:
+        respuesta['errores'] = json.loads(trabajo.errores) if trabajo.errores else []
+    return respuesta
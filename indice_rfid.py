@@ -0,0 +1,183 @@
+# indice_rfid.py
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import object_session
+
+from comun import al_confirmar, pendientes
+from extensions import db
+from models import Producto
+
+EntradaTag = namedtuple('EntradaTag', ['producto_id', 'estado_id', 'ubicacion_actual'])
+
+# Rows fetched per round trip while warming the index.
+TAMANO_BLOQUE_CARGA = 5000
+# Tags per IN (...) lookup on a miss, kept well below SQLite's bound-parameter limit.
+TAMANO_BLOQUE_SQL = 500
+# Upper bound on how long a tag reassigned by another process can resolve to
+# its old product here (0 keeps the index until the process restarts).
+TTL_SEGUNDOS = 600
+
+
+class IndiceTags:
+    """
+    Worker-local hash index from ``Producto.rfid_tag`` to an `EntradaTag`.
+
+    Loaded with one streaming query over every tagged product, then kept in
+    step with this process's own writes: ORM inserts, updates and deletes
+    of Producto are applied when their transaction commits (see the
+    listeners below), and `rfid.ingerir_escaneos` reports the locations it
+    moves with its set-based UPDATE. Changes made by other processes are
+    picked up on a miss (unknown tags always fall back to the database) or
+    when the index is reloaded after ``TTL_SEGUNDOS``.
+
+    Lookups are plain dict reads and take no lock.
+    """
+
+    def __init__(self, ttl=TTL_SEGUNDOS):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entradas = None
+        self._cargado_en = 0.0
+        self.aciertos = 0
+        self.fallos = 0
+        self.cargas = 0
+
+    def _caducado(self):
+        return self._entradas is None or (self.ttl and time.monotonic() - self._cargado_en >= self.ttl)
+
+    def calentar(self, session=None):
+        """(Re)load every tagged product with a single streaming query."""
+        session = session or db.session
+        entradas = {}
+        resultado = session.execute(
+            select(Producto.rfid_tag, Producto.id, Producto.estado_id, Producto.ubicacion_actual)
+            .where(Producto.rfid_tag.isnot(None))
+            .execution_options(stream_results=True, yield_per=TAMANO_BLOQUE_CARGA)
+        )
+        for rfid_tag, *entrada in resultado:
+            entradas[rfid_tag] = EntradaTag(*entrada)
+        with self._lock:
+            self._entradas = entradas
+            self._cargado_en = time.monotonic()
+            self.cargas += 1
+
+    def resolver(self, tags, session=None):
+        """
+        Return ``{tag: EntradaTag}`` for the known tags in ``tags``.
+
+        Misses are looked up in the database with one IN query per block
+        and added to the index; tags unknown there too are left out.
+        """
+        session = session or db.session
+        if self._caducado():
+            self.calentar(session)
+        entradas = self._entradas or {}
+        resueltos = {}
+        pendientes = []
+        for tag in tags:
+            entrada = entradas.get(tag)
+            if entrada is None:
+                pendientes.append(tag)
+            else:
+                resueltos[tag] = entrada
+        self.aciertos += len(resueltos)
+        self.fallos += len(pendientes)
+
+        for inicio in range(0, len(pendientes), TAMANO_BLOQUE_SQL):
+            bloque = pendientes[inicio:inicio + TAMANO_BLOQUE_SQL]
+            filas = session.execute(
+                select(Producto.rfid_tag, Producto.id, Producto.estado_id, Producto.ubicacion_actual)
+                .where(Producto.rfid_tag.in_(bloque))
+            ).all()
+            nuevos = {rfid_tag: EntradaTag(*entrada) for rfid_tag, *entrada in filas}
+            resueltos.update(nuevos)
+            with self._lock:
+                if self._entradas is not None:
+                    self._entradas.update(nuevos)
+        return resueltos
+
+    def aplicar(self, cambios):
+        """Apply ``(tag_anterior, tag, entrada)`` changes; ``entrada`` None drops ``tag``."""
+        with self._lock:
+            if self._entradas is None:
+                return
+            for tag_anterior, tag, entrada in cambios:
+                if tag_anterior is not None and tag_anterior != tag:
+                    self._entradas.pop(tag_anterior, None)
+                if tag is None:
+                    continue
+                if entrada is None:
+                    self._entradas.pop(tag, None)
+                else:
+                    self._entradas[tag] = entrada
+
+    def actualizar_ubicaciones(self, ubicaciones):
+        """Record ``(tag, ubicacion)`` moves made outside the ORM."""
+        with self._lock:
+            if self._entradas is None:
+                return
+            for tag, ubicacion in ubicaciones:
+                entrada = self._entradas.get(tag)
+                if entrada is not None:
+                    self._entradas[tag] = entrada._replace(ubicacion_actual=ubicacion)
+
+    def invalidar(self):
+        with self._lock:
+            self._entradas = None
+
+    def memoria_bytes(self):
+        """Approximate bytes held by the index: the dict, its keys and entries."""
+        entradas = self._entradas
+        if entradas is None:
+            return 0
+        total = sys.getsizeof(entradas)
+        for tag, entrada in entradas.items():
+            total += sys.getsizeof(tag) + sys.getsizeof(entrada)
+        return total
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'tags': len(self._entradas) if self._entradas is not None else 0,
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+            'cargas': self.cargas,
+            'memoria_bytes': self.memoria_bytes()
+        }
+
+
+indice_tags = IndiceTags()
+
+
+def _producto_escrito(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        return
+    historial = inspect(target).attrs.rfid_tag.history
+    tag_anterior = historial.deleted[0] if historial.deleted else None
+    entrada = EntradaTag(target.id, target.estado_id, target.ubicacion_actual)
+    pendientes(session, 'tags_pendientes').append((tag_anterior, target.rfid_tag, entrada))
+
+
+def _producto_borrado(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        pendientes(session, 'tags_pendientes').append((None, target.rfid_tag, None))
+
+
+def _tag_asignado(target, value, oldvalue, initiator):
+    # Registered only for active_history: the previous tag is loaded on
+    # assignment so _producto_escrito can drop it from the index.
+    return value
+
+
+event.listen(Producto.rfid_tag, 'set', _tag_asignado, active_history=True, retval=True)
+event.listen(Producto, 'after_insert', _producto_escrito)
+event.listen(Producto, 'after_update', _producto_escrito)
+event.listen(Producto, 'after_delete', _producto_borrado)
+al_confirmar('tags_pendientes', lambda cambios: indice_tags.aplicar(cambios))
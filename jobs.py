@@ -0,0 +1,155 @@
+# jobs.py
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from openpyxl import Workbook
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from exports import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_COLUMNS,
+    consulta_movimientos_exportacion,
+    contar_movimientos_exportacion,
+    iterar_movimientos_por_bloques
+)
+from models import TrabajoExportacion
+from pdf_report import render_pdf_paginado
+
+FORMATOS_TRABAJO = {
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+}
+
+_executor = None
+
+
+def get_executor(app):
+    """Return the worker-wide process pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        # 'spawn' keeps the children free of the parent's open SQLite connections.
+        _executor = ProcessPoolExecutor(
+            max_workers=app.config.get('EXPORT_JOB_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+
+def encolar_trabajo(app, trabajo):
+    """
+    Submit an already committed TrabajoExportacion to the process pool.
+
+    The child process only receives the job id and connection settings and
+    reports state and progress back through the ``trabajo_exportacion`` row.
+    """
+    global _executor
+    argumentos = (
+        trabajo.id,
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        app.config['EXPORT_DIR'],
+        app.config.get('PDF_RENDER_PROCESSES', 1)
+    )
+    try:
+        future = get_executor(app).submit(ejecutar_trabajo, *argumentos)
+    except BrokenProcessPool:
+        # A child died (e.g. OOM-killed); start a fresh pool and retry once.
+        _executor = None
+        future = get_executor(app).submit(ejecutar_trabajo, *argumentos)
+
+    def _registrar_fallo(f):
+        if f.exception() is not None:
+            app.logger.error(f'Trabajo de exportación {trabajo.id} falló: {f.exception()}')
+
+    future.add_done_callback(_registrar_fallo)
+    return future
+
+
+def escribir_excel(bloques, destino):
+    """Write export chunks to an .xlsx file using openpyxl's write-only mode."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Movimientos')
+    ws.append(EXPORT_COLUMNS)
+    for filas in bloques:
+        for fila in filas:
+            ws.append(fila)
+    wb.save(destino)
+
+
+def ejecutar_trabajo(trabajo_id, database_uri, export_dir, pdf_procesos=1, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Run one export job inside a pool process.
+
+    Rows are read in keyset chunks so the job can commit its progress after
+    every chunk without holding a read cursor open on the database. The file
+    is written under a temporary name and renamed once complete.
+    """
+    engine = create_engine(database_uri)
+    try:
+        with Session(engine, expire_on_commit=False) as session:
+            trabajo = session.get(TrabajoExportacion, trabajo_id)
+            if trabajo is None:
+                return
+            try:
+                parametros = json.loads(trabajo.parametros or '{}')
+                stmt = consulta_movimientos_exportacion(
+                    parametros.get('fecha_inicio'),
+                    parametros.get('fecha_fin'),
+                    parametros.get('estado')
+                )
+                trabajo.estado = 'en_proceso'
+                trabajo.fecha_inicio = datetime.utcnow()
+                trabajo.filas_totales = contar_movimientos_exportacion(stmt, session)
+                session.commit()
+
+                def actualizar_progreso(filas_en_bloque):
+                    trabajo.filas_procesadas += filas_en_bloque
+                    trabajo.progreso = min(99, trabajo.filas_procesadas * 100 // max(trabajo.filas_totales, 1))
+                    session.commit()
+
+                extension, _ = FORMATOS_TRABAJO[trabajo.tipo]
+                os.makedirs(export_dir, exist_ok=True)
+                ruta = os.path.join(export_dir, f'reporte_movimientos_{trabajo.id}.{extension}')
+                temporal = ruta + '.part'
+                bloques = iterar_movimientos_por_bloques(stmt, session, chunk_size, actualizar_progreso)
+                if trabajo.tipo == 'excel':
+                    escribir_excel(bloques, temporal)
+                else:
+                    render_pdf_paginado(
+                        (fila for filas in bloques for fila in filas), temporal, procesos=pdf_procesos
+                    )
+                os.replace(temporal, ruta)
+
+                trabajo.estado = 'completado'
+                trabajo.progreso = 100
+                trabajo.ruta_archivo = ruta
+                trabajo.fecha_fin = datetime.utcnow()
+                session.commit()
+            except Exception as e:
+                session.rollback()
+                trabajo.estado = 'error'
+                trabajo.error = str(e)
+                trabajo.fecha_fin = datetime.utcnow()
+                session.commit()
+                raise
+    finally:
+        engine.dispose()
+
+
+def serializar_trabajo(trabajo):
+    """Return the JSON-friendly status of a job."""
+    return {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'filas_procesadas': trabajo.filas_procesadas,
+        'filas_totales': trabajo.filas_totales,
+        'error': trabajo.error,
+        'fecha_creacion': trabajo.fecha_creacion.isoformat() if trabajo.fecha_creacion else None,
+        'fecha_fin': trabajo.fecha_fin.isoformat() if trabajo.fecha_fin else None,
+    }
@@ -0,0 +1,106 @@
+# lectura.py
+"""
+Read-only connections for report and list views.
+
+Views marked with `solo_lectura` run their SELECTs on a second engine
+(`get_engine`) with its own connection pool, opened with SQLite's
+``mode=ro`` on the same database file unless ``SQLALCHEMY_LECTURA_URI``
+points somewhere else (e.g. a replica file). A long report then holds a
+read connection, never one of the write pool's, and with WAL (see
+`extensions.PRAGMAS_SQLITE`) it never holds a lock that a loan or return
+waits on. Writes made by such a view still go to the write engine (see
+`extensions.SesionEnrutada`); the rollup refresh in /reportes runs on a
+session of its own on the write engine (see `rollups.refrescar_si_necesario`).
+
+Staleness guarantees:
+
+* On the same file, a read sees every transaction committed before the
+  statement started: there is no lag. Two statements of one view may see
+  different commits, exactly as they could on the write engine.
+* Once a view writes in a transaction, its later reads in that
+  transaction use the write engine, so it always sees its own changes.
+* ``LECTURA_RETRASO_SEGUNDOS`` declares how far behind the read engine
+  may be (0 for the same file; a replica's refresh interval otherwise).
+  Each view states with ``retraso_maximo`` how much lag it tolerates, and
+  it only uses the read engine when the declared lag is within that.
+"""
+import threading
+from functools import wraps
+
+from flask import current_app, has_app_context
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+from extensions import CLAVE_MOTOR_LECTURA, db
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def uri_solo_lectura(url):
+    """
+    Return a read-only SQLite URI for the database file of ``url``.
+
+    Returns None for in-memory databases and other backends, which have
+    no read-only mode to open the same database with.
+    """
+    url = make_url(url)
+    if url.get_backend_name() != 'sqlite' or url.database in (None, '', ':memory:'):
+        return None
+    if url.database.startswith('file:'):
+        return None
+    return url.set(database=f'file:{url.database}', query={'mode': 'ro', 'uri': 'true'}).render_as_string(
+        hide_password=False
+    )
+
+
+def get_engine():
+    """
+    Return the worker-wide read engine, creating it on first use.
+
+    Needs an app context. Returns None when there is no read-only way to
+    open the database; views then read from the write engine.
+    """
+    global _engine
+    if _engine is None and has_app_context():
+        uri = current_app.config.get('SQLALCHEMY_LECTURA_URI') or uri_solo_lectura(db.engine.url)
+        if uri is None:
+            return None
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(uri)
+    return _engine
+
+
+def solo_lectura(retraso_maximo=0):
+    """
+    Send the view's reads to the read engine.
+
+    :param retraso_maximo: Seconds behind the write engine the view
+        tolerates. The read engine is used only if ``LECTURA_SEPARADA`` is
+        on and its declared ``LECTURA_RETRASO_SEGUNDOS`` is not above
+        this; 0 means the view must see every committed change.
+
+    The route is left on the read engine until the request ends, so
+    streamed responses keep reading from it.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            configuracion = current_app.config
+            if (configuracion.get('LECTURA_SEPARADA', True)
+                    and configuracion.get('LECTURA_RETRASO_SEGUNDOS', 0) <= retraso_maximo):
+                motor = get_engine()
+                if motor is not None:
+                    db.session.info[CLAVE_MOTOR_LECTURA] = motor
+            return f(*args, **kwargs)
+        decorated_function.retraso_maximo = retraso_maximo
+        return decorated_function
+    return decorator
+
+
+def estadisticas():
+    """Connection pool status of the read engine, or None when it is not in use."""
+    if _engine is None:
+        return None
+    return {'url': _engine.url.render_as_string(hide_password=True), 'pool': _engine.pool.status()}
@@ -0,0 +1,42 @@
+# marcas.py
+"""
+High-water marks of the incremental jobs (rollups, scan compaction).
+
+A mark is the last source row id a job has folded in, stored as an int in
+a ``ConfiguracionSistema`` row. Jobs read it with `leer` and advance it
+with `avanzar` in the same transaction as the batch it covers; the
+compare-and-set makes a concurrent run of the same job roll back instead
+of folding a batch twice.
+"""
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from models import ConfiguracionSistema
+
+
+def leer(session, clave, descripcion):
+    """Return the mark stored under ``clave``, creating it at 0 on first use."""
+    consulta = select(ConfiguracionSistema.valor).where(ConfiguracionSistema.clave == clave)
+    valor = session.scalar(consulta)
+    if valor is None:
+        # Two workers running the job for the first time may both get here; only one insert wins.
+        session.execute(insert(ConfiguracionSistema).values(
+            clave=clave,
+            valor='0',
+            descripcion=descripcion,
+            tipo='int'
+        ).on_conflict_do_nothing(index_elements=[ConfiguracionSistema.clave]))
+        valor = session.scalar(consulta)
+    return int(valor)
+
+
+def avanzar(session, clave, marca, nueva_marca):
+    """Move the mark from ``marca`` to ``nueva_marca``; False if another run moved it first."""
+    avance = session.execute(
+        update(ConfiguracionSistema)
+        .where(ConfiguracionSistema.clave == clave, ConfiguracionSistema.valor == str(marca))
+        .values(valor=str(nueva_marca), ultima_actualizacion=datetime.utcnow())
+    )
+    return avance.rowcount == 1
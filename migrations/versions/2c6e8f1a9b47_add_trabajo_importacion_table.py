@@ -0,0 +1,47 @@
+"""Add trabajo_importacion table
+
+Revision ID: 2c6e8f1a9b47
+Revises: 9d4f7a2b61c3
+Create Date: 2026-10-18 18:21:09.447310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c6e8f1a9b47'
+down_revision = '9d4f7a2b61c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trabajo_importacion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('progreso', sa.Integer(), nullable=False),
+    sa.Column('filas_procesadas', sa.Integer(), nullable=False),
+    sa.Column('filas_totales', sa.Integer(), nullable=True),
+    sa.Column('creados', sa.Integer(), nullable=False),
+    sa.Column('num_errores', sa.Integer(), nullable=False),
+    sa.Column('errores', sa.Text(), nullable=True),
+    sa.Column('ruta_archivo', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+    sa.Column('fecha_inicio', sa.DateTime(), nullable=True),
+    sa.Column('fecha_fin', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('trabajo_importacion', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_trabajo_importacion_estado'), ['estado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trabajo_importacion', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_trabajo_importacion_estado'))
+
+    op.drop_table('trabajo_importacion')
@@ -0,0 +1,45 @@
+"""Add trabajo_exportacion table
+
+Revision ID: 3f9a1c7e52d4
+Revises: c4cc3a053099
+Create Date: 2026-10-18 09:12:04.118532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7e52d4'
+down_revision = 'c4cc3a053099'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('trabajo_exportacion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('progreso', sa.Integer(), nullable=False),
+    sa.Column('filas_procesadas', sa.Integer(), nullable=False),
+    sa.Column('filas_totales', sa.Integer(), nullable=True),
+    sa.Column('parametros', sa.Text(), nullable=True),
+    sa.Column('ruta_archivo', sa.String(length=255), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+    sa.Column('fecha_inicio', sa.DateTime(), nullable=True),
+    sa.Column('fecha_fin', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('trabajo_exportacion', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_trabajo_exportacion_estado'), ['estado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('trabajo_exportacion', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_trabajo_exportacion_estado'))
+
+    op.drop_table('trabajo_exportacion')
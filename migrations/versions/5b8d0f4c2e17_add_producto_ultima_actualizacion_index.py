@@ -0,0 +1,26 @@
+"""Add producto.ultima_actualizacion index
+
+Revision ID: 5b8d0f4c2e17
+Revises: a7c3e91f5d20
+Create Date: 2026-10-18 15:48:27.330194
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8d0f4c2e17'
+down_revision = 'a7c3e91f5d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('producto', schema=None) as batch_op:
+        batch_op.create_index('ix_producto_ultima_actualizacion', ['ultima_actualizacion'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('producto', schema=None) as batch_op:
+        batch_op.drop_index('ix_producto_ultima_actualizacion')
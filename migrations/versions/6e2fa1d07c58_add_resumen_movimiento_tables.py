@@ -0,0 +1,79 @@
+"""Add resumen_movimiento rollup tables
+
+Revision ID: 6e2fa1d07c58
+Revises: d51c0e8f3a29
+Create Date: 2026-10-18 14:22:09.618342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e2fa1d07c58'
+down_revision = 'd51c0e8f3a29'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('resumen_movimiento_dia',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('estado_anterior', sa.String(length=50), nullable=False),
+    sa.Column('estado_nuevo', sa.String(length=50), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('fecha', 'estado_anterior', 'estado_nuevo')
+    )
+    op.create_table('resumen_movimiento_usuario_dia',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('fecha', 'usuario_id')
+    )
+    with op.batch_alter_table('resumen_movimiento_usuario_dia', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_resumen_movimiento_usuario_dia_usuario_id'), ['usuario_id'], unique=False)
+
+    op.create_table('resumen_movimiento_producto_dia',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['producto.id'], ),
+    sa.PrimaryKeyConstraint('fecha', 'producto_id')
+    )
+    with op.batch_alter_table('resumen_movimiento_producto_dia', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_resumen_movimiento_producto_dia_producto_id'), ['producto_id'], unique=False)
+
+    # Backfill from the existing movements and record the high-water mark
+    # (same key as rollups.CLAVE_MARCA), so the app only folds in newer rows.
+    op.execute(
+        "INSERT INTO resumen_movimiento_dia (fecha, estado_anterior, estado_nuevo, total) "
+        "SELECT date(fecha_hora), estado_anterior, estado_nuevo, COUNT(*) FROM movimiento "
+        "GROUP BY date(fecha_hora), estado_anterior, estado_nuevo"
+    )
+    op.execute(
+        "INSERT INTO resumen_movimiento_usuario_dia (fecha, usuario_id, total) "
+        "SELECT date(fecha_hora), usuario_id, COUNT(*) FROM movimiento GROUP BY date(fecha_hora), usuario_id"
+    )
+    op.execute(
+        "INSERT INTO resumen_movimiento_producto_dia (fecha, producto_id, total) "
+        "SELECT date(fecha_hora), producto_id, COUNT(*) FROM movimiento GROUP BY date(fecha_hora), producto_id"
+    )
+    op.execute(
+        "INSERT INTO configuracion_sistema (clave, valor, descripcion, tipo) "
+        "SELECT 'resumenes_movimiento_ultimo_id', COALESCE(MAX(id), 0), "
+        "'Último Movimiento.id incluido en las tablas resumen_movimiento_*', 'int' FROM movimiento"
+    )
+
+
+def downgrade():
+    op.execute("DELETE FROM configuracion_sistema WHERE clave = 'resumenes_movimiento_ultimo_id'")
+    with op.batch_alter_table('resumen_movimiento_producto_dia', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_resumen_movimiento_producto_dia_producto_id'))
+
+    op.drop_table('resumen_movimiento_producto_dia')
+    with op.batch_alter_table('resumen_movimiento_usuario_dia', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_resumen_movimiento_usuario_dia_usuario_id'))
+
+    op.drop_table('resumen_movimiento_usuario_dia')
+    op.drop_table('resumen_movimiento_dia')
@@ -0,0 +1,38 @@
+"""Add keyset pagination indexes
+
+Revision ID: 8b2e6d04a7f1
+Revises: 3f9a1c7e52d4
+Create Date: 2026-10-18 11:40:27.503961
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e6d04a7f1'
+down_revision = '3f9a1c7e52d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('auditoria', schema=None) as batch_op:
+        batch_op.create_index('ix_auditoria_fecha_hora_id', ['fecha_hora', 'id'], unique=False)
+        batch_op.create_index('ix_auditoria_usuario_id_fecha_hora_id', ['usuario_id', 'fecha_hora', 'id'], unique=False)
+        batch_op.create_index('ix_auditoria_accion_fecha_hora_id', ['accion', 'fecha_hora', 'id'], unique=False)
+
+    with op.batch_alter_table('producto', schema=None) as batch_op:
+        batch_op.create_index('ix_producto_estado_id_id', ['estado_id', 'id'], unique=False)
+        batch_op.create_index('ix_producto_categoria_id_id', ['categoria_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('producto', schema=None) as batch_op:
+        batch_op.drop_index('ix_producto_categoria_id_id')
+        batch_op.drop_index('ix_producto_estado_id_id')
+
+    with op.batch_alter_table('auditoria', schema=None) as batch_op:
+        batch_op.drop_index('ix_auditoria_accion_fecha_hora_id')
+        batch_op.drop_index('ix_auditoria_usuario_id_fecha_hora_id')
+        batch_op.drop_index('ix_auditoria_fecha_hora_id')
@@ -0,0 +1,46 @@
+"""Add barrido_inventario table
+
+Revision ID: 9d4f7a2b61c3
+Revises: 5b8d0f4c2e17
+Create Date: 2026-10-18 17:05:41.602318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f7a2b61c3'
+down_revision = '5b8d0f4c2e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('barrido_inventario',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ubicacion', sa.String(length=100), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('total_lecturas', sa.Integer(), nullable=False),
+    sa.Column('tags_distintos', sa.Integer(), nullable=True),
+    sa.Column('presentes', sa.Integer(), nullable=True),
+    sa.Column('faltantes', sa.Integer(), nullable=True),
+    sa.Column('mal_ubicados', sa.Integer(), nullable=True),
+    sa.Column('inesperados', sa.Integer(), nullable=True),
+    sa.Column('corregidos', sa.Integer(), nullable=True),
+    sa.Column('ruta_informe', sa.String(length=255), nullable=True),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('fecha_creacion', sa.DateTime(), nullable=False),
+    sa.Column('fecha_conciliacion', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuario.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('barrido_inventario', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_barrido_inventario_estado'), ['estado'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('barrido_inventario', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_barrido_inventario_estado'))
+
+    op.drop_table('barrido_inventario')
@@ -0,0 +1,45 @@
+"""Add estancia_ubicacion table
+
+Revision ID: a7c3e91f5d20
+Revises: 6e2fa1d07c58
+Create Date: 2026-10-18 15:31:42.907215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e91f5d20'
+down_revision = '6e2fa1d07c58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('estancia_ubicacion',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('ubicacion', sa.String(length=100), nullable=True),
+    sa.Column('primera_lectura', sa.DateTime(), nullable=False),
+    sa.Column('ultima_lectura', sa.DateTime(), nullable=False),
+    sa.Column('num_lecturas', sa.Integer(), nullable=False),
+    sa.Column('lectores', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['producto_id'], ['producto.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('estancia_ubicacion', schema=None) as batch_op:
+        batch_op.create_index('ix_estancia_ubicacion_producto_id_primera_lectura', ['producto_id', 'primera_lectura'], unique=False)
+
+    with op.batch_alter_table('escaneo_rfid', schema=None) as batch_op:
+        batch_op.create_index('ix_escaneo_rfid_producto_id_id', ['producto_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('escaneo_rfid', schema=None) as batch_op:
+        batch_op.drop_index('ix_escaneo_rfid_producto_id_id')
+
+    with op.batch_alter_table('estancia_ubicacion', schema=None) as batch_op:
+        batch_op.drop_index('ix_estancia_ubicacion_producto_id_primera_lectura')
+
+    op.drop_table('estancia_ubicacion')
@@ -0,0 +1,46 @@
+"""Add contador table
+
+Revision ID: d51c0e8f3a29
+Revises: 8b2e6d04a7f1
+Create Date: 2026-10-18 13:05:51.274018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd51c0e8f3a29'
+down_revision = '8b2e6d04a7f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('contador',
+    sa.Column('clave', sa.String(length=100), nullable=False),
+    sa.Column('valor', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('clave')
+    )
+
+    # Seed the counters from the existing rows (same keys as counters.py).
+    op.execute("INSERT INTO contador (clave, valor) SELECT 'productos', COUNT(*) FROM producto")
+    op.execute("INSERT INTO contador (clave, valor) SELECT 'usuarios', COUNT(*) FROM usuario")
+    op.execute("INSERT INTO contador (clave, valor) SELECT 'movimientos', COUNT(*) FROM movimiento")
+    op.execute("INSERT INTO contador (clave, valor) SELECT 'auditorias', COUNT(*) FROM auditoria")
+    op.execute(
+        "INSERT INTO contador (clave, valor) "
+        "SELECT 'prestamos_activos', COUNT(*) FROM producto WHERE usuario_asignado IS NOT NULL"
+    )
+    op.execute(
+        "INSERT INTO contador (clave, valor) "
+        "SELECT 'productos_estado:' || estado_id, COUNT(*) FROM producto GROUP BY estado_id"
+    )
+    op.execute(
+        "INSERT INTO contador (clave, valor) "
+        "SELECT 'usuarios_rol:' || lower(rol), COUNT(*) FROM usuario GROUP BY rol"
+    )
+
+
+def downgrade():
+    op.drop_table('contador')
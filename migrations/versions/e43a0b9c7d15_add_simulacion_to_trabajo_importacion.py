@@ -0,0 +1,26 @@
+"""Add simulacion column to trabajo_importacion
+
+Revision ID: e43a0b9c7d15
+Revises: 2c6e8f1a9b47
+Create Date: 2026-10-18 19:02:36.915844
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e43a0b9c7d15'
+down_revision = '2c6e8f1a9b47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('trabajo_importacion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('simulacion', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade():
+    with op.batch_alter_table('trabajo_importacion', schema=None) as batch_op:
+        batch_op.drop_column('simulacion')
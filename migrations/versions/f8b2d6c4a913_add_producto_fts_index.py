@@ -0,0 +1,52 @@
+"""Add producto_fts full-text index and sync triggers
+
+Revision ID: f8b2d6c4a913
+Revises: e43a0b9c7d15
+Create Date: 2026-10-18 20:11:47.302518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f8b2d6c4a913'
+down_revision = 'e43a0b9c7d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # External-content FTS5 table: only the index is stored, the text is read
+    # back from producto. Same statements as busqueda.DDL_FTS.
+    op.execute(
+        "CREATE VIRTUAL TABLE producto_fts USING fts5("
+        "nombre, codigo, descripcion, content='producto', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER producto_fts_ai AFTER INSERT ON producto BEGIN "
+        "INSERT INTO producto_fts(rowid, nombre, codigo, descripcion) "
+        "VALUES (new.id, new.nombre, new.codigo, new.descripcion); END"
+    )
+    op.execute(
+        "CREATE TRIGGER producto_fts_ad AFTER DELETE ON producto BEGIN "
+        "INSERT INTO producto_fts(producto_fts, rowid, nombre, codigo, descripcion) "
+        "VALUES ('delete', old.id, old.nombre, old.codigo, old.descripcion); END"
+    )
+    op.execute(
+        "CREATE TRIGGER producto_fts_au AFTER UPDATE OF nombre, codigo, descripcion ON producto BEGIN "
+        "INSERT INTO producto_fts(producto_fts, rowid, nombre, codigo, descripcion) "
+        "VALUES ('delete', old.id, old.nombre, old.codigo, old.descripcion); "
+        "INSERT INTO producto_fts(rowid, nombre, codigo, descripcion) "
+        "VALUES (new.id, new.nombre, new.codigo, new.descripcion); END"
+    )
+    # Index the existing products.
+    op.execute("INSERT INTO producto_fts(producto_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS producto_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS producto_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS producto_fts_ai")
+    op.execute("DROP TABLE IF EXISTS producto_fts")
@@ -2,7 +2,7 @@
 
 from extensions import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+import hashing
 from datetime import datetime
 from enum import Enum
 
@@ -34,10 +34,14 @@ class Usuario(UserMixin, db.Model):
     
     @password.setter
     def password(self, plaintext):
-        self._password = generate_password_hash(plaintext, method='pbkdf2:sha256', salt_length=16)
+        self._password = hashing.generar_hash(plaintext)
     
     def check_password(self, plaintext):
-        return check_password_hash(self._password, plaintext)
+        return hashing.verificar(self._password, plaintext)
+
+    def necesita_rehash(self):
+        """True if the stored hash predates the configured PASSWORD_HASH_ITERACIONES."""
+        return hashing.necesita_rehash(self._password)
 
 class Estado(db.Model):
     __tablename__ = 'estado'
@@ -68,11 +72,17 @@ class Producto(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('rfid_tag', name='uq_producto_rfid_tag'),
+        db.Index('ix_producto_estado_id_id', 'estado_id', 'id'),
+        db.Index('ix_producto_categoria_id_id', 'categoria_id', 'id'),
+        db.Index('ix_producto_ultima_actualizacion', 'ultima_actualizacion'),
     )
     
     movimientos = db.relationship('Movimiento', backref='producto', lazy=True, cascade='all, delete-orphan')
-    escaneos = db.relationship('EscaneoRFID', back_populates='producto', overlaps="historial_ubicaciones")
-    historial_ubicaciones = db.relationship('EscaneoRFID', back_populates='producto', order_by='EscaneoRFID.fecha_hora.desc()')
+    escaneos = db.relationship('EscaneoRFID', back_populates='producto')
+    historial_ubicaciones = db.relationship(
+        'EstanciaUbicacion', back_populates='producto', lazy='dynamic',
+        order_by='EstanciaUbicacion.primera_lectura.desc()'
+    )
     
 class EscaneoRFID(db.Model):
     __tablename__ = 'escaneo_rfid'
@@ -82,7 +92,27 @@ class EscaneoRFID(db.Model):
     ubicacion = db.Column(db.String(100))
     lector_id = db.Column(db.String(100))
     
-    producto = db.relationship('Producto', back_populates='escaneos', overlaps="historial_ubicaciones")
+    producto = db.relationship('Producto', back_populates='escaneos')
+
+    __table_args__ = (
+        db.Index('ix_escaneo_rfid_producto_id_id', 'producto_id', 'id'),
+    )
+
+class EstanciaUbicacion(db.Model):
+    __tablename__ = 'estancia_ubicacion'
+    id = db.Column(db.Integer, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), nullable=False)
+    ubicacion = db.Column(db.String(100))
+    primera_lectura = db.Column(db.DateTime, nullable=False)
+    ultima_lectura = db.Column(db.DateTime, nullable=False)
+    num_lecturas = db.Column(db.Integer, default=0, nullable=False)
+    lectores = db.Column(db.Text)  # comma-separated lector_id values
+
+    producto = db.relationship('Producto', back_populates='historial_ubicaciones')
+
+    __table_args__ = (
+        db.Index('ix_estancia_ubicacion_producto_id_primera_lectura', 'producto_id', 'primera_lectura'),
+    )
     
 class Movimiento(db.Model):
     __tablename__ = 'movimiento'
@@ -107,6 +137,12 @@ class Auditoria(db.Model):
     ip_address = db.Column(db.String(45))
     user_agent = db.Column(db.String(255))
 
+    __table_args__ = (
+        db.Index('ix_auditoria_fecha_hora_id', 'fecha_hora', 'id'),
+        db.Index('ix_auditoria_usuario_id_fecha_hora_id', 'usuario_id', 'fecha_hora', 'id'),
+        db.Index('ix_auditoria_accion_fecha_hora_id', 'accion', 'fecha_hora', 'id'),
+    )
+
 class Notificacion(db.Model):
     __tablename__ = 'notificacion'
     id = db.Column(db.Integer, primary_key=True)
@@ -146,6 +182,88 @@ class ConfiguracionSistema(db.Model):
     tipo = db.Column(db.String(50))
     ultima_actualizacion = db.Column(db.DateTime, onupdate=datetime.utcnow)
 
+class Contador(db.Model):
+    __tablename__ = 'contador'
+    clave = db.Column(db.String(100), primary_key=True)  # e.g. 'productos', 'productos_estado:2'
+    valor = db.Column(db.Integer, default=0, nullable=False)
+
+class ResumenMovimientoDia(db.Model):
+    __tablename__ = 'resumen_movimiento_dia'
+    fecha = db.Column(db.Date, primary_key=True)
+    estado_anterior = db.Column(db.String(50), primary_key=True)
+    estado_nuevo = db.Column(db.String(50), primary_key=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+
+class ResumenMovimientoUsuarioDia(db.Model):
+    __tablename__ = 'resumen_movimiento_usuario_dia'
+    fecha = db.Column(db.Date, primary_key=True)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), primary_key=True, index=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+
+class ResumenMovimientoProductoDia(db.Model):
+    __tablename__ = 'resumen_movimiento_producto_dia'
+    fecha = db.Column(db.Date, primary_key=True)
+    producto_id = db.Column(db.Integer, db.ForeignKey('producto.id'), primary_key=True, index=True)
+    total = db.Column(db.Integer, default=0, nullable=False)
+
+class TrabajoExportacion(db.Model):
+    __tablename__ = 'trabajo_exportacion'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'excel' or 'pdf'
+    estado = db.Column(db.String(20), default='pendiente', nullable=False, index=True)
+    progreso = db.Column(db.Integer, default=0, nullable=False)  # 0-100
+    filas_procesadas = db.Column(db.Integer, default=0, nullable=False)
+    filas_totales = db.Column(db.Integer)
+    parametros = db.Column(db.Text)  # JSON-encoded export filters
+    ruta_archivo = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+
+    usuario = db.relationship('Usuario')
+
+class TrabajoImportacion(db.Model):
+    __tablename__ = 'trabajo_importacion'
+    id = db.Column(db.Integer, primary_key=True)
+    tipo = db.Column(db.String(20), nullable=False)  # 'usuarios' or 'productos'
+    estado = db.Column(db.String(20), default='pendiente', nullable=False, index=True)
+    progreso = db.Column(db.Integer, default=0, nullable=False)  # 0-100
+    filas_procesadas = db.Column(db.Integer, default=0, nullable=False)
+    filas_totales = db.Column(db.Integer)
+    creados = db.Column(db.Integer, default=0, nullable=False)
+    simulacion = db.Column(db.Boolean, default=False, nullable=False)  # dry run: validate only
+    num_errores = db.Column(db.Integer, default=0, nullable=False)
+    errores = db.Column(db.Text)  # JSON-encoded [{fila, valor, error}]
+    ruta_archivo = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=False)
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+
+    usuario = db.relationship('Usuario')
+
+class BarridoInventario(db.Model):
+    __tablename__ = 'barrido_inventario'
+    id = db.Column(db.Integer, primary_key=True)
+    ubicacion = db.Column(db.String(100), nullable=False)
+    estado = db.Column(db.String(20), default='abierto', nullable=False, index=True)  # 'abierto' or 'conciliado'
+    total_lecturas = db.Column(db.Integer, default=0, nullable=False)
+    tags_distintos = db.Column(db.Integer)
+    presentes = db.Column(db.Integer)
+    faltantes = db.Column(db.Integer)
+    mal_ubicados = db.Column(db.Integer)
+    inesperados = db.Column(db.Integer)
+    corregidos = db.Column(db.Integer)
+    ruta_informe = db.Column(db.String(255))
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuario.id'), nullable=True)  # None for reader tokens
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    fecha_conciliacion = db.Column(db.DateTime)
+
+    usuario = db.relationship('Usuario')
+
 # Add relationships to existing models
 Usuario.solicitudes = db.relationship('SolicitudPrestamo', backref='solicitante', lazy=True,
                                     foreign_keys='SolicitudPrestamo.usuario_id')
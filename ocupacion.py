@@ -0,0 +1,134 @@
+# ocupacion.py
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sortedcontainers import SortedList
+from sqlalchemy import select
+
+from extensions import db
+from models import Producto
+
+# Rows fetched per round trip while rebuilding.
+TAMANO_BLOQUE_CARGA = 5000
+# Minimum seconds between catch-up queries for writes made by other processes.
+INTERVALO_SINCRONIZACION = 2
+# Catch-up overlap, covering clock skew between processes and long transactions.
+MARGEN_SINCRONIZACION = timedelta(seconds=30)
+
+
+class OcupacionUbicaciones:
+    """
+    Worker-local map of which products are at each location right now.
+
+    Built from ``producto.ubicacion_actual``/``ultimo_escaneo`` with one
+    streaming query, then kept current two ways: this process's scan
+    writes are applied directly (see `rfid.ingerir_escaneos`), and every
+    ``INTERVALO_SINCRONIZACION`` seconds a query on the indexed
+    ``producto.ultima_actualizacion`` picks up what other workers or the
+    RFID gateway wrote. Answers come from memory: a set per location,
+    and a SortedList by last scan for "not seen since" lists.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._por_ubicacion = None
+        self._productos = {}
+        self._por_escaneo = SortedList()
+        self._marca = None
+        self._sincronizado_en = 0.0
+
+    def _aplicar(self, producto_id, ubicacion, ultimo_escaneo):
+        previo = self._productos.get(producto_id)
+        if previo is not None:
+            ubicacion_previa, escaneo_previo = previo
+            if escaneo_previo is not None:
+                self._por_escaneo.discard((escaneo_previo, producto_id))
+            if ubicacion_previa is not None:
+                productos = self._por_ubicacion.get(ubicacion_previa)
+                if productos is not None:
+                    productos.discard(producto_id)
+                    if not productos:
+                        del self._por_ubicacion[ubicacion_previa]
+        self._productos[producto_id] = (ubicacion, ultimo_escaneo)
+        if ubicacion is not None:
+            self._por_ubicacion.setdefault(ubicacion, set()).add(producto_id)
+        if ultimo_escaneo is not None:
+            self._por_escaneo.add((ultimo_escaneo, producto_id))
+
+    def reconstruir(self, session=None):
+        """Load every located or scanned product with a single streaming query."""
+        session = session or db.session
+        consulta_en = datetime.utcnow()
+        resultado = session.execute(
+            select(Producto.id, Producto.ubicacion_actual, Producto.ultimo_escaneo)
+            .where((Producto.ubicacion_actual.isnot(None)) | (Producto.ultimo_escaneo.isnot(None)))
+            .execution_options(stream_results=True, yield_per=TAMANO_BLOQUE_CARGA)
+        )
+        with self._lock:
+            self._por_ubicacion = {}
+            self._productos = {}
+            self._por_escaneo = SortedList()
+            for producto_id, ubicacion, ultimo_escaneo in resultado:
+                self._aplicar(producto_id, ubicacion, ultimo_escaneo)
+            self._marca = consulta_en
+            self._sincronizado_en = time.monotonic()
+
+    def sincronizar(self, session=None, forzar=False):
+        """Build on first use, then apply products changed since the last catch-up."""
+        if self._por_ubicacion is None:
+            self.reconstruir(session)
+            return
+        if not forzar and time.monotonic() - self._sincronizado_en < INTERVALO_SINCRONIZACION:
+            return
+        session = session or db.session
+        consulta_en = datetime.utcnow()
+        filas = session.execute(
+            select(Producto.id, Producto.ubicacion_actual, Producto.ultimo_escaneo)
+            .where(Producto.ultima_actualizacion >= self._marca - MARGEN_SINCRONIZACION)
+        ).all()
+        with self._lock:
+            for producto_id, ubicacion, ultimo_escaneo in filas:
+                self._aplicar(producto_id, ubicacion, ultimo_escaneo)
+            self._marca = consulta_en
+            self._sincronizado_en = time.monotonic()
+
+    def registrar(self, cambios):
+        """Apply ``(producto_id, ubicacion, ultimo_escaneo)`` changes written by this process."""
+        with self._lock:
+            if self._por_ubicacion is None:
+                return
+            for producto_id, ubicacion, ultimo_escaneo in cambios:
+                self._aplicar(producto_id, ubicacion, ultimo_escaneo)
+
+    def conteos(self):
+        """Return ``{ubicacion: number of products}``."""
+        with self._lock:
+            return {ubicacion: len(productos) for ubicacion, productos in self._por_ubicacion.items()}
+
+    def contenido(self, ubicacion):
+        """Return the sorted ids of the products currently at ``ubicacion``."""
+        with self._lock:
+            return sorted(self._por_ubicacion.get(ubicacion, ()))
+
+    def contar_sin_ver(self, desde):
+        """Return how many products were last scanned before ``desde``."""
+        with self._lock:
+            return self._por_escaneo.bisect_left((desde,))
+
+    def sin_ver(self, desde, limite=None):
+        """
+        Return ``(producto_id, ubicacion, ultimo_escaneo)`` for products last
+        scanned before ``desde``, oldest first, at most ``limite``.
+        """
+        with self._lock:
+            fin = self._por_escaneo.bisect_left((desde,))
+            if limite is not None:
+                fin = min(fin, limite)
+            return [
+                (producto_id, self._productos[producto_id][0], ultimo_escaneo)
+                for ultimo_escaneo, producto_id in self._por_escaneo.islice(0, fin)
+            ]
+
+
+ocupacion = OcupacionUbicaciones()
@@ -0,0 +1,88 @@
+# pagination.py
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import DateTime, Integer, tuple_
+
+TAMANO_PAGINA_DEFECTO = 50
+TAMANO_PAGINA_MAXIMO = 200
+
+Pagina = namedtuple('Pagina', ['elementos', 'cursor_siguiente', 'limite'])
+
+
+def obtener_limite():
+    """Read ``limite`` from the query string, clamped to the allowed page sizes."""
+    limite = request.args.get('limite', TAMANO_PAGINA_DEFECTO, type=int)
+    return max(1, min(limite, TAMANO_PAGINA_MAXIMO))
+
+
+def codificar_cursor(valores):
+    """Encode the ordering key of the last row of a page as an opaque URL-safe token."""
+    crudo = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(crudo).encode()).decode().rstrip('=')
+
+
+def _valor_cursor(valor, columna):
+    # Cursors come from the client: only scalars of the column's type may reach the query.
+    if isinstance(columna.type, DateTime):
+        if not isinstance(valor, str):
+            raise ValueError('Cursor inválido')
+        return datetime.fromisoformat(valor)
+    tipos = (int,) if isinstance(columna.type, Integer) else (int, str)
+    if isinstance(valor, bool) or not isinstance(valor, tipos):
+        raise ValueError('Cursor inválido')
+    return valor
+
+
+def decodificar_cursor(cursor, columnas):
+    """
+    Decode a token produced by `codificar_cursor` back into column values.
+
+    Raises:
+        ValueError: If the token is malformed or does not match ``columnas``.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        crudo = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Cursor inválido') from e
+    if not isinstance(crudo, list) or len(crudo) != len(columnas):
+        raise ValueError('Cursor inválido')
+    return [_valor_cursor(valor, columna) for valor, columna in zip(crudo, columnas)]
+
+
+def paginar(query, columnas, cursor=None, limite=TAMANO_PAGINA_DEFECTO, descendente=True):
+    """
+    Return one keyset page of ``query``.
+
+    ``columnas`` must form a unique ordering key backed by an index (e.g.
+    ``(Auditoria.fecha_hora, Auditoria.id)``), so each page is a single index
+    range scan that resumes right after the previous page instead of using
+    OFFSET. One extra row is fetched to know whether a next page exists.
+
+    Args:
+        query: The filtered query to paginate.
+        columnas (list): Columns of the ordering key.
+        cursor (str): Token from a previous page, or None for the first page.
+        limite (int): Maximum number of rows on the page.
+        descendente (bool): Sort direction of the ordering key.
+
+    Returns:
+        Pagina: The rows, the cursor for the next page (None on the last page) and the limit.
+    """
+    if cursor:
+        valores = decodificar_cursor(cursor, columnas)
+        clave = tuple_(*columnas) if len(columnas) > 1 else columnas[0]
+        limite_clave = tuple_(*valores) if len(columnas) > 1 else valores[0]
+        query = query.filter(clave < limite_clave if descendente else clave > limite_clave)
+
+    orden = [c.desc() if descendente else c.asc() for c in columnas]
+    filas = query.order_by(*orden).limit(limite + 1).all()
+    cursor_siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        cursor_siguiente = codificar_cursor([getattr(filas[-1], c.key) for c in columnas])
+    return Pagina(filas, cursor_siguiente, limite)
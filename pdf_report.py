@@ -0,0 +1,225 @@
+# pdf_report.py
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet
+
+from exports import EXPORT_COLUMNS
+
+
+def render_pdf_movimientos(filas, destino):
+    """
+    Render the movement report as a single ReportLab table.
+
+    Layout cost grows super-linearly with the row count; kept for small
+    reports and as the baseline of benchmarks/bench_pdf.py. Use
+    `render_pdf_paginado` for full histories.
+
+    Args:
+        filas (iterable): Formatted export rows, see `exports.iterar_movimientos_exportacion`.
+        destino: A path or binary file-like object the PDF is written to.
+    """
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Title
+    elements.append(Paragraph("Reporte de Movimientos", styles['Heading1']))
+    elements.append(Spacer(1, 12))
+
+    # Table data
+    data = [list(EXPORT_COLUMNS)]
+    data.extend(list(fila) for fila in filas)
+
+    # Create table
+    t = Table(data)
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 14),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    elements.append(t)
+    doc.build(elements)
+
+
+# Rows per page block of the paged engine; sized for the light style on letter.
+FILAS_POR_PAGINA = 40
+# Page blocks handed to each worker process when rendering in parallel.
+PAGINAS_POR_PARTE = 50
+# Rows rendered in full before the rest is folded into the summary appendix.
+MAX_FILAS_PDF = 50000
+
+ANCHOS_COLUMNAS = [85, 150, 130, 90, 90]
+LONGITUD_MAXIMA_CELDA = [16, 30, 26, 16, 16]
+
+ESTILO_LIGERO = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 1),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.75, colors.black),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+])
+
+try:
+    from pypdf import PdfWriter
+except ImportError:  # parallel rendering needs pypdf to concatenate the parts
+    PdfWriter = None
+
+
+def _recortar(fila):
+    return [
+        valor if len(valor) <= limite else valor[:limite - 1] + '…'
+        for valor, limite in zip((str(v) for v in fila), LONGITUD_MAXIMA_CELDA)
+    ]
+
+
+def _tabla_bloque(filas):
+    """One page worth of rows: fixed column widths, repeated header, light style."""
+    tabla = Table([list(EXPORT_COLUMNS)] + filas, colWidths=ANCHOS_COLUMNAS, repeatRows=1)
+    tabla.setStyle(ESTILO_LIGERO)
+    return tabla
+
+
+def _numerar_paginas(pagina_inicial):
+    def numerar(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica', 7)
+        canvas.drawRightString(
+            doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2,
+            f'Página {pagina_inicial + doc.page - 1}'
+        )
+        canvas.restoreState()
+    return numerar
+
+
+def _render_parte(bloques, destino, pagina_inicial=1, con_titulo=True, resumen=None):
+    """Render a run of page blocks (and optionally the summary) into one PDF."""
+    doc = SimpleDocTemplate(destino, pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements = []
+    if con_titulo:
+        elements.append(Paragraph("Reporte de Movimientos", styles['Heading1']))
+        elements.append(Spacer(1, 12))
+    for i, filas in enumerate(bloques):
+        if i:
+            elements.append(PageBreak())
+        elements.append(_tabla_bloque(filas))
+    if resumen is not None:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(_flowables_resumen(resumen, styles))
+    numerar = _numerar_paginas(pagina_inicial)
+    doc.build(elements, onFirstPage=numerar, onLaterPages=numerar)
+
+
+def _render_parte_bytes(bloques, pagina_inicial, con_titulo):
+    buffer = BytesIO()
+    _render_parte(bloques, buffer, pagina_inicial, con_titulo)
+    return buffer.getvalue()
+
+
+def _flowables_resumen(resumen, styles):
+    elements = [Paragraph("Resumen", styles['Heading2']), Spacer(1, 6)]
+    lineas = [
+        f"Movimientos totales: {resumen['total']}",
+        f"Movimientos incluidos en el detalle: {resumen['incluidos']}",
+        f"Movimientos omitidos por el límite de {resumen['limite']} filas: {resumen['total'] - resumen['incluidos']}",
+    ]
+    if resumen['desde']:
+        lineas.append(f"Periodo: {resumen['desde']} a {resumen['hasta']}")
+    elements.extend(Paragraph(linea, styles['Normal']) for linea in lineas)
+    if resumen['por_estado']:
+        elements.append(Spacer(1, 12))
+        tabla = Table(
+            [['Estado Nuevo', 'Movimientos']] + sorted(resumen['por_estado'].items()),
+            colWidths=[150, 90]
+        )
+        tabla.setStyle(ESTILO_LIGERO)
+        elements.append(tabla)
+    return elements
+
+
+def _bloques_con_resumen(filas, filas_por_pagina, max_filas, resumen):
+    """Group rows into page blocks up to ``max_filas``, counting every row into ``resumen``."""
+    bloque = []
+    for fila in filas:
+        resumen['total'] += 1
+        resumen['por_estado'][fila[4]] = resumen['por_estado'].get(fila[4], 0) + 1
+        # Export rows come newest first.
+        resumen['hasta'] = resumen['hasta'] or fila[0]
+        resumen['desde'] = fila[0]
+        if max_filas is not None and resumen['incluidos'] >= max_filas:
+            continue
+        resumen['incluidos'] += 1
+        bloque.append(_recortar(fila))
+        if len(bloque) == filas_por_pagina:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def render_pdf_paginado(filas, destino, filas_por_pagina=FILAS_POR_PAGINA, max_filas=MAX_FILAS_PDF,
+                        procesos=1, paginas_por_parte=PAGINAS_POR_PARTE):
+    """
+    Render the movement report as fixed-size page blocks.
+
+    Instead of one huge table, every page is its own small table with fixed
+    column widths, a repeated header and a single light style, so layout cost
+    is linear in the number of rows. Only the first ``max_filas`` rows are
+    rendered; all rows are counted into a summary appendix on the last page.
+
+    With ``procesos > 1`` (and pypdf installed) runs of ``paginas_por_parte``
+    pages are rendered by a process pool and concatenated in order.
+
+    Args:
+        filas (iterable): Formatted export rows, newest first.
+        destino: A path or binary file-like object the PDF is written to.
+    """
+    resumen = {'total': 0, 'incluidos': 0, 'limite': max_filas, 'por_estado': {}, 'desde': None, 'hasta': None}
+    bloques = _bloques_con_resumen(filas, filas_por_pagina, max_filas, resumen)
+
+    if procesos <= 1 or PdfWriter is None:
+        _render_parte(list(bloques), destino, resumen=resumen)
+        return
+
+    writer = PdfWriter()
+    pendientes = deque()
+    pagina = 1
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as executor:
+        parte = []
+        for bloque in bloques:
+            parte.append(bloque)
+            if len(parte) == paginas_por_parte:
+                pendientes.append(executor.submit(_render_parte_bytes, parte, pagina, pagina == 1))
+                pagina += len(parte)
+                parte = []
+                # Keep a bounded number of rendered parts in flight.
+                while len(pendientes) > procesos * 2:
+                    writer.append(BytesIO(pendientes.popleft().result()))
+        if parte:
+            pendientes.append(executor.submit(_render_parte_bytes, parte, pagina, pagina == 1))
+            pagina += len(parte)
+        while pendientes:
+            writer.append(BytesIO(pendientes.popleft().result()))
+
+    apendice = BytesIO()
+    _render_parte([], apendice, pagina, con_titulo=pagina == 1, resumen=resumen)
+    writer.append(apendice)
+    writer.write(destino)
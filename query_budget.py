@@ -0,0 +1,203 @@
+"""
+Comprueba el presupuesto de consultas SQL de cada vista.
+
+Siembra una base de datos SQLite temporal con suficientes filas como para
+que cualquier carga N+1 sea evidente, recorre las rutas de RUTAS con el rol
+indicado y cuenta las sentencias ejecutadas durante cada petición. Termina
+con código 1 si alguna vista supera el límite declarado con
+`decorators.presupuesto_consultas`, o si una corrección de barrido pedida
+con token de lector no deja su fila de auditoría.
+
+Uso: python query_budget.py [--escala N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# The app reads DATABASE_URL at import time, so point it at a scratch file first.
+_directorio = tempfile.mkdtemp(prefix='query_budget_')
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_directorio, 'budget.db')
+
+from sqlalchemy import event  # noqa: E402
+
+import auditoria  # noqa: E402
+import lectura  # noqa: E402
+from app import app, limiter, initialize_estados  # noqa: E402
+from counters import reconstruir_contadores  # noqa: E402
+from decorators import PRESUPUESTOS_CONSULTAS  # noqa: E402
+from estado_registry import registro_estados  # noqa: E402
+from extensions import db  # noqa: E402
+from models import (  # noqa: E402
+    Auditoria, Categoria, Estado, Movimiento, Notificacion, Producto, RoleEnum, Usuario
+)
+from rollups import reconstruir_resumenes, refrescar_si_necesario  # noqa: E402
+
+CONTRASENA = 'presupuesto'
+TOKEN_LECTOR = 'presupuesto-lector'
+
+# (endpoint, URL, rol con el que se pide)
+RUTAS = [
+    ('lista_productos', '/admin/productos', RoleEnum.ADMIN),
+    ('lista_productos', '/admin/productos?q=Producto', RoleEnum.ADMIN),
+    ('buscar_productos_api', '/api/productos/buscar?q=Produc', RoleEnum.ADMIN),
+    ('autocompletar_productos', '/api/autocompletar/productos?q=P', RoleEnum.ADMIN),
+    ('autocompletar_usuarios', '/api/autocompletar/usuarios?q=u', RoleEnum.ADMIN),
+    ('cambiar_estado_producto', '/admin/producto/1/cambiar_estado', RoleEnum.ADMIN),
+    ('admin_dashboard', '/admin/dashboard', RoleEnum.ADMIN),
+    ('lista_usuarios', '/admin/usuarios', RoleEnum.ADMIN),
+    ('lista_auditoria', '/admin/auditoria', RoleEnum.ADMIN),
+    ('reportes', '/reportes', RoleEnum.ADMIN),
+    ('exportar_reportes', '/reportes/exportar/csv', RoleEnum.ADMIN),
+    ('usuario_dashboard', '/usuario/dashboard', RoleEnum.USUARIO),
+    ('profesor_dashboard', '/profesor/dashboard', RoleEnum.PROFESOR),
+    ('profesor_dashboard', '/profesor/dashboard?q=Producto', RoleEnum.PROFESOR),
+    ('alumno_dashboard', '/alumno/dashboard', RoleEnum.ALUMNO),
+    ('solicitar_producto', '/solicitar-producto/1', RoleEnum.PROFESOR),
+    ('devolver_producto', '/devolver-producto/2', RoleEnum.PROFESOR),
+    ('historial_producto', '/producto/1/historial', RoleEnum.PROFESOR),
+]
+
+
+def sembrar(escala):
+    """Create a dataset where every list renders ``escala`` related rows."""
+    db.create_all()
+    initialize_estados()
+    estados = Estado.query.order_by(Estado.orden).all()
+    categorias = [Categoria(nombre=f'Categoría {i}') for i in range(3)]
+    db.session.add_all(categorias)
+
+    usuarios = []
+    for rol in RoleEnum:
+        for i in range(max(1, escala // 4)):
+            usuario = Usuario(nombre_usuario=f'{rol.value}{i:04d}', rol=rol)
+            usuario.password = CONTRASENA
+            usuarios.append(usuario)
+    db.session.add_all(usuarios)
+    db.session.flush()
+    profesor = next(u for u in usuarios if u.rol == RoleEnum.PROFESOR)
+    usuario_normal = next(u for u in usuarios if u.rol == RoleEnum.USUARIO)
+
+    ahora = datetime.utcnow()
+    productos = []
+    for i in range(escala):
+        asignado = (profesor if i % 2 else usuario_normal) if i % 3 == 1 else None
+        productos.append(Producto(
+            nombre=f'Producto {i}',
+            codigo=f'P{i:06d}',
+            estado=estados[1] if asignado else estados[0],
+            categoria=categorias[i % len(categorias)],
+            usuario_asignado=asignado.id if asignado else None,
+            fecha_asignacion=ahora if asignado else None,
+            rfid_tag=f'E200{i:012d}'
+        ))
+    db.session.add_all(productos)
+    db.session.flush()
+
+    for i in range(escala * 2):
+        producto = productos[i % len(productos)]
+        usuario = usuarios[i % len(usuarios)]
+        fecha = ahora - timedelta(hours=i)
+        db.session.add(Movimiento(
+            producto_id=producto.id, usuario_id=usuario.id, fecha_hora=fecha,
+            estado_anterior='Disponible', estado_nuevo='Prestado'
+        ))
+        db.session.add(Auditoria(usuario_id=usuario.id, accion='Cambio de estado', fecha_hora=fecha))
+        db.session.add(Notificacion(mensaje=f'Aviso {i}', usuario_id=usuario.id))
+    db.session.commit()
+    reconstruir_contadores()
+    reconstruir_resumenes()
+
+
+@contextmanager
+def contar_consultas(*engines):
+    """Count the statements sent to any of ``engines`` inside the block."""
+    contador = {'sentencias': 0}
+
+    def antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+        contador['sentencias'] += 1
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', antes_de_ejecutar)
+    try:
+        yield contador
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', antes_de_ejecutar)
+
+
+def comprobar_auditoria_barrido():
+    """Return True if a sweep corrected with a reader token was audited."""
+    app.config['RFID_LECTOR_TOKENS'] = {TOKEN_LECTOR}
+    app.config['BARRIDOS_DIR'] = os.path.join(_directorio, 'barridos')
+    cliente = app.test_client()
+    cabeceras = {'X-Lector-Token': TOKEN_LECTOR}
+    # The seeded products have no location, so reading one at the swept location corrects it.
+    respuesta = cliente.post('/api/rfid/barridos', headers=cabeceras,
+                             json={'ubicacion': 'Almacén', 'lecturas': [f'E200{0:012d}']})
+    barrido_id = respuesta.get_json()['id']
+    respuesta = cliente.post(f'/api/rfid/barridos/{barrido_id}/conciliar', headers=cabeceras,
+                             json={'corregir': True})
+    corregidos = respuesta.get_json()['corregidos']
+    with app.app_context():
+        auditadas = db.session.scalar(
+            db.select(db.func.count(Auditoria.id))
+            .join(Usuario, Usuario.id == Auditoria.usuario_id)
+            .where(Auditoria.accion == 'Conciliación de inventario',
+                   Usuario.nombre_usuario == auditoria.USUARIO_LECTORES)
+        )
+    correcto = corregidos == 1 and auditadas == 1
+    marca = '' if correcto else '  <-- FALLO'
+    print(f'auditoría de barrido por token: {corregidos} corregidos, {auditadas} auditados{marca}')
+    return correcto
+
+
+def cliente_para(rol):
+    nombre = f'{rol.value}0000'
+    cliente = app.test_client()
+    respuesta = cliente.post('/login', data={'nombre_usuario': nombre, 'contrasena': CONTRASENA})
+    if respuesta.status_code != 302:
+        raise RuntimeError(f'No se pudo iniciar sesión como {nombre}')
+    return cliente
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Comprueba el presupuesto de consultas de cada vista.')
+    parser.add_argument('--escala', type=int, default=40, help='filas sembradas por lista')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = False
+    fallos = 0
+    with app.app_context():
+        sembrar(args.escala)
+        # Budgets describe a warm worker: per-worker caches are loaded up front.
+        registro_estados.todos()
+        refrescar_si_necesario()
+        # Report and list views read through the read-only engine (see `lectura.py`).
+        engines = [engine for engine in (db.engine, lectura.get_engine()) if engine is not None]
+    clientes = {}
+
+    print(f"{'vista':<26} {'estado':>6} {'consultas':>9} {'límite':>7}")
+    for endpoint, url, rol in RUTAS:
+        if rol not in clientes:
+            clientes[rol] = cliente_para(rol)
+        cliente = clientes[rol]
+        with contar_consultas(*engines) as contador:
+            respuesta = cliente.get(url)
+            respuesta.get_data()  # drain streamed responses
+        limite = PRESUPUESTOS_CONSULTAS.get(endpoint)
+        excedido = respuesta.status_code >= 400 or limite is None or contador['sentencias'] > limite
+        fallos += excedido
+        marca = '  <-- FALLO' if excedido else ''
+        print(f"{endpoint:<26} {respuesta.status_code:>6} {contador['sentencias']:>9} {str(limite):>7}{marca}")
+
+    fallos += not comprobar_auditoria_barrido()
+
+    return 1 if fallos else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
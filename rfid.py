@@ -0,0 +1,254 @@
+# rfid.py
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, delete, insert, or_, text, update
+
+from extensions import db
+from indice_rfid import indice_tags
+from models import EscaneoRFID, Producto
+from ocupacion import ocupacion
+
+# Largest batch accepted by a single ingestion call.
+LOTE_MAXIMO = 5000
+
+Lectura = namedtuple('Lectura', ['rfid_tag', 'lector_id', 'ubicacion', 'fecha_hora'])
+
+CAMPOS_LECTURA = ('rfid_tag', 'lector_id', 'ubicacion', 'timestamp')
+
+# Latest read per product in the batch being ingested; created on demand
+# as a TEMP table, so it is private to each connection.
+_lote = Table(
+    'lote_escaneo_rfid', MetaData(),
+    Column('id', Integer, primary_key=True),
+    Column('fecha_hora', DateTime),
+    Column('ubicacion', String(100))
+)
+
+
+def _parsear_fecha(valor):
+    """Accept ISO 8601 strings or epoch seconds; return a naive UTC datetime."""
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        return datetime.fromtimestamp(valor, tz=timezone.utc).replace(tzinfo=None)
+    if isinstance(valor, str):
+        fecha = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+        if fecha.tzinfo is not None:
+            fecha = fecha.astimezone(timezone.utc).replace(tzinfo=None)
+        return fecha
+    raise ValueError('timestamp debe ser ISO 8601 o segundos epoch')
+
+
+def parsear_lectura(dato):
+    """
+    Turn one raw read into a `Lectura`.
+
+    ``dato`` is either an object with the keys in CAMPOS_LECTURA or a
+    ``[rfid_tag, lector_id, ubicacion, timestamp]`` array. A missing
+    timestamp means "now". Raises ValueError if the read is malformed.
+    """
+    if isinstance(dato, dict):
+        rfid_tag, lector_id, ubicacion, marca = (dato.get(campo) for campo in CAMPOS_LECTURA)
+    elif isinstance(dato, (list, tuple)) and len(dato) == 4:
+        rfid_tag, lector_id, ubicacion, marca = dato
+    else:
+        raise ValueError('formato de lectura no válido')
+    if not rfid_tag or not isinstance(rfid_tag, str):
+        raise ValueError('rfid_tag vacío')
+    fecha_hora = datetime.utcnow() if marca is None else _parsear_fecha(marca)
+    return Lectura(
+        rfid_tag,
+        None if lector_id is None else str(lector_id)[:100],
+        None if ubicacion is None else str(ubicacion)[:100],
+        fecha_hora
+    )
+
+
+class FiltroRebote:
+    """
+    Drops repeated reads of a tag by the same reader within a time window.
+
+    Portals re-read a tag many times per second while it sits in the field.
+    For each ``(lector_id, rfid_tag)`` the first read opens a window of
+    ``ventana_segundos`` (measured on the read timestamps); further reads in
+    that window are suppressed unless they report a different ``ubicacion``.
+    Windows are only opened by reads that were stored: a batch whose
+    transaction fails leaves no trace, so the reader's retry is not
+    suppressed. At most ``capacidad`` keys are kept, evicting the least
+    recently read, so an evicted tag simply opens a new window on its next
+    read.
+
+    The state is per worker process: a reader whose batches are spread over
+    several workers is debounced less aggressively, never more.
+    """
+
+    def __init__(self, ventana_segundos=5, capacidad=100000):
+        self.ventana = timedelta(seconds=ventana_segundos)
+        self.capacidad = capacidad
+        self._lock = threading.Lock()
+        self._ventanas = OrderedDict()
+        self.admitidas = 0
+        self.suprimidas = 0
+        self.expulsadas = 0
+
+    def admitir(self, lectura, nuevas):
+        """
+        Return True if ``lectura`` must be stored, False if it is a duplicate.
+
+        Only reads the stored windows. The window an admitted read opens is
+        put in ``nuevas`` (a dict owned by the caller, so later reads of the
+        same batch see it) and is kept only when the caller passes
+        ``nuevas`` to `confirmar` after the reads were stored.
+        """
+        if not self.ventana:
+            return True
+        clave = (lectura.lector_id, lectura.rfid_tag)
+        previa = nuevas.get(clave)
+        if previa is None:
+            with self._lock:
+                previa = self._ventanas.get(clave)
+        if previa is not None:
+            inicio, ubicacion = previa
+            if lectura.fecha_hora - inicio < self.ventana and lectura.ubicacion == ubicacion:
+                return False
+        nuevas[clave] = (lectura.fecha_hora, lectura.ubicacion)
+        return True
+
+    def confirmar(self, nuevas, suprimidas=0):
+        """Keep the windows opened by reads that were committed (see `admitir`)."""
+        if not self.ventana:
+            return
+        with self._lock:
+            for clave, ventana in nuevas.items():
+                self._ventanas[clave] = ventana
+                self._ventanas.move_to_end(clave)
+            while len(self._ventanas) > self.capacidad:
+                self._ventanas.popitem(last=False)
+                self.expulsadas += 1
+            self.admitidas += len(nuevas)
+            self.suprimidas += suprimidas
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'ventana_segundos': self.ventana.total_seconds(),
+                'capacidad': self.capacidad,
+                'claves': len(self._ventanas),
+                'admitidas': self.admitidas,
+                'suprimidas': self.suprimidas,
+                'expulsadas': self.expulsadas
+            }
+
+
+def resolver_tags(tags, session=None):
+    """Map each known tag in ``tags`` to its producto id (see `indice_rfid.IndiceTags`)."""
+    return {tag: entrada.producto_id for tag, entrada in indice_tags.resolver(tags, session).items()}
+
+
+def _actualizar_productos(session, ultimas):
+    """
+    Move ``ultimo_escaneo``/``ubicacion_actual`` forward for the scanned products.
+
+    ``ultimas`` maps producto id to its latest ``(fecha_hora, ubicacion)`` in
+    the batch. They are loaded into a per-connection temporary table with
+    one executemany and applied with a single ``UPDATE ... FROM`` that only
+    touches products whose stored scan is older, so batches that arrive out
+    of order never move a product back.
+
+    Returns ``(id, rfid_tag, ubicacion_actual, ultimo_escaneo)`` for the
+    products it moved.
+    """
+    session.execute(text(
+        'CREATE TEMP TABLE IF NOT EXISTS lote_escaneo_rfid '
+        '(id INTEGER PRIMARY KEY, fecha_hora DATETIME, ubicacion VARCHAR(100))'
+    ))
+    session.execute(delete(_lote))
+    session.execute(insert(_lote), [
+        {'id': producto_id, 'fecha_hora': fecha, 'ubicacion': ubicacion}
+        for producto_id, (fecha, ubicacion) in ultimas.items()
+    ])
+    return session.execute(
+        update(Producto)
+        .where(Producto.id == _lote.c.id)
+        .where(or_(Producto.ultimo_escaneo.is_(None), Producto.ultimo_escaneo < _lote.c.fecha_hora))
+        .values(ultimo_escaneo=_lote.c.fecha_hora, ubicacion_actual=_lote.c.ubicacion)
+        .returning(Producto.id, Producto.rfid_tag, Producto.ubicacion_actual, Producto.ultimo_escaneo)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def ingerir_escaneos(datos, session=None, filtro=None):
+    """
+    Store a batch of RFID reads in one transaction.
+
+    Tags are resolved with a handful of IN queries, the accepted reads are
+    inserted into ``escaneo_rfid`` with a single executemany, and the
+    scanned products are updated set-wise (see `_actualizar_productos`).
+    Malformed reads and unknown tags are not stored; they are returned in
+    the reject report with their position in ``datos``. If a `FiltroRebote`
+    is given, duplicate reads of known tags are dropped; its windows are
+    only updated once the batch has committed.
+
+    Returns:
+        dict: ``recibidas``, ``aceptadas``, ``suprimidas`` and ``rechazadas``
+        counts, plus ``rechazos``, a list of ``{'indice', 'rfid_tag', 'motivo'}``.
+    """
+    session = session or db.session
+    rechazos = []
+    lecturas = []
+    suprimidas = 0
+    for indice, dato in enumerate(datos):
+        try:
+            lectura = parsear_lectura(dato)
+        except (ValueError, TypeError, OverflowError) as e:
+            if isinstance(dato, dict):
+                rfid_tag = dato.get('rfid_tag')
+            elif isinstance(dato, (list, tuple)) and dato:
+                rfid_tag = dato[0]
+            else:
+                rfid_tag = None
+            rechazos.append({'indice': indice, 'rfid_tag': rfid_tag, 'motivo': str(e)})
+            continue
+        lecturas.append((indice, lectura))
+
+    productos = resolver_tags({lectura.rfid_tag for _, lectura in lecturas}, session)
+
+    escaneos = []
+    ultimas = {}
+    ventanas = {}
+    for indice, lectura in lecturas:
+        producto_id = productos.get(lectura.rfid_tag)
+        if producto_id is None:
+            rechazos.append({'indice': indice, 'rfid_tag': lectura.rfid_tag, 'motivo': 'tag desconocido'})
+            continue
+        if filtro is not None and not filtro.admitir(lectura, ventanas):
+            suprimidas += 1
+            continue
+        escaneos.append({
+            'producto_id': producto_id,
+            'fecha_hora': lectura.fecha_hora,
+            'ubicacion': lectura.ubicacion,
+            'lector_id': lectura.lector_id
+        })
+        previa = ultimas.get(producto_id)
+        if previa is None or lectura.fecha_hora >= previa[0]:
+            ultimas[producto_id] = (lectura.fecha_hora, lectura.ubicacion)
+
+    movidos = []
+    if escaneos:
+        session.execute(insert(EscaneoRFID), escaneos)
+        movidos = _actualizar_productos(session, ultimas)
+    session.commit()
+    if filtro is not None:
+        filtro.confirmar(ventanas, suprimidas)
+    indice_tags.actualizar_ubicaciones((tag, ubicacion) for _, tag, ubicacion, _ in movidos)
+    ocupacion.registrar((producto_id, ubicacion, fecha) for producto_id, _, ubicacion, fecha in movidos)
+
+    rechazos.sort(key=lambda rechazo: rechazo['indice'])
+    return {
+        'recibidas': len(datos),
+        'aceptadas': len(escaneos),
+        'suprimidas': suprimidas,
+        'rechazadas': len(rechazos),
+        'rechazos': rechazos
+    }
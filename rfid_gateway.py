@@ -0,0 +1,305 @@
+# rfid_gateway.py
+"""
+Standalone asyncio gateway between RFID readers and the database.
+
+Readers connect over TCP or send UDP datagrams carrying one read per frame,
+either as JSON lines or as msgpack objects. A read is the same object or
+``[rfid_tag, lector_id, ubicacion, timestamp]`` array accepted by
+POST /api/rfid/escaneos. Reads are queued, grouped into batches bounded by
+size and time, and each batch is written in one transaction with
+`rfid.ingerir_escaneos`.
+
+When the queue is full TCP connections stop being read, so the kernel
+buffers fill and the readers block (backpressure); UDP datagrams that
+find the queue full are dropped and counted.
+
+Usage: python rfid_gateway.py [--tcp HOST:PORT] [--udp HOST:PORT] [--formato lineas|msgpack]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from collections import deque
+
+import msgpack
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import rfid
+from comun import percentil
+from indice_rfid import indice_tags
+
+logger = logging.getLogger('rfid_gateway')
+
+FORMATOS = ('lineas', 'msgpack')
+# Latency samples kept for the percentiles in `estadisticas`.
+MUESTRAS_LATENCIA = 10000
+# Attempts per batch (e.g. through "database is locked") before its reads are dropped.
+MAX_INTENTOS = 3
+
+
+class Decodificador:
+    """Splits a byte stream (or a datagram) into read frames."""
+
+    def __init__(self, formato):
+        if formato not in FORMATOS:
+            raise ValueError(f'Formato no soportado: {formato}')
+        self.formato = formato
+        self._pendiente = b''
+        self._unpacker = msgpack.Unpacker(raw=False) if formato == 'msgpack' else None
+        self.malformados = 0
+
+    def alimentar(self, datos):
+        """Feed bytes and return the complete frames decoded so far."""
+        if self._unpacker is not None:
+            self._unpacker.feed(datos)
+            try:
+                return list(self._unpacker)
+            except (msgpack.UnpackException, ValueError):
+                # The stream cannot be resynchronised; drop what is buffered.
+                self.malformados += 1
+                self._unpacker = msgpack.Unpacker(raw=False)
+                return []
+
+        self._pendiente += datos
+        *lineas, self._pendiente = self._pendiente.split(b'\n')
+        tramas = []
+        for linea in lineas:
+            if not linea.strip():
+                continue
+            try:
+                tramas.append(json.loads(linea))
+            except ValueError:
+                self.malformados += 1
+        return tramas
+
+    def terminar(self):
+        """Return the last frame of a stream (or datagram) without a trailing newline."""
+        if self._unpacker is not None or not self._pendiente.strip():
+            return []
+        return self.alimentar(b'\n')
+
+
+class Pasarela:
+    """
+    Receives reads from many readers and writes them to the database in batches.
+
+    A batch is written when it holds ``tamano_lote`` reads or ``intervalo``
+    seconds after its first read arrived, whichever comes first. Batches are
+    written one at a time from a worker thread so the event loop keeps
+    accepting reads meanwhile; SQLite only has one writer anyway. A batch
+    that fails is retried with backoff; after ``MAX_INTENTOS`` attempts its
+    reads are logged and counted in ``perdidas``.
+    """
+
+    def __init__(self, database_url, tamano_lote=1000, intervalo=0.2, capacidad_cola=20000, filtro=None):
+        self.engine = create_engine(database_url, connect_args={'timeout': 30})
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.filtro = filtro
+        self.cola = asyncio.Queue(maxsize=capacidad_cola)
+        self._servidores = []
+        self._transportes = []
+        self._escritor = None
+        self.recibidas = 0
+        self.descartadas = 0
+        self.malformadas = 0
+        self.aceptadas = 0
+        self.suprimidas = 0
+        self.rechazadas = 0
+        self.lotes = 0
+        self.lotes_fallidos = 0
+        self.perdidas = 0
+        self.latencias = deque(maxlen=MUESTRAS_LATENCIA)
+
+    async def iniciar(self, tcp=None, udp=None, formato='lineas'):
+        """Start the listeners and the batch writer; return the bound (host, port) pairs."""
+        loop = asyncio.get_running_loop()
+        direcciones = {}
+        await asyncio.to_thread(self._calentar_indice)
+        self._escritor = asyncio.create_task(self._escribir_lotes())
+        if tcp:
+            servidor = await asyncio.start_server(
+                lambda r, w: self._atender_tcp(r, w, formato), tcp[0], tcp[1]
+            )
+            self._servidores.append(servidor)
+            direcciones['tcp'] = servidor.sockets[0].getsockname()[:2]
+        if udp:
+            transporte, _ = await loop.create_datagram_endpoint(
+                lambda: _ProtocoloUDP(self, formato), local_addr=udp
+            )
+            self._transportes.append(transporte)
+            direcciones['udp'] = transporte.get_extra_info('sockname')[:2]
+        return direcciones
+
+    async def detener(self):
+        """Stop accepting reads, write everything still queued and release the engine."""
+        for servidor in self._servidores:
+            servidor.close()
+            await servidor.wait_closed()
+        for transporte in self._transportes:
+            transporte.close()
+        await self.cola.join()
+        if self._escritor is not None:
+            self._escritor.cancel()
+        self.engine.dispose()
+
+    async def _atender_tcp(self, reader, writer, formato):
+        decodificador = Decodificador(formato)
+        try:
+            while True:
+                datos = await reader.read(65536)
+                tramas = decodificador.alimentar(datos) if datos else decodificador.terminar()
+                for trama in tramas:
+                    # Blocks while the queue is full: the socket is not read
+                    # meanwhile, which pushes back on the reader.
+                    await self.cola.put((trama, time.monotonic()))
+                    self.recibidas += 1
+                if not datos:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.malformadas += decodificador.malformados
+            writer.close()
+
+    def _recibir_datagrama(self, datos, formato):
+        decodificador = Decodificador(formato)
+        tramas = decodificador.alimentar(datos) + decodificador.terminar()
+        self.malformadas += decodificador.malformados
+        ahora = time.monotonic()
+        for trama in tramas:
+            try:
+                self.cola.put_nowait((trama, ahora))
+                self.recibidas += 1
+            except asyncio.QueueFull:
+                self.descartadas += 1
+
+    async def _escribir_lotes(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self.cola.get()]
+            limite = loop.time() + self.intervalo
+            while len(lote) < self.tamano_lote:
+                restante = limite - loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self.cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await asyncio.to_thread(self._escribir, [trama for trama, _ in lote])
+                confirmado = time.monotonic()
+                self.latencias.extend(confirmado - recibido for _, recibido in lote)
+            finally:
+                for _ in lote:
+                    self.cola.task_done()
+
+    def _calentar_indice(self):
+        with Session(self.engine) as session:
+            indice_tags.calentar(session)
+
+    def _escribir(self, tramas):
+        for intento in range(1, MAX_INTENTOS + 1):
+            try:
+                with Session(self.engine) as session:
+                    informe = rfid.ingerir_escaneos(tramas, session=session, filtro=self.filtro)
+            except Exception:
+                logger.exception(f'No se pudo escribir un lote de {len(tramas)} lecturas (intento {intento})')
+                if intento < MAX_INTENTOS:
+                    time.sleep(0.1 * 2 ** intento)
+                continue
+            break
+        else:
+            self.lotes_fallidos += 1
+            self.perdidas += len(tramas)
+            logger.error('Lecturas descartadas tras %d intentos: %s', MAX_INTENTOS, json.dumps(tramas, default=str))
+            return
+        self.lotes += 1
+        self.aceptadas += informe['aceptadas']
+        self.suprimidas += informe['suprimidas']
+        self.rechazadas += informe['rechazadas']
+
+    def estadisticas(self):
+        latencias = sorted(self.latencias)
+        return {
+            'recibidas': self.recibidas,
+            'descartadas': self.descartadas,
+            'malformadas': self.malformadas,
+            'aceptadas': self.aceptadas,
+            'suprimidas': self.suprimidas,
+            'rechazadas': self.rechazadas,
+            'lotes': self.lotes,
+            'lotes_fallidos': self.lotes_fallidos,
+            'perdidas': self.perdidas,
+            'en_cola': self.cola.qsize(),
+            'indice_tags': indice_tags.estadisticas(),
+            'latencia_p50': percentil(latencias, 0.50),
+            'latencia_p99': percentil(latencias, 0.99),
+            'latencia_max': max(latencias) if latencias else None
+        }
+
+
+class _ProtocoloUDP(asyncio.DatagramProtocol):
+
+    def __init__(self, pasarela, formato):
+        self.pasarela = pasarela
+        self.formato = formato
+
+    def datagram_received(self, data, addr):
+        self.pasarela._recibir_datagrama(data, self.formato)
+
+
+def _direccion(valor):
+    host, _, puerto = valor.rpartition(':')
+    return host or '0.0.0.0', int(puerto)
+
+
+async def _main(args):
+    pasarela = Pasarela(
+        args.database_url,
+        tamano_lote=args.lote,
+        intervalo=args.intervalo,
+        capacidad_cola=args.cola,
+        filtro=rfid.FiltroRebote(args.ventana, args.capacidad_rebote) if args.ventana else None
+    )
+    direcciones = await pasarela.iniciar(tcp=args.tcp, udp=args.udp, formato=args.formato)
+    logger.info(f'Escuchando en {direcciones} ({args.formato})')
+
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(senal, parar.set)
+    while not parar.is_set():
+        try:
+            await asyncio.wait_for(parar.wait(), args.informe)
+        except asyncio.TimeoutError:
+            logger.info(json.dumps(pasarela.estadisticas()))
+    await pasarela.detener()
+    logger.info(json.dumps(pasarela.estadisticas()))
+
+
+if __name__ == '__main__':
+    basedir = os.path.abspath(os.path.dirname(__file__))
+    parser = argparse.ArgumentParser(description='Pasarela asyncio para lectores RFID.')
+    parser.add_argument('--tcp', type=_direccion, help='HOST:PUERTO para lectores TCP')
+    parser.add_argument('--udp', type=_direccion, help='HOST:PUERTO para lectores UDP')
+    parser.add_argument('--formato', choices=FORMATOS, default='lineas')
+    parser.add_argument('--database-url', default=os.environ.get(
+        'DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'instance', 'usuarios.db')))
+    parser.add_argument('--lote', type=int, default=1000, help='lecturas máximas por transacción')
+    parser.add_argument('--intervalo', type=float, default=0.2, help='segundos máximos que espera un lote')
+    parser.add_argument('--cola', type=int, default=20000, help='lecturas en memoria antes de frenar a los lectores')
+    parser.add_argument('--ventana', type=float, default=5, help='ventana de rebote en segundos (0 la desactiva)')
+    parser.add_argument('--capacidad-rebote', type=int, default=100000)
+    parser.add_argument('--informe', type=float, default=30, help='segundos entre informes de estadísticas')
+    args = parser.parse_args()
+    if not args.tcp and not args.udp:
+        parser.error('indica al menos --tcp o --udp')
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s in %(name)s: %(message)s')
+    asyncio.run(_main(args))
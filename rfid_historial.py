@@ -0,0 +1,224 @@
+# rfid_historial.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, cast, delete, func, insert, select, update
+
+import marcas
+from extensions import db
+from models import ConfiguracionSistema, EscaneoRFID, EstanciaUbicacion
+
+# ConfiguracionSistema key holding the last EscaneoRFID.id folded into estancia_ubicacion.
+CLAVE_MARCA = 'estancias_ultimo_escaneo_id'
+# Raw scans folded per transaction.
+TAMANO_LOTE = 20000
+# Raw scans deleted per transaction by the retention purge.
+TAMANO_LOTE_PURGA = 5000
+# Products per IN (...) lookup, kept well below SQLite's bound-parameter limit.
+TAMANO_BLOQUE_SQL = 500
+# Uncompacted scans of one product read by `estancias_producto`.
+MAX_ESCANEOS_PENDIENTES = 5000
+
+
+def _leer_marca(session):
+    return marcas.leer(session, CLAVE_MARCA, 'Último EscaneoRFID.id compactado en estancia_ubicacion')
+
+
+def _como_dict(estancia):
+    return {
+        'id': estancia.id,
+        'producto_id': estancia.producto_id,
+        'ubicacion': estancia.ubicacion,
+        'primera_lectura': estancia.primera_lectura,
+        'ultima_lectura': estancia.ultima_lectura,
+        'num_lecturas': estancia.num_lecturas,
+        'lectores': set(estancia.lectores.split(',')) if estancia.lectores else set()
+    }
+
+
+def plegar_escaneos(producto_id, estancia, escaneos):
+    """
+    Fold time-ordered ``(fecha_hora, ubicacion, lector_id)`` scans into dwell intervals.
+
+    ``estancia`` is the product's latest interval as a dict (or None); it is
+    extended in place while the scans stay at its location. Returns the new
+    intervals, oldest first. A scan older than the start of the current
+    interval opens a separate one instead of splitting history.
+    """
+    nuevas = []
+    actual = estancia
+    for fecha_hora, ubicacion, lector_id in escaneos:
+        if actual is not None and actual['ubicacion'] == ubicacion and fecha_hora >= actual['primera_lectura']:
+            actual['ultima_lectura'] = max(actual['ultima_lectura'], fecha_hora)
+            actual['num_lecturas'] += 1
+        else:
+            actual = {
+                'producto_id': producto_id,
+                'ubicacion': ubicacion,
+                'primera_lectura': fecha_hora,
+                'ultima_lectura': fecha_hora,
+                'num_lecturas': 1,
+                'lectores': set()
+            }
+            nuevas.append(actual)
+        if lector_id:
+            actual['lectores'].add(lector_id)
+    return nuevas
+
+
+def _para_guardar(estancia):
+    fila = dict(estancia)
+    fila['lectores'] = ','.join(sorted(estancia['lectores'])) or None
+    return fila
+
+
+def _ultimas_estancias(session, producto_ids):
+    ultimas = {}
+    for inicio in range(0, len(producto_ids), TAMANO_BLOQUE_SQL):
+        bloque = producto_ids[inicio:inicio + TAMANO_BLOQUE_SQL]
+        ids = (
+            select(func.max(EstanciaUbicacion.id))
+            .where(EstanciaUbicacion.producto_id.in_(bloque))
+            .group_by(EstanciaUbicacion.producto_id)
+        )
+        for estancia in session.scalars(select(EstanciaUbicacion).where(EstanciaUbicacion.id.in_(ids))):
+            ultimas[estancia.producto_id] = _como_dict(estancia)
+    return ultimas
+
+
+def compactar_escaneos(session=None, tamano_lote=TAMANO_LOTE):
+    """
+    Fold raw scans newer than the high-water mark into ``estancia_ubicacion``.
+
+    Consecutive scans of a product at the same location extend its latest
+    interval (last read, read count, readers); a different location opens
+    a new one. Like `rollups.refrescar_resumenes`, the mark is advanced
+    with a compare-and-set in the same transaction as each batch.
+
+    Returns:
+        int: The number of scans folded in.
+    """
+    session = session or db.session
+    procesados = 0
+    while True:
+        marca = _leer_marca(session)
+        filas = session.execute(
+            select(EscaneoRFID.id, EscaneoRFID.producto_id, EscaneoRFID.fecha_hora,
+                   EscaneoRFID.ubicacion, EscaneoRFID.lector_id)
+            .where(EscaneoRFID.id > marca)
+            .order_by(EscaneoRFID.id)
+            .limit(tamano_lote)
+        ).all()
+        if not filas:
+            session.commit()
+            return procesados
+
+        por_producto = defaultdict(list)
+        for _, producto_id, fecha_hora, ubicacion, lector_id in filas:
+            por_producto[producto_id].append((fecha_hora, ubicacion, lector_id))
+        ultimas = _ultimas_estancias(session, list(por_producto))
+
+        nuevas, modificadas = [], []
+        for producto_id, escaneos in por_producto.items():
+            escaneos.sort(key=lambda escaneo: escaneo[0])
+            ultima = ultimas.get(producto_id)
+            antes = (ultima['ultima_lectura'], ultima['num_lecturas']) if ultima else None
+            nuevas.extend(plegar_escaneos(producto_id, ultima, escaneos))
+            if ultima and (ultima['ultima_lectura'], ultima['num_lecturas']) != antes:
+                modificadas.append(_para_guardar(ultima))
+
+        if modificadas:
+            session.execute(update(EstanciaUbicacion), modificadas)
+        if nuevas:
+            session.execute(insert(EstanciaUbicacion), [_para_guardar(estancia) for estancia in nuevas])
+
+        if not marcas.avanzar(session, CLAVE_MARCA, marca, filas[-1][0]):
+            session.rollback()
+            continue
+        session.commit()
+        procesados += len(filas)
+
+
+def purgar_escaneos(retencion_dias, session=None, tamano_lote=TAMANO_LOTE_PURGA):
+    """
+    Delete raw scans older than ``retencion_dias`` in bounded batches.
+
+    Only scans already folded into ``estancia_ubicacion`` are deleted, and
+    each batch is its own short transaction so readers and the scan writers
+    are never blocked for long.
+
+    Returns:
+        int: The number of scans deleted.
+    """
+    session = session or db.session
+    limite = datetime.utcnow() - timedelta(days=retencion_dias)
+    marca = _leer_marca(session)
+    borrados = 0
+    while True:
+        ids = (
+            select(EscaneoRFID.id)
+            .where(EscaneoRFID.id <= marca, EscaneoRFID.fecha_hora < limite)
+            .order_by(EscaneoRFID.id)
+            .limit(tamano_lote)
+        )
+        resultado = session.execute(
+            delete(EscaneoRFID).where(EscaneoRFID.id.in_(ids)).execution_options(synchronize_session=False)
+        )
+        session.commit()
+        borrados += resultado.rowcount
+        if resultado.rowcount < tamano_lote:
+            return borrados
+
+
+def estancias_producto(producto_id, limite=20, session=None):
+    """
+    Return the product's latest ``limite`` dwell intervals, newest first.
+
+    Scans not compacted yet are folded on the fly into the stored intervals,
+    so the history is current even between compaction runs. Each interval
+    is a dict with ``ubicacion``, ``primera_lectura``, ``ultima_lectura``,
+    ``num_lecturas`` and ``lectores`` (a sorted list).
+    """
+    session = session or db.session
+    marca = (
+        select(cast(ConfiguracionSistema.valor, Integer))
+        .where(ConfiguracionSistema.clave == CLAVE_MARCA)
+        .scalar_subquery()
+    )
+    pendientes = session.execute(
+        select(EscaneoRFID.fecha_hora, EscaneoRFID.ubicacion, EscaneoRFID.lector_id)
+        .where(EscaneoRFID.producto_id == producto_id, EscaneoRFID.id > func.coalesce(marca, 0))
+        .order_by(EscaneoRFID.id)
+        .limit(MAX_ESCANEOS_PENDIENTES)
+    ).all()
+    estancias = [_como_dict(estancia) for estancia in session.scalars(
+        select(EstanciaUbicacion)
+        .where(EstanciaUbicacion.producto_id == producto_id)
+        .order_by(EstanciaUbicacion.primera_lectura.desc(), EstanciaUbicacion.id.desc())
+        .limit(limite)
+    )]
+    if pendientes:
+        pendientes.sort(key=lambda escaneo: escaneo[0])
+        nuevas = plegar_escaneos(producto_id, estancias[0] if estancias else None, pendientes)
+        estancias = list(reversed(nuevas)) + estancias
+    for estancia in estancias:
+        estancia['lectores'] = sorted(estancia['lectores'])
+    return estancias[:limite]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from app import app
+
+    parser = argparse.ArgumentParser(description='Compacta escaneos RFID en estancias y purga los antiguos.')
+    parser.add_argument('--retencion', type=int, default=None,
+                        help='días de escaneos brutos a conservar (por defecto RFID_RETENCION_DIAS)')
+    parser.add_argument('--sin-purga', action='store_true', help='solo compactar')
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(f'Escaneos compactados: {compactar_escaneos()}')
+        if not args.sin_purga:
+            retencion = args.retencion if args.retencion is not None else app.config['RFID_RETENCION_DIAS']
+            print(f'Escaneos purgados (> {retencion} días): {purgar_escaneos(retencion)}')
@@ -0,0 +1,142 @@
+# rollups.py
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+import marcas
+from extensions import db
+from models import (
+    ConfiguracionSistema,
+    Movimiento,
+    ResumenMovimientoDia,
+    ResumenMovimientoProductoDia,
+    ResumenMovimientoUsuarioDia
+)
+
+# ConfiguracionSistema key holding the last Movimiento.id folded into the rollups.
+CLAVE_MARCA = 'resumenes_movimiento_ultimo_id'
+# Movements folded per transaction.
+TAMANO_LOTE = 50000
+# Minimum seconds between refreshes triggered from report views in one worker.
+REFRESCO_MINIMO_SEGUNDOS = 30
+
+_ultimo_refresco = 0.0
+_lock_refresco = threading.Lock()
+
+
+def _leer_marca(session):
+    return marcas.leer(session, CLAVE_MARCA, 'Último Movimiento.id incluido en las tablas resumen_movimiento_*')
+
+
+def _upsert_sumando(session, modelo, claves, filas):
+    if not filas:
+        return
+    stmt = insert(modelo)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[getattr(modelo, clave) for clave in claves],
+        set_={'total': modelo.total + stmt.excluded.total}
+    )
+    session.execute(stmt, filas)
+
+
+def refrescar_resumenes(session=None, tamano_lote=TAMANO_LOTE):
+    """
+    Fold movements newer than the high-water mark into the daily rollups.
+
+    Movements are append-only, so each batch of ids above the mark is
+    aggregated once and added to the rollup rows, and the mark is advanced
+    in the same transaction. The mark is advanced with a compare-and-set,
+    so a concurrent refresh in another worker rolls back instead of
+    counting a batch twice.
+
+    Returns:
+        int: The number of movements folded in.
+    """
+    session = session or db.session
+    procesados = 0
+    while True:
+        marca = _leer_marca(session)
+        filas = session.execute(
+            select(Movimiento.id, Movimiento.fecha_hora, Movimiento.usuario_id, Movimiento.producto_id,
+                   Movimiento.estado_anterior, Movimiento.estado_nuevo)
+            .where(Movimiento.id > marca)
+            .order_by(Movimiento.id)
+            .limit(tamano_lote)
+        ).all()
+        if not filas:
+            session.commit()
+            return procesados
+
+        por_dia, por_usuario, por_producto = Counter(), Counter(), Counter()
+        for _, fecha_hora, usuario_id, producto_id, anterior, nuevo in filas:
+            fecha = fecha_hora.date()
+            por_dia[(fecha, anterior, nuevo)] += 1
+            por_usuario[(fecha, usuario_id)] += 1
+            por_producto[(fecha, producto_id)] += 1
+
+        _upsert_sumando(session, ResumenMovimientoDia, ['fecha', 'estado_anterior', 'estado_nuevo'], [
+            {'fecha': f, 'estado_anterior': a, 'estado_nuevo': n, 'total': t} for (f, a, n), t in por_dia.items()
+        ])
+        _upsert_sumando(session, ResumenMovimientoUsuarioDia, ['fecha', 'usuario_id'], [
+            {'fecha': f, 'usuario_id': u, 'total': t} for (f, u), t in por_usuario.items()
+        ])
+        _upsert_sumando(session, ResumenMovimientoProductoDia, ['fecha', 'producto_id'], [
+            {'fecha': f, 'producto_id': p, 'total': t} for (f, p), t in por_producto.items()
+        ])
+
+        if not marcas.avanzar(session, CLAVE_MARCA, marca, filas[-1][0]):
+            session.rollback()
+            continue
+        session.commit()
+        procesados += len(filas)
+
+
+def refrescar_si_necesario(session=None):
+    """
+    Refresh the rollups at most every REFRESCO_MINIMO_SEGUNDOS per worker.
+
+    Without ``session`` the refresh runs on its own session bound to the
+    write engine, so a view marked with `lectura.solo_lectura` never reads
+    the mark from a lagging read engine (where the compare-and-set would
+    keep failing) and never has its own transaction committed by it.
+    """
+    global _ultimo_refresco
+    if time.monotonic() - _ultimo_refresco < REFRESCO_MINIMO_SEGUNDOS:
+        return
+    if not _lock_refresco.acquire(blocking=False):
+        return
+    try:
+        if session is None:
+            with Session(db.engine) as propia:
+                refrescar_resumenes(propia)
+        else:
+            refrescar_resumenes(session)
+        _ultimo_refresco = time.monotonic()
+    finally:
+        _lock_refresco.release()
+
+
+def reconstruir_resumenes(session=None):
+    """Empty the rollups and the high-water mark, then fold every movement again."""
+    session = session or db.session
+    for modelo in (ResumenMovimientoDia, ResumenMovimientoUsuarioDia, ResumenMovimientoProductoDia):
+        session.query(modelo).delete()
+    session.query(ConfiguracionSistema).filter_by(clave=CLAVE_MARCA).delete()
+    session.commit()
+    return refrescar_resumenes(session)
+
+
+if __name__ == '__main__':
+    import sys
+
+    from app import app
+
+    with app.app_context():
+        if '--reconstruir' in sys.argv:
+            print(f'Movimientos resumidos: {reconstruir_resumenes()}')
+        else:
+            print(f'Movimientos nuevos resumidos: {refrescar_resumenes()}')
@@ -0,0 +1,177 @@
+# usuario_registry.py
+import threading
+import time
+from datetime import datetime
+
+from flask_login import UserMixin
+from sqlalchemy import Integer, cast, event, inspect, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import object_session
+
+from comun import al_confirmar, pendientes
+from extensions import db
+from models import ConfiguracionSistema, Usuario
+
+# ConfiguracionSistema key bumped in the same transaction as any Usuario update
+# or delete; workers compare it to notice changes made by other processes.
+CLAVE_VERSION = 'usuarios_version'
+# Upper bound on how long a cached principal is served without reloading it.
+TTL_SEGUNDOS = 60
+# Minimum seconds between version checks, i.e. how long another worker's
+# change (a deactivation, a role change) can go unseen here.
+INTERVALO_VERSION = 2
+# Usuario columns copied into a Principal; updates touching none of them keep the caches.
+CAMPOS_PRINCIPAL = ('nombre_usuario', 'rol', 'activo')
+
+
+class Principal(UserMixin):
+    """
+    Read-only stand-in for a Usuario, as returned by `load_user`.
+
+    Carries only what the request pipeline reads from ``current_user``
+    (id, nombre_usuario, rol, activo), so it can be shared between threads
+    and sessions. Load the Usuario itself for anything else.
+    """
+
+    def __init__(self, id, nombre_usuario, rol, activo):
+        self.id = id
+        self.nombre_usuario = nombre_usuario
+        self.rol = rol
+        self.activo = activo
+
+    @property
+    def is_active(self):
+        return self.activo
+
+    def __repr__(self):
+        return f'<Principal {self.id} {self.nombre_usuario}>'
+
+
+class RegistroUsuarios:
+    """
+    Worker-local TTL cache of `Principal` objects by user id.
+
+    Flask-Login loads the user on every authenticated request; with this
+    cache a request costs no query at all, except at most one version check
+    every ``INTERVALO_VERSION`` seconds or one combined load on a miss.
+
+    Any Usuario delete, or update of a ``CAMPOS_PRINCIPAL`` column, bumps
+    ``CLAVE_VERSION`` in its own transaction (see the listeners below). The
+    worker that made the change drops the affected entries on commit; every
+    other worker drops its whole cache when it sees the version move.
+    """
+
+    def __init__(self, ttl=TTL_SEGUNDOS, intervalo_version=INTERVALO_VERSION):
+        self.ttl = ttl
+        self.intervalo_version = intervalo_version
+        self._lock = threading.Lock()
+        self._entradas = {}
+        self._version = None
+        self._comprobado_en = 0.0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _aplicar_version(self, version, ahora):
+        with self._lock:
+            if version != self._version:
+                self._entradas = {}
+                self._version = version
+            self._comprobado_en = ahora
+
+    def obtener(self, usuario_id):
+        """Return the `Principal` of ``usuario_id``, or None if there is no such user."""
+        ahora = time.monotonic()
+        entrada = self._entradas.get(usuario_id)
+        if entrada is not None and ahora - entrada[1] < self.ttl:
+            if ahora - self._comprobado_en >= self.intervalo_version:
+                version = db.session.scalar(
+                    select(ConfiguracionSistema.valor).where(ConfiguracionSistema.clave == CLAVE_VERSION)
+                )
+                self._aplicar_version(version, ahora)
+                entrada = self._entradas.get(usuario_id)
+            if entrada is not None:
+                self.aciertos += 1
+                return entrada[0]
+
+        self.fallos += 1
+        version = (
+            select(ConfiguracionSistema.valor)
+            .where(ConfiguracionSistema.clave == CLAVE_VERSION)
+            .scalar_subquery()
+        )
+        fila = db.session.execute(
+            select(Usuario.id, Usuario.nombre_usuario, Usuario.rol, Usuario.activo, version)
+            .where(Usuario.id == usuario_id)
+        ).first()
+        if fila is None:
+            return None
+        principal = Principal(*fila[:4])
+        self._aplicar_version(fila[4], ahora)
+        with self._lock:
+            self._entradas[usuario_id] = (principal, ahora)
+        return principal
+
+    def invalidar(self, usuario_ids=None):
+        """Drop the given users' entries, or every entry if ``usuario_ids`` is None."""
+        with self._lock:
+            if usuario_ids is None:
+                self._entradas = {}
+                return
+            for usuario_id in usuario_ids:
+                self._entradas.pop(usuario_id, None)
+
+    def estadisticas(self):
+        consultas = self.aciertos + self.fallos
+        return {
+            'usuarios': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None
+        }
+
+
+registro_usuarios = RegistroUsuarios()
+
+
+def notificar_cambio(connection):
+    """
+    Bump the users version on ``connection`` so every worker reloads its principals.
+
+    Called by the listeners below; call it directly after bulk UPDATE or
+    DELETE statements on ``usuario`` that bypass the ORM.
+    """
+    tabla = ConfiguracionSistema.__table__
+    stmt = insert(tabla).values(
+        clave=CLAVE_VERSION,
+        valor='1',
+        descripcion='Versión de la tabla usuario para las cachés de sesión',
+        tipo='int',
+        ultima_actualizacion=datetime.utcnow()
+    )
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=[tabla.c.clave],
+        set_={'valor': cast(tabla.c.valor, Integer) + 1, 'ultima_actualizacion': stmt.excluded.ultima_actualizacion}
+    ))
+
+
+def _usuario_modificado(mapper, connection, target):
+    atributos = inspect(target).attrs
+    if any(atributos[campo].history.has_changes() for campo in CAMPOS_PRINCIPAL):
+        _usuario_borrado(mapper, connection, target)
+    # Otherwise (e.g. a password rehash) nothing a Principal carries has changed.
+
+
+def _usuario_borrado(mapper, connection, target):
+    session = object_session(target)
+    if session is None:
+        notificar_cambio(connection)
+        return
+    modificados = pendientes(session, 'usuarios_modificados', set)
+    if not modificados:
+        notificar_cambio(connection)
+    modificados.add(target.id)
+
+
+event.listen(Usuario, 'after_update', _usuario_modificado)
+event.listen(Usuario, 'after_delete', _usuario_borrado)
+al_confirmar('usuarios_modificados', lambda modificados: registro_usuarios.invalidar(modificados))